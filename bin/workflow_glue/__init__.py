@@ -3,8 +3,10 @@ import argparse
 import glob
 import importlib
 import os
+import sys
+import traceback
 
-from .util import _log_level, get_main_logger  # noqa: ABS101
+from .util import _log_level, _profiling, get_main_logger  # noqa: ABS101
 
 
 __version__ = "0.0.1"
@@ -18,7 +20,7 @@ def get_components():
     components = list()
     for fname in glob.glob(os.path.join(path, "*.py")):
         name = os.path.splitext(os.path.basename(fname))[0]
-        if name in ("__init__", "util"):
+        if name.startswith("_") or name == "util":
             continue
 
         # leniently attempt to import module
@@ -40,11 +42,64 @@ def get_components():
     return components
 
 
-def cli():
-    """Run workflow entry points."""
+def write_manifest():
+    """Write the static manifest of the workflow command scripts.
+
+    The manifest lists the subcommands with their description, so that the
+    CLI only imports the module of the subcommand being run. It must be
+    regenerated when a command script is added or removed.
+    """
+    path = os.path.dirname(os.path.abspath(__file__))
+    lines = [
+        '"""Subcommands of workflow-glue, generated by `write_manifest`."""',
+        '# Do not edit: regenerate after adding or removing a command script.',
+        '', 'COMPONENTS = {']
+    for name in sorted(get_components()):
+        mod = importlib.import_module(f"{_package_name}.{name}")
+        doc = (mod.__doc__ or '').strip().splitlines()
+        lines.append(f'    {name!r}: {(doc[0] if doc else "")!r},')
+    lines.append('}')
+    with open(os.path.join(path, '_manifest.py'), 'w') as fh:
+        fh.write('\n'.join(lines) + '\n')
+
+
+def get_manifest():
+    """Return the subcommands and their description, without importing them."""
+    from ._manifest import COMPONENTS  # noqa: ABS101
+    return COMPONENTS
+
+
+def preload(names):
+    """Import subcommand modules ahead of running them.
+
+    :param names: names of the subcommands.
+    :returns: names of the subcommands imported.
+    """
+    logger = get_main_logger(_package_name)
+    loaded = []
+    for name in names:
+        try:
+            importlib.import_module(f"{_package_name}.{name}")
+        except ModuleNotFoundError as e:
+            logger.warning(f"Could not load {name} due to missing module {e.name}")
+            continue
+        loaded.append(name)
+    return loaded
+
+
+def cli(argv=None):
+    """Run workflow entry points.
+
+    :param argv: command line arguments, without the program name; defaults to
+        those of the process. When these are taken from the process and the
+        `WF_GLUE_SOCKET` environment variable is set, the subcommand is run by
+        the `serve` server listening on that socket, if it can be reached.
+    """
+    forwarding = argv is None
+    argv = sys.argv[1:] if argv is None else list(argv)
     parser = argparse.ArgumentParser(
         'wf-glue',
-        parents=[_log_level()],
+        parents=[_log_level(), _profiling()],
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
 
     parser.add_argument(
@@ -56,17 +111,60 @@ def cli():
         help='additional help', dest='command')
     subparsers.required = True
 
-    # all component demos, plus some others
-    components = [
-        f'{_package_name}.{comp}' for comp in get_components()]
-    for module in components:
-        mod = importlib.import_module(module)
+    # all component demos, plus some others; only the module of the
+    # requested subcommand is imported
+    components = get_manifest()
+    # skip the values of the global options to find the subcommand
+    _, rest = argparse.ArgumentParser(
+        add_help=False, parents=[_log_level(), _profiling()]).parse_known_args(argv)
+    command = next((arg for arg in rest if not arg.startswith('-')), None)
+    if forwarding and command != 'serve' and os.environ.get('WF_GLUE_SOCKET'):
+        from .serve import forward  # noqa: ABS101
+        try:
+            sys.exit(forward(os.environ['WF_GLUE_SOCKET'], argv))
+        except OSError as e:
+            get_main_logger(_package_name).warning(
+                f"Could not reach the workflow-glue server ({e}), "
+                "running the subcommand locally.")
+    if command is not None and command not in components:
+        # not in the manifest yet, fall back to scanning the modules
+        components = {comp: None for comp in get_components()}
+    for name, description in components.items():
+        if name != command:
+            subparsers.add_parser(name, help=description)
+            continue
+        mod = importlib.import_module(f'{_package_name}.{name}')
         p = subparsers.add_parser(
-            module.split(".")[-1], parents=[mod.argparser()])
+            name, parents=[mod.argparser()], help=description)
         p.set_defaults(func=mod.main)
 
     logger = get_main_logger(_package_name)
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     logger.info("Starting entrypoint.")
-    args.func(args)
+    if args.profile is None and args.metrics_json is None:
+        args.func(args)
+        return
+    from ._instrument import instrument  # noqa: ABS101
+    with instrument(
+            args.command, argv, profile=args.profile,
+            metrics_json=args.metrics_json, logger=logger):
+        args.func(args)
+
+
+def run(argv):
+    """Run a subcommand in this process, returning its exit code.
+
+    :param argv: command line arguments, without the program name.
+    """
+    try:
+        cli(argv)
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        sys.stderr.write(f"{e.code}\n")
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
@@ -0,0 +1,208 @@
+"""Profiling and resource usage of subcommands.
+
+This module is only imported when `--profile` or `--metrics-json` is given.
+"""
+import collections
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import resource
+import socket
+import sys
+import threading
+import time
+
+from . import util  # noqa: ABS101
+
+# Interval between stack samples of the sampling profiler, in seconds
+SAMPLING_INTERVAL = 0.005
+# Number of functions listed in the profile summary of the metrics
+TOP_FUNCTIONS = 25
+
+
+def io_counters():
+    """Return the bytes read and written by this process, or None if unknown."""
+    try:
+        with open('/proc/self/io') as fh:
+            fields = dict(line.split(': ') for line in fh.read().splitlines())
+    except OSError:
+        return None
+    return {
+        'read_bytes': int(fields['rchar']), 'written_bytes': int(fields['wchar'])}
+
+
+class SamplingProfiler:
+    """Sample the stacks of all threads at a fixed interval.
+
+    Stacks are recorded in a background thread, so that the profiled code is
+    only slowed down by the time the sampler holds the GIL. The samples are
+    written as collapsed stacks, the input format of flame graph tools.
+    """
+
+    def __init__(self, interval=SAMPLING_INTERVAL):
+        """Initialize the profiler.
+
+        :param interval: time between samples, in seconds.
+        """
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def enable(self):
+        """Start sampling."""
+        self._thread.start()
+
+    def disable(self):
+        """Stop sampling."""
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} "
+                        f"({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def dump_stats(self, fname):
+        """Write the samples as collapsed stacks."""
+        with open(fname, 'w') as fh:
+            for stack, count in self.stacks.most_common():
+                fh.write(f"{';'.join(stack)} {count}\n")
+
+    def top(self, n=TOP_FUNCTIONS):
+        """Return the functions found in most samples."""
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for function in set(stack):
+                total[function] += count
+        return [
+            {'function': function, 'own_samples': own[function],
+                'total_samples': count}
+            for function, count in total.most_common(n)]
+
+
+def _cprofile_top(profiler, n=TOP_FUNCTIONS):
+    """Return the functions with the largest cumulative time."""
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {'function': f"{func} ({os.path.basename(fname)}:{line})",
+            'calls': calls, 'own_time': round(own, 6),
+            'total_time': round(total, 6)}
+        for (fname, line, func), (_, calls, own, total, _) in rows[:n]]
+
+
+def peak_rss(usage):
+    """Return the peak resident memory of this process, in bytes.
+
+    The high-water mark of /proc/self/status is used where available, as the
+    `ru_maxrss` of a process started by a larger one includes the memory of
+    its parent before `exec`.
+    """
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux
+    return usage.ru_maxrss * 1024
+
+
+def _cpu(usage):
+    return {'user': usage.ru_utime, 'system': usage.ru_stime}
+
+
+@contextlib.contextmanager
+def instrument(command, argv, profile=None, metrics_json=None, logger=None):
+    """Profile a subcommand and record its resource usage.
+
+    :param command: name of the subcommand.
+    :param argv: command line arguments.
+    :param profile: 'cprofile', 'sampling' or None.
+    :param metrics_json: path of the metrics JSON; None to not write it.
+    :param logger: logger reporting the outputs written.
+    """
+    util._phases.clear()
+    util._records.clear()
+    profiler = None
+    if profile == 'cprofile':
+        profiler = cProfile.Profile()
+    elif profile == 'sampling':
+        profiler = SamplingProfiler()
+    own_start = resource.getrusage(resource.RUSAGE_SELF)
+    children_start = resource.getrusage(resource.RUSAGE_CHILDREN)
+    io_start = io_counters()
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    exit_code = 0
+    try:
+        yield
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+        raise
+    except BaseException:
+        exit_code = 1
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        wall_time = time.perf_counter() - start
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        io_end = io_counters()
+        metrics = {
+            'command': command,
+            'argv': list(argv),
+            'exit_code': exit_code,
+            'hostname': socket.gethostname(),
+            'pid': os.getpid(),
+            'workdir': os.getcwd(),
+            'wall_time': round(wall_time, 6),
+            'cpu_time': {
+                key: round(value - _cpu(own_start)[key], 6)
+                for key, value in _cpu(own).items()},
+            'children_cpu_time': {
+                key: round(value - _cpu(children_start)[key], 6)
+                for key, value in _cpu(children).items()},
+            'peak_rss': peak_rss(own),
+            # ru_maxrss is in kilobytes on Linux
+            'children_peak_rss': children.ru_maxrss * 1024,
+            'io': None if io_start is None or io_end is None else {
+                key: io_end[key] - io_start[key] for key in io_end},
+            'records': dict(util._records),
+            'phases': {
+                name: round(value, 6) for name, value in util._phases.items()},
+        }
+        if profiler is not None:
+            prefix = command if metrics_json is None \
+                else os.path.splitext(metrics_json)[0]
+            fname = f"{prefix}.prof" if profile == 'cprofile' else f"{prefix}.folded"
+            profiler.dump_stats(fname)
+            functions = _cprofile_top(profiler) if profile == 'cprofile' \
+                else profiler.top()
+            metrics['profile'] = {
+                'mode': profile, 'output': fname, 'functions': functions}
+            if logger is not None:
+                logger.info(f"Written {profile} profile to '{fname}'.")
+        if metrics_json is not None:
+            with open(metrics_json, 'w') as fh:
+                json.dump(metrics, fh, indent=2)
+            if logger is not None:
+                logger.info(f"Written metrics to '{metrics_json}'.")
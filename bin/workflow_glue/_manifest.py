@@ -0,0 +1,22 @@
+"""Subcommands of workflow-glue, generated by `write_manifest`."""
+# Do not edit: regenerate after adding or removing a command script.
+
+COMPONENTS = {
+    'annotate_mutations': 'Annotate mutation type.',
+    'batch': 'Run the subcommand invocations listed in a manifest.',
+    'benchmark': 'Benchmark the subcommands on synthetic inputs.',
+    'check_sample_sheet': 'Check if a sample sheet is valid.',
+    'check_sq_ref': 'check_seq_ref.',
+    'check_valid_modbam': 'Check whether the input is a modbam.',
+    'classify_vcf_svs': 'check_seq_ref.',
+    'extract_filtered_svs': 'check_seq_ref.',
+    'mod_split': 'Split bedMethyl into subfiles.',
+    'read_stats_sketch': 'Summarise bamstats per-read files into a mergeable sketch.',
+    'report_mod': 'Create mod base report.',
+    'report_qc': 'Plot QC metrics.',
+    'report_snv': 'Create SNV report.',
+    'report_sv': 'Create workflow report.',
+    'serve': 'Run subcommands for clients connecting to a local socket.',
+    'sort_vcf': 'Sort VCFs into a BGZF-compressed VCF, indexing it as it is written.',
+    'vcf_stats': 'Compute bcftools stats summary numbers and Ts/Tv of a VCF.',
+}
@@ -2,12 +2,16 @@
 
 import itertools
 import json
+import os
 import re
 
+import numpy as np
 import pandas as pd
 import pysam
 
+from .util import get_named_logger, hts_position, Progress  # noqa: ABS101
 from .util import wf_parser  # noqa: ABS101
+from .vcf_stats import VcfStats  # noqa: ABS101
 
 
 def reverse(seq):
@@ -15,6 +19,38 @@ def reverse(seq):
     return seq[::-1].translate(str.maketrans('ACGT', 'TGCA'))
 
 
+def save_variant_arrays(fname, sample_id, arrays, mut_types):
+    """Save the per-variant arrays used by the SNV report.
+
+    The arrays are stored uncompressed, together with the names needed to
+    decode the filter and mutation type codes, so that the report can use
+    them without parsing the VCF again.
+
+    :param fname: output NPZ file.
+    :param sample_id: sample name.
+    :param arrays: dict of lists with keys filter, af, naf, vtype, mutation.
+    :param mut_types: list of mutation types indexed by the mutation codes.
+    """
+    filter_codes = {}
+    filters = [filter_codes.setdefault(f, len(filter_codes)) for f in arrays['filter']]
+    np.savez(
+        fname,
+        sample=np.array(sample_id),
+        filter=np.array(filters, dtype=np.uint16),
+        filter_names=np.array(list(filter_codes), dtype=str),
+        af=np.array(arrays['af'], dtype=np.float32),
+        naf=np.array(arrays['naf'], dtype=np.float32),
+        vtype=np.array(arrays['vtype'], dtype=np.uint8),
+        mutation=np.array(arrays['mutation'], dtype=np.int16),
+        mutation_names=np.array(mut_types, dtype=str))
+
+
+def sample_value(rec, sample_id, key):
+    """Return a per-sample value, or NaN if missing."""
+    value = rec.samples[sample_id].get(key)
+    return np.nan if value is None else value
+
+
 def main(args):
     """Run the entry point."""
     # Define input files and prepare the required datasets
@@ -44,9 +80,20 @@ def main(args):
     flanks = list(map(''.join, itertools.product('ATCG', repeat=fsize)))
     muts = ['[C>A]', '[T>A]', '[C>T]', '[T>G]', '[C>G]', '[T>C]']
     mut_count = dict.fromkeys(map(''.join, itertools.product(flanks, muts, flanks)), 0)
+    # Per-variant values to be reused by the report
+    mut_types = sorted(mut_count.keys())
+    mut_index = {mut: i for i, mut in enumerate(mut_types)}
+    arrays = {'filter': [], 'af': [], 'naf': [], 'vtype': [], 'mutation': []}
+    # Summary numbers computed in the same pass
+    stats = VcfStats(n_samples=len(i_vcf.header.samples))
     # Define output file and process inputs
+    logger = get_named_logger("annotate")
+    progress = Progress(
+        logger, total_bytes=os.path.getsize(args.i_vcf),
+        position=hts_position(i_vcf))
     with pysam.VariantFile(args.o_vcf, 'w', header=i_vcf.header) as o_vcf:
         for rec in i_vcf:
+            progress.update()
             # First, we get the upcase reference K-mer
             # It now accounts for the size of the flanks when selecting
             # the region (pos is 1-based)
@@ -58,6 +105,7 @@ def main(args):
             # Get filters
             filters = [f for f in rec.filter.keys() if f not in ['PASS', '.']]
             # Get SNVs
+            mut_code = -1
             is_snv = len(rec.ref) == len(rec.alts[0]) == 1
             # Check that there are valid nucleotides in the K-mers, that it is a SNP
             # and that it is sorrounded by actual flanks
@@ -81,6 +129,7 @@ def main(args):
                         raise ValueError(f"Change {mut} is not valid.")
                 # If so, set mutation type
                 rec.info['mutation_type'] = mut
+                mut_code = mut_index[mut]
                 # Count only if PASS
                 if len(filters) == 0:
                     mut_count[mut] += 1
@@ -88,6 +137,23 @@ def main(args):
             else:
                 rec.info.__setitem__('mutation_type', '.')
             o_vcf.write(rec)
+            if args.vcf_stats:
+                stats.update(rec.ref, rec.alts)
+            if args.variant_arrays:
+                arrays['filter'].append(next(iter(rec.filter.keys()), '.'))
+                arrays['af'].append(sample_value(rec, sample_id, 'AF'))
+                arrays['naf'].append(sample_value(rec, sample_id, 'NAF'))
+                arrays['vtype'].append(0 if is_snv else 1)
+                arrays['mutation'].append(mut_code)
+    progress.done()
+
+    # Save the summary numbers
+    if args.vcf_stats:
+        stats.write(args.vcf_stats, args.o_vcf)
+
+    # Save the per-variant arrays
+    if args.variant_arrays:
+        save_variant_arrays(args.variant_arrays, sample_id, arrays, mut_types)
 
     # Save output matrix of counts
     with open(f'{sample_id}_changes.csv', 'w') as o_file:
@@ -156,5 +222,12 @@ def argparser():
     parser.add_argument(
         "--json", action="store_true",
         help="Save the spectrum as json for the sankey plot")
+    parser.add_argument(
+        "--variant_arrays", default=None,
+        help="Save per-variant filter, VAFs, type and mutation type as NPZ")
+    parser.add_argument(
+        "--vcf_stats", default=None,
+        help="Save summary numbers and Ts/Tv of the output VCF, "
+             "in bcftools stats format")
 
     return parser
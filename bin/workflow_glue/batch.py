@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""Run the subcommand invocations listed in a manifest.
+
+Each line of the manifest holds the arguments of one invocation, separated
+by tabs, starting with the subcommand; blank lines and lines starting with
+`#` are ignored. The subcommands are imported once, and each invocation is
+run in a new process forked from this one, with up to `--threads` processes
+at once. The output of each invocation is captured, and the exit codes and
+outputs are written to a summary JSON.
+"""
+
+import json
+import os
+import signal
+import sys
+import tempfile
+import time
+
+from .util import get_named_logger, wf_parser  # noqa: ABS101
+
+
+def read_manifest(fname):
+    """Read the invocations of a manifest.
+
+    :param fname: path of the manifest.
+    :returns: list of (line number, arguments) tuples.
+    """
+    invocations = []
+    with open(fname) as fh:
+        for number, line in enumerate(fh, start=1):
+            line = line.rstrip('\r\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            argv = line.split('\t')
+            if argv[0] in ("batch", "serve"):
+                raise ValueError(
+                    f"Line {number} of '{fname}': {argv[0]} cannot be run "
+                    "from a manifest.")
+            invocations.append((number, argv))
+    return invocations
+
+
+def _run_child(argv, log):
+    """Run an invocation in a forked process, capturing its output."""
+    from . import run  # noqa: ABS101
+
+    code = 1
+    try:
+        # the process only runs this invocation, so its streams are not restored
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        code = run(argv)
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(code & 0xff)
+
+
+def _start(invocation):
+    """Fork a process running an invocation, returning its pid and state."""
+    number, argv = invocation
+    log = tempfile.TemporaryFile()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        _run_child(argv, log)
+    return pid, (number, argv, log, time.perf_counter())
+
+
+def _finish(state, status):
+    """Collect the result of an invocation from its wait status."""
+    number, argv, log, start = state
+    elapsed = time.perf_counter() - start
+    # processes killed by a signal have negative exit codes, as subprocess
+    code = os.waitstatus_to_exitcode(status)
+    with log:
+        log.seek(0)
+        output = log.read().decode(errors='replace')
+    if code < 0:
+        output += f"Killed by signal {signal.Signals(-code).name}.\n"
+    return {
+        "line": number, "argv": argv, "exit_code": code,
+        "elapsed": round(elapsed, 3), "log": output}
+
+
+def run_batch(invocations, threads=1, logger=None):
+    """Run invocations, each in a new process forked from this one.
+
+    Invocations whose process dies, e.g. killed by a signal, are failed
+    with the negative signal number as exit code.
+
+    :param invocations: list of (line number, arguments) tuples.
+    :param threads: number of invocations run at once.
+    :param logger: logger reporting the end of each invocation.
+    :returns: list of the results of the invocations, in manifest order.
+    """
+    pending = list(reversed(invocations))
+    running = {}
+    results = []
+    while pending or running:
+        while pending and len(running) < max(1, threads):
+            pid, state = _start(pending.pop())
+            running[pid] = state
+        pid, status = os.waitpid(-1, 0)
+        if pid not in running:
+            continue
+        result = _finish(running.pop(pid), status)
+        if logger is not None:
+            logger.info(
+                f"Line {result['line']} ({result['argv'][0]}) exited with "
+                f"code {result['exit_code']} in {result['elapsed']:.2f}s.")
+        results.append(result)
+    return sorted(results, key=lambda result: result["line"])
+
+
+def main(args):
+    """Run the entry point."""
+    from . import preload  # noqa: ABS101
+
+    logger = get_named_logger("batch")
+    invocations = read_manifest(args.manifest)
+    preload(sorted({argv[0] for _, argv in invocations}))
+    logger.info(
+        f"Running {len(invocations)} invocations from '{args.manifest}' "
+        f"on {args.threads} processes.")
+    start = time.perf_counter()
+    results = run_batch(invocations, threads=args.threads, logger=logger)
+    failed = [result["line"] for result in results if result["exit_code"] != 0]
+    with open(args.summary, 'w') as fh:
+        json.dump({
+            "manifest": args.manifest,
+            "invocations": len(results),
+            "failed": len(failed),
+            "elapsed": round(time.perf_counter() - start, 3),
+            "results": results}, fh, indent=2)
+    logger.info(f"Written summary to '{args.summary}'.")
+    if failed:
+        logger.error(
+            f"{len(failed)} invocations failed, on lines: "
+            f"{', '.join(map(str, failed))}.")
+        sys.exit(1)
+
+
+def argparser():
+    """Argument parser for entrypoint."""
+    parser = wf_parser("batch")
+    parser.add_argument(
+        "manifest",
+        help="TSV file with the arguments of one subcommand invocation per line")
+    parser.add_argument(
+        "--summary", default="batch_summary.json",
+        help="Output JSON with the exit code and output of each invocation")
+    parser.add_argument(
+        "--threads", type=int, default=1,
+        help="Number of invocations run at once")
+    return parser
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""Benchmark the subcommands on synthetic inputs.
+
+Inputs with the given numbers of records are generated in a work directory,
+and each benchmarked subcommand is run on them in a new process. The run
+time, throughput (records per second) and peak memory of each run are
+written to a JSON, which can be kept as a baseline for later runs.
+
+With `--baseline`, the benchmarks of a baseline are run again on the same
+inputs, and those whose throughput drops or peak memory grows beyond the
+tolerances are reported as regressions, in a table and a verdict JSON.
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+
+from .benchmarks.compare import compare, format_table  # noqa: ABS101
+from .benchmarks.suite import BENCHMARKS, environment, run_benchmarks  # noqa: ABS101
+from .util import get_named_logger, wf_parser  # noqa: ABS101
+
+DEFAULT_SCALES = [10000, 100000]
+
+
+def main(args):
+    """Run the entry point."""
+    logger = get_named_logger("benchmark")
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        env = environment()
+        for key in ("hostname", "cpus", "python"):
+            if baseline.get(key) != env[key]:
+                logger.warning(
+                    f"The baseline was run with {key} {baseline.get(key)}, "
+                    f"not {env[key]}.")
+    # Run the benchmarks of the baseline unless others are given
+    benchmarks, scales, seed = args.benchmarks, args.scales, args.seed
+    if baseline is not None:
+        runs = baseline["benchmarks"].values()
+        benchmarks = benchmarks or list(dict.fromkeys(r["command"] for r in runs))
+        scales = scales or sorted({r["scale"] for r in runs})
+        seed = baseline["seed"] if seed is None else seed
+    benchmarks = benchmarks or list(BENCHMARKS)
+    scales = scales or DEFAULT_SCALES
+    seed = seed or 0
+    repeats = args.repeats or (1 if baseline is None else 5)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="benchmark.")
+    logger.info(
+        f"Running {len(benchmarks)} benchmarks at scales "
+        f"{', '.join(map(str, scales))} in '{workdir}'.")
+    try:
+        results = run_benchmarks(
+            benchmarks, scales, workdir, repeats=repeats, seed=seed,
+            keep=args.workdir is not None, logger=logger)
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir)
+    with open(args.output, 'w') as fh:
+        json.dump({
+            **environment(), "seed": seed, "repeats": repeats,
+            "benchmarks": results}, fh, indent=2)
+    logger.info(f"Written results to '{args.output}'.")
+
+    failed = [key for key, result in results.items() if "error" in result]
+    if failed:
+        logger.error(f"{len(failed)} benchmarks failed: {', '.join(failed)}.")
+    if baseline is None:
+        if failed:
+            sys.exit(1)
+        return
+    verdicts = compare(
+        baseline["benchmarks"], results, tolerance=args.tolerance,
+        rss_tolerance=args.rss_tolerance)
+    regressed = [
+        key for key, verdict in verdicts.items() if verdict["status"] == "regressed"]
+    with open(args.verdict, 'w') as fh:
+        json.dump({
+            "baseline": args.baseline, "results": args.output,
+            "tolerance": args.tolerance, "rss_tolerance": args.rss_tolerance,
+            "passed": not regressed and not failed,
+            "regressed": regressed, "failed": failed,
+            "benchmarks": verdicts}, fh, indent=2)
+    logger.info(f"Written verdict to '{args.verdict}'.")
+    sys.stdout.write(format_table(verdicts))
+    if regressed:
+        logger.error(
+            f"{len(regressed)} benchmarks regressed: {', '.join(regressed)}.")
+    if regressed or failed:
+        sys.exit(1)
+
+
+def argparser():
+    """Argument parser for entrypoint."""
+    parser = wf_parser("benchmark")
+    parser.add_argument(
+        "--output", default="benchmark.json",
+        help="Output JSON with the results of the benchmarks")
+    parser.add_argument(
+        "--benchmarks", nargs="+", choices=BENCHMARKS, metavar="BENCHMARK",
+        help=(
+            f"Benchmarks to run, among: {', '.join(BENCHMARKS)}; by default "
+            "all, or those of the baseline"))
+    parser.add_argument(
+        "--scales", nargs="+", type=lambda x: int(float(x)),
+        help=(
+            "Numbers of records of the inputs, e.g. 1e4 1e6; by default "
+            f"{' '.join(map(str, DEFAULT_SCALES))}, or those of the baseline"))
+    parser.add_argument(
+        "--repeats", type=int,
+        help="Number of runs of each benchmark; by default 1, or 5 with a baseline")
+    parser.add_argument(
+        "--seed", type=int,
+        help="Seed of the synthetic inputs; by default 0, or that of the baseline")
+    parser.add_argument(
+        "--workdir", default=None,
+        help=(
+            "Directory of the inputs and outputs, which are kept; by default "
+            "a temporary directory is used and removed"))
+    parser.add_argument(
+        "--baseline",
+        help="Results JSON of an earlier run, to compare the results with")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1,
+        help="Relative drop of throughput from the baseline reported as a regression")
+    parser.add_argument(
+        "--rss_tolerance", type=float, default=0.1,
+        help=(
+            "Relative growth of peak memory from the baseline reported as a "
+            "regression"))
+    parser.add_argument(
+        "--verdict", default="benchmark_verdict.json",
+        help="Output JSON with the comparison with the baseline")
+    return parser
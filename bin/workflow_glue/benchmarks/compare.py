@@ -0,0 +1,106 @@
+"""Comparison of benchmark results with a baseline.
+
+A benchmark regresses when the median of its throughput drops, or the median
+of its peak memory grows, by more than a tolerance, and the interquartile
+ranges of its runs and of the baseline runs do not overlap, so that changes
+within the noise of the runs are not flagged.
+"""
+import statistics
+
+
+def quartiles(values):
+    """Return the first quartile, median and third quartile of values."""
+    values = sorted(values)
+    if len(values) == 1:
+        return values * 3
+    return statistics.quantiles(values, n=4, method='inclusive')
+
+
+def _stats(result):
+    """Return the quartiles of the throughput and peak memory of the runs."""
+    runs = [
+        run for run in result.get('runs', [])
+        if run['exit_code'] == 0 and run['wall_time'] > 0]
+    if not runs:
+        return None
+    return {
+        'throughput': quartiles(result['records'] / run['wall_time'] for run in runs),
+        'peak_rss': quartiles(run['peak_rss'] for run in runs),
+        'runs': len(runs)}
+
+
+def _change(base, current, tolerance, higher_is_better):
+    """Compare the quartiles of a metric, returning its change and status."""
+    change = (current[1] - base[1]) / base[1] if base[1] else 0.
+    # the interquartile ranges do not overlap
+    separated = current[2] < base[0] if change < 0 else current[0] > base[2]
+    status = 'ok'
+    if abs(change) > tolerance and separated:
+        status = 'improved' if (change > 0) == higher_is_better else 'regressed'
+    return {'baseline': base[1], 'current': current[1],
+            'baseline_iqr': base[2] - base[0], 'current_iqr': current[2] - current[0],
+            'change': change, 'status': status}
+
+
+def compare(baseline, results, tolerance=0.1, rss_tolerance=0.1):
+    """Compare benchmark results with a baseline.
+
+    :param baseline: `benchmarks` of a baseline results JSON.
+    :param results: results of `run_benchmarks`.
+    :param tolerance: relative drop of throughput flagged as a regression.
+    :param rss_tolerance: relative growth of peak memory flagged as a
+        regression.
+    :returns: dictionary of verdicts, by `<name>/<scale>`. The status of
+        each benchmark is 'failed', 'new' (not in the baseline), 'regressed',
+        'improved' or 'ok'.
+    """
+    verdicts = {}
+    for key, result in results.items():
+        current = _stats(result)
+        base = _stats(baseline[key]) if key in baseline else None
+        verdict = {'command': result['command'], 'scale': result['scale']}
+        if current is None:
+            verdict['status'] = 'failed'
+        elif base is None:
+            verdict['status'] = 'new'
+        else:
+            verdict['throughput'] = _change(
+                base['throughput'], current['throughput'], tolerance, True)
+            verdict['peak_rss'] = _change(
+                base['peak_rss'], current['peak_rss'], rss_tolerance, False)
+            statuses = {
+                verdict[metric]['status'] for metric in ('throughput', 'peak_rss')}
+            verdict['status'] = next(
+                status for status in ('regressed', 'improved', 'ok')
+                if status in statuses)
+        verdicts[key] = verdict
+    return verdicts
+
+
+def format_table(verdicts):
+    """Format verdicts as a text table."""
+    header = (
+        'benchmark', 'baseline rec/s', 'current rec/s', 'change',
+        'baseline MiB', 'current MiB', 'change', 'status')
+    rows = []
+    for key, verdict in verdicts.items():
+        row = [key]
+        for metric, scale, fmt in (
+                ('throughput', 1, '{:,.0f}'), ('peak_rss', 2**20, '{:,.1f}')):
+            if metric in verdict:
+                values = verdict[metric]
+                row.extend([
+                    fmt.format(values['baseline'] / scale),
+                    fmt.format(values['current'] / scale),
+                    f"{values['change']:+.1%}"])
+            else:
+                row.extend(['-'] * 3)
+        row.append(verdict['status'])
+        rows.append(row)
+    widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+    lines = []
+    for row in [header, *rows]:
+        lines.append('  '.join(
+            cell.ljust(width) if i in (0, len(header) - 1) else cell.rjust(width)
+            for i, (cell, width) in enumerate(zip(row, widths))).rstrip())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,305 @@
+"""Benchmarks of the workflow scripts on synthetic inputs.
+
+Each benchmark runs a subcommand in a new process with `--metrics-json`,
+on inputs generated by `synthetic` with `scale` records, and records its
+run time, throughput and peak memory.
+"""
+import datetime
+import functools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from . import synthetic  # noqa: ABS101
+
+GLUE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'workflow-glue')
+SAMPLE = 'SAMPLE'
+# Number of records of the scale for each DSS DMR and nanomonsv SV
+DMR_RATIO = 20
+SV_RATIO = 10
+
+
+class Dataset:
+    """Synthetic inputs at one scale, generated on first use."""
+
+    def __init__(self, directory, scale, seed=0):
+        """Initialize the dataset.
+
+        :param directory: directory of the inputs.
+        :param scale: number of records of the main input of each script.
+        :param seed: seed of the random generators.
+        """
+        self.directory = directory
+        self.scale = scale
+        self.seed = seed
+        self.lengths = synthetic.genome_lengths(scale)
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name):
+        """Return the path of an input."""
+        return os.path.join(self.directory, name)
+
+    def rng(self, name):
+        """Return a random generator specific to an input."""
+        return np.random.default_rng([self.seed, zlib.crc32(name.encode())])
+
+    @functools.cached_property
+    def sequences(self):
+        """Reference sequences, written to `ref.fa`."""
+        return synthetic.reference(
+            self.path('ref.fa'), self.lengths, self.rng('reference'))
+
+    @property
+    def reference(self):
+        """Reference FASTA."""
+        self.sequences
+        return self.path('ref.fa')
+
+    @functools.cached_property
+    def bedmethyl(self):
+        """Tumor bedMethyl."""
+        fname = self.path(f'{SAMPLE}.tumor.bedmethyl.gz')
+        synthetic.bedmethyl(fname, self.scale, self.lengths, self.rng('bedmethyl'))
+        return fname
+
+    @functools.cached_property
+    def snv_vcf(self):
+        """Somatic VCF of ClairS."""
+        fname = self.path(f'{SAMPLE}.snv.vcf')
+        synthetic.clairs_vcf(
+            fname, self.scale, self.sequences, self.rng('snv'), sample=SAMPLE)
+        return fname
+
+    @functools.cached_property
+    def snv_annotations(self):
+        """Outputs of `annotate_mutations` for the somatic VCF."""
+        directory = self.path('annotate')
+        os.makedirs(directory, exist_ok=True)
+        paths = {
+            'vcf': os.path.join(directory, f'{SAMPLE}.annotated.vcf'),
+            'arrays': os.path.join(directory, f'{SAMPLE}.variants.npz'),
+            'stats': os.path.join(directory, f'{SAMPLE}.stats'),
+            'spectra': os.path.join(directory, f'{SAMPLE}_changes.csv')}
+        subprocess.run(
+            [sys.executable, GLUE, 'annotate_mutations', self.snv_vcf,
+                paths['vcf'], '--genome', self.reference,
+                '--variant_arrays', paths['arrays'], '--vcf_stats', paths['stats']],
+            cwd=directory, check=True, capture_output=True)
+        return paths
+
+    @functools.cached_property
+    def sv(self):
+        """Nanomonsv VCF, with its filter and classify tables."""
+        return synthetic.nanomonsv(
+            self.path(SAMPLE), max(1, self.scale // SV_RATIO), self.sequences,
+            self.rng('sv'))
+
+    @functools.cached_property
+    def qc(self):
+        """Bamstats and mosdepth outputs of the tumor and normal samples."""
+        window = max(1000, sum(self.lengths.values()) // max(1, self.scale // 10))
+        paths = {'window': window, 'fai': self.path('ref.fa.fai')}
+        self.reference
+        for sample in ('tumor', 'normal'):
+            prefix = self.path(f'{SAMPLE}.{sample}')
+            rng = self.rng(f'qc.{sample}')
+            paths[sample] = {
+                **synthetic.bamstats(prefix, self.scale, self.lengths, rng, SAMPLE),
+                **synthetic.mosdepth(prefix, self.lengths, window, rng)}
+        return paths
+
+    @functools.cached_property
+    def mod(self):
+        """DSS outputs and modkit summaries."""
+        rng = self.rng('mod')
+        paths = synthetic.dss(
+            self.path('dss'), self.scale, max(1, self.scale // DMR_RATIO),
+            self.lengths, rng, sample=SAMPLE)
+        for sample in ('tumor', 'normal'):
+            paths[sample] = self.path(f'{SAMPLE}.{sample}.summary.tsv')
+            synthetic.modkit_summary(paths[sample], rng)
+        paths['fai'] = self.path('ref.fa.fai')
+        self.reference
+        return paths
+
+    @functools.cached_property
+    def report_metadata(self):
+        """Versions and parameters files of the reports."""
+        paths = {
+            'versions': self.path('versions.txt'), 'params': self.path('params.json')}
+        with open(paths['versions'], 'w') as fh:
+            fh.write('workflow-glue,0.0.1\n')
+        with open(paths['params'], 'w') as fh:
+            json.dump({'sample_name': SAMPLE}, fh)
+        return paths
+
+
+def _link(fname, rundir):
+    """Link an input in the run directory, returning its relative path."""
+    name = os.path.basename(fname)
+    os.symlink(fname, os.path.join(rundir, name))
+    return name
+
+
+def _report_args(data):
+    meta = data.report_metadata
+    return ['--versions', meta['versions'], '--params', meta['params']]
+
+
+# Arguments of each benchmark, given the dataset and run directory
+BENCHMARKS = {
+    'mod_split': lambda data, rundir: [
+        'mod_split', _link(data.bedmethyl, rundir)],
+    'vcf_stats': lambda data, rundir: [
+        'vcf_stats', data.snv_vcf, 'stats.txt'],
+    'annotate_mutations': lambda data, rundir: [
+        'annotate_mutations', data.snv_vcf, 'annotated.vcf',
+        '--genome', data.reference, '--variant_arrays', 'variants.npz',
+        '--vcf_stats', 'stats.txt'],
+    'sort_vcf': lambda data, rundir: [
+        'sort_vcf', data.snv_vcf, '--output', 'sorted.vcf.gz'],
+    'extract_filtered_svs': lambda data, rundir: [
+        'extract_filtered_svs', '--in_vcf', data.sv['vcf'],
+        '--filtered', data.sv['filtered'], '--out_vcf', 'filtered.vcf'],
+    'classify_vcf_svs': lambda data, rundir: [
+        'classify_vcf_svs', '--in_vcf', data.sv['vcf'],
+        '--original', data.sv['original'], '--annotated', data.sv['annotated'],
+        '--out_vcf', 'classified.vcf'],
+    'read_stats_sketch': lambda data, rundir: [
+        'read_stats_sketch', data.qc['tumor']['read_stats'], '-o', 'sketch.npz'],
+    'report_qc': lambda data, rundir: [
+        'report_qc', '--name', SAMPLE, '--sample_id', SAMPLE,
+        *[arg for sample in ('tumor', 'normal') for arg in (
+            f'--read_stats_{sample}', data.qc[sample]['read_stats'],
+            f'--flagstat_{sample}', data.qc[sample]['flagstat'],
+            f'--mosdepth_summary_{sample}', data.qc[sample]['summary'],
+            f'--depth_{sample}', data.qc[sample]['regions'])],
+        '--tumor_cov_threshold', '20', '--normal_cov_threshold', '20',
+        '--window_size', str(data.qc['window']), '--reference_fai', data.qc['fai'],
+        *_report_args(data)],
+    'report_snv': lambda data, rundir: [
+        'report_snv', 'report.html', '--vcf', data.snv_annotations['vcf'],
+        '--variant_arrays', data.snv_annotations['arrays'],
+        '--vcf_stats', data.snv_annotations['stats'],
+        '--mut_spectra', data.snv_annotations['spectra'], *_report_args(data)],
+    'report_sv': lambda data, rundir: [
+        'report_sv', 'report.html', '--vcf', _link(data.sv['vcf'], rundir),
+        *_report_args(data)],
+    'report_mod': lambda data, rundir: [
+        'report_mod', 'report.html', '--tumor_summary', data.mod['tumor'],
+        '--normal_summary', data.mod['normal'], '--dml', data.mod['dml'],
+        '--dmr', data.mod['dmr'], '--reference_fai', data.mod['fai'],
+        '--sample_name', SAMPLE, *_report_args(data)],
+}
+
+
+def run_once(name, data, rundir):
+    """Run a benchmark once.
+
+    :param name: name of the benchmark.
+    :param data: `Dataset` of the inputs.
+    :param rundir: directory the subcommand is run in; it is replaced.
+    :returns: dictionary with the exit code, the time of the process
+        (`elapsed`) and, for successful runs, the metrics of the subcommand.
+    """
+    if os.path.exists(rundir):
+        shutil.rmtree(rundir)
+    os.makedirs(rundir)
+    argv = BENCHMARKS[name](data, rundir)
+    metrics = os.path.join(rundir, 'metrics.json')
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, GLUE, '--metrics-json', metrics, *argv],
+        cwd=rundir, capture_output=True, text=True)
+    result = {
+        'exit_code': proc.returncode,
+        'elapsed': round(time.perf_counter() - start, 6)}
+    if proc.returncode != 0 or not os.path.exists(metrics):
+        result['error'] = proc.stderr[-2000:]
+        return result
+    with open(metrics) as fh:
+        metrics = json.load(fh)
+    result.update({
+        'wall_time': metrics['wall_time'],
+        'cpu_time': round(sum(metrics['cpu_time'].values()), 6),
+        'peak_rss': metrics['peak_rss'],
+        'children_peak_rss': metrics['children_peak_rss'],
+        'records': metrics['records'],
+        'phases': metrics['phases']})
+    return result
+
+
+def summarise(runs, records):
+    """Summarise the runs of a benchmark with medians.
+
+    :param runs: results of `run_once`.
+    :param records: number of records of the inputs.
+    """
+    done = [run for run in runs if run['exit_code'] == 0]
+    if not done:
+        return {'error': runs[-1].get('error', '')}
+    wall_time = statistics.median(run['wall_time'] for run in done)
+    return {
+        'wall_time': wall_time,
+        'throughput': records / wall_time if wall_time > 0 else None,
+        'peak_rss': statistics.median(run['peak_rss'] for run in done)}
+
+
+def run_benchmarks(
+        names, scales, workdir, repeats=1, seed=0, keep=False, logger=None):
+    """Run benchmarks at several scales.
+
+    :param names: names of the benchmarks.
+    :param scales: numbers of records.
+    :param workdir: directory of the inputs and runs.
+    :param repeats: number of runs of each benchmark.
+    :param seed: seed of the synthetic inputs.
+    :param keep: keep the outputs of the runs.
+    :param logger: logger reporting the results.
+    :returns: dictionary of results, by `<name>/<scale>`.
+    """
+    workdir = os.path.abspath(workdir)
+    results = {}
+    for scale in scales:
+        data = Dataset(os.path.join(workdir, f'data.{scale}'), scale, seed=seed)
+        for name in names:
+            runs = []
+            for repeat in range(repeats):
+                rundir = os.path.join(workdir, 'runs', f'{name}.{scale}.{repeat}')
+                runs.append(run_once(name, data, rundir))
+                if not keep:
+                    shutil.rmtree(rundir)
+            result = {
+                'command': name, 'scale': scale, 'records': scale,
+                **summarise(runs, scale), 'runs': runs}
+            results[f'{name}/{scale}'] = result
+            if logger is None:
+                continue
+            if 'error' in result:
+                logger.warning(f"{name} at {scale:,} records failed.")
+            else:
+                logger.info(
+                    f"{name} at {scale:,} records: {result['wall_time']:.2f}s, "
+                    f"{result['throughput']:,.0f} records/s, "
+                    f"{result['peak_rss'] / 2**20:,.0f} MiB.")
+    return results
+
+
+def environment():
+    """Describe the machine the benchmarks run on."""
+    return {
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'hostname': platform.node(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count()}
@@ -0,0 +1,474 @@
+"""Synthetic inputs of the workflow scripts, at a configurable scale.
+
+The generators write files with the layout of the tools of the workflow
+(modkit, ClairS, nanomonsv, bamstats, mosdepth and DSS), with random but
+consistent content: variants match the reference sequence, records are
+sorted by position, and values are in plausible ranges. Records are built
+with NumPy and written in chunks, so that large inputs can be generated.
+"""
+import gzip
+import os
+
+import numpy as np
+import pandas as pd
+import pysam
+
+BASES = np.frombuffer(b'ACGT', dtype=np.uint8)
+# Records written at once
+CHUNK_SIZE = 1000000
+
+
+def genome_lengths(n_records):
+    """Return chromosome lengths suitable for `n_records` records.
+
+    The genome grows with the number of records, between 24 Mb and 100 Mb
+    for the largest chromosomes, so that records are spread but the reference
+    stays small. Chromosomes are longer than the 10 Mb below which report_qc
+    does not plot coverage.
+    """
+    length = int(min(max(n_records * 20, 24000000), 100000000))
+    return {'chr1': length, 'chr2': length, 'chr3': length // 2}
+
+
+def reference(fname, lengths, rng):
+    """Write a random reference FASTA and its index.
+
+    :param fname: output FASTA.
+    :param lengths: dictionary of chromosome lengths.
+    :param rng: NumPy random generator.
+    :returns: dictionary of the sequences as arrays of ASCII codes.
+    """
+    sequences = {}
+    with open(fname, 'wb') as fh:
+        for chrom, length in lengths.items():
+            seq = BASES[rng.integers(0, 4, size=length, dtype=np.uint8)]
+            sequences[chrom] = seq
+            fh.write(f'>{chrom}\n'.encode())
+            # Lines of 60 bases
+            full = length // 60
+            lines = np.empty((full, 61), dtype=np.uint8)
+            lines[:, :60] = seq[:full * 60].reshape(full, 60)
+            lines[:, 60] = ord('\n')
+            fh.write(lines.tobytes())
+            if length % 60:
+                fh.write(seq[full * 60:].tobytes() + b'\n')
+    pysam.faidx(fname)
+    return sequences
+
+
+def _positions(lengths, n, rng, margin=10):
+    """Draw sorted positions (1-based) on each chromosome, proportionally to length.
+
+    :returns: list of (chromosome, positions) tuples.
+    """
+    names = list(lengths)
+    sizes = np.array([lengths[c] for c in names], dtype=float)
+    counts = rng.multinomial(n, sizes / sizes.sum())
+    return [
+        (chrom, np.sort(rng.integers(margin, lengths[chrom] - margin, size=k)))
+        for chrom, k in zip(names, counts)]
+
+
+def _write_table(fh, df):
+    """Append a dataframe to an open text file, without header."""
+    df.to_csv(fh, sep='\t', header=False, index=False, lineterminator='\n')
+
+
+def bedmethyl(fname, n, lengths, rng):
+    """Write a gzipped modkit bedMethyl with `n` records.
+
+    :param fname: output file, ending in `.gz`.
+    :param n: number of records.
+    :param lengths: dictionary of chromosome lengths.
+    :param rng: NumPy random generator.
+    """
+    with gzip.open(fname, 'wt', compresslevel=1) as fh:
+        for chrom, positions in _positions(lengths, n, rng):
+            for start in range(0, positions.size, CHUNK_SIZE):
+                pos = positions[start:start + CHUNK_SIZE]
+                k = pos.size
+                valid = rng.integers(5, 60, size=k)
+                mod = rng.binomial(valid, 0.6)
+                other = rng.binomial(valid - mod, 0.1)
+                _write_table(fh, pd.DataFrame({
+                    'chrom': chrom, 'start': pos, 'end': pos + 1,
+                    'code': rng.choice(['m', 'h'], size=k, p=[0.8, 0.2]),
+                    'score': valid,
+                    'strand': rng.choice(['+', '-'], size=k),
+                    'tstart': pos, 'tend': pos + 1, 'color': '255,0,0',
+                    'valid': valid,
+                    'frac': np.round(100 * mod / valid, 2),
+                    'mod': mod, 'canonical': valid - mod - other,
+                    'other': other, 'delete': 0,
+                    'fail': rng.integers(0, 3, size=k), 'diff': 0,
+                    'nocall': 0}))
+
+
+CLAIRS_HEADER = """##fileformat=VCFv4.2
+##source=ClairS
+##FILTER=<ID=PASS,Description="All filters passed">
+##FILTER=<ID=LowQual,Description="Low quality variant">
+##FILTER=<ID=RefCall,Description="Reference call">
+##FILTER=<ID=NonSomatic,Description="Non-somatic variant">
+##INFO=<ID=H,Number=0,Type=Flag,Description="Hybrid variant">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+##FORMAT=<ID=GQ,Number=1,Type=Integer,Description="Genotype quality">
+##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Tumor read depth">
+##FORMAT=<ID=AF,Number=1,Type=Float,Description="Tumor alternative allele frequency">
+##FORMAT=<ID=NDP,Number=1,Type=Integer,Description="Normal read depth">
+##FORMAT=<ID=NAF,Number=1,Type=Float,Description="Normal alternative allele frequency">
+"""
+
+
+def clairs_vcf(fname, n, sequences, rng, sample='SAMPLE', indel_rate=0.1):
+    """Write a ClairS-style somatic VCF with `n` records.
+
+    Alleles match the reference; a fraction of the records are short
+    insertions and deletions.
+
+    :param fname: output VCF.
+    :param n: number of records.
+    :param sequences: dictionary of sequences from `reference`.
+    :param rng: NumPy random generator.
+    :param sample: name of the sample.
+    :param indel_rate: fraction of indels.
+    """
+    lengths = {chrom: seq.size for chrom, seq in sequences.items()}
+    with open(fname, 'w') as fh:
+        fh.write(CLAIRS_HEADER)
+        for chrom, length in lengths.items():
+            fh.write(f'##contig=<ID={chrom},length={length}>\n')
+        fh.write(
+            '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\t'
+            f'{sample}\n')
+        for chrom, positions in _positions(lengths, n, rng):
+            seq = sequences[chrom]
+            for start in range(0, positions.size, CHUNK_SIZE):
+                pos = positions[start:start + CHUNK_SIZE]
+                k = pos.size
+                codes = seq[pos - 1]
+                ref = codes.view('S1').astype(str)
+                # Change each base to one of the other three
+                shift = rng.integers(1, 4, size=k)
+                index = np.searchsorted(BASES, codes)
+                alt = BASES[(index + shift) % 4].view('S1').astype(str)
+                ref, alt = ref.astype(object), alt.astype(object)
+                for i in np.flatnonzero(rng.random(k) < indel_rate):
+                    size = int(rng.integers(1, 6))
+                    if rng.random() < 0.5:
+                        ref[i] = seq[pos[i] - 1:pos[i] + size].tobytes().decode()
+                        alt[i] = ref[i][0]
+                    else:
+                        alt[i] = ref[i] + BASES[
+                            rng.integers(0, 4, size=size)].tobytes().decode()
+                depth = rng.integers(10, 80, size=k)
+                af = np.round(rng.beta(2, 6, size=k), 4)
+                ndepth = rng.integers(10, 60, size=k)
+                naf = np.round(rng.beta(1, 40, size=k), 4)
+                gq = rng.integers(1, 60, size=k)
+                sample_col = pd.Series(
+                    ['0/1:'] * k) + gq.astype(str) + ':' + depth.astype(str) \
+                    + ':' + af.astype(str) + ':' + ndepth.astype(str) + ':' \
+                    + naf.astype(str)
+                _write_table(fh, pd.DataFrame({
+                    'chrom': chrom, 'pos': pos, 'id': '.', 'ref': ref,
+                    'alt': alt, 'qual': gq,
+                    'filter': rng.choice(
+                        ['PASS', 'LowQual', 'NonSomatic'], size=k,
+                        p=[0.7, 0.2, 0.1]),
+                    'info': '.', 'format': 'GT:GQ:DP:AF:NDP:NAF',
+                    'sample': sample_col.values}))
+
+
+NANOMONSV_HEADER = """##fileformat=VCFv4.3
+##source=nanomonsv
+##FILTER=<ID=PASS,Description="All filters passed">
+##FILTER=<ID=Too_low_VAF,Description="Variant allele frequency is too low">
+##INFO=<ID=SVTYPE,Number=1,Type=String,Description="Type of structural variant">
+##INFO=<ID=SVLEN,Number=1,Type=Integer,Description="Length of the SV">
+##INFO=<ID=END,Number=1,Type=Integer,Description="End position of the variant">
+##INFO=<ID=MATEID,Number=1,Type=String,Description="ID of mate breakends">
+##INFO=<ID=SVINSLEN,Number=1,Type=Integer,Description="Inserted sequence length">
+##INFO=<ID=SVINSSEQ,Number=.,Type=String,Description="Inserted sequence">
+##ALT=<ID=DEL,Description="Deletion">
+##ALT=<ID=INS,Description="Insertion">
+##FORMAT=<ID=TR,Number=1,Type=Integer,Description="Reads at the breakpoints">
+##FORMAT=<ID=VR,Number=1,Type=Integer,Description="Variant supporting reads">
+"""
+# Columns of the nanomonsv result table, before the filter column
+NANOMONSV_COLUMNS = [
+    'Chr_1', 'Pos_1', 'Dir_1', 'Chr_2', 'Pos_2', 'Dir_2', 'Inserted_Seq',
+    'Checked_Read_Num_Tumor', 'Supporting_Read_Num_Tumor',
+    'Checked_Read_Num_Control', 'Supporting_Read_Num_Control', 'SV_ID']
+# Columns added by nanomonsv insert_classify
+CLASSIFY_COLUMNS = ['Insert_Type', 'Is_Inversion', 'Inserted_Pos']
+
+
+def nanomonsv(prefix, n, sequences, rng):
+    """Write a nanomonsv VCF with `n` SVs, and its filter and classify tables.
+
+    Deletions and insertions give one record each, translocations two
+    breakend records on different chromosomes (`<SV_ID>_0` and `_1`).
+
+    :param prefix: prefix of the outputs.
+    :param n: number of SVs.
+    :param sequences: dictionary of sequences from `reference`.
+    :param rng: NumPy random generator.
+    :returns: dictionary with the paths of the VCF (`vcf`), the filter
+        table (`filtered`), and the original and annotated tables of
+        insert_classify (`original`, `annotated`).
+    """
+    lengths = {chrom: seq.size for chrom, seq in sequences.items()}
+    names = list(lengths)
+    chrom_index = {chrom: i for i, chrom in enumerate(names)}
+    sites = pd.concat([
+        pd.DataFrame({'chrom': chrom, 'pos': pos})
+        for chrom, pos in _positions(lengths, n, rng, margin=5000)],
+        ignore_index=True)
+    k = sites.shape[0]
+    sites['sv_id'] = [f'r_{i}' for i in range(k)]
+    sites['type'] = rng.choice(['DEL', 'INS', 'BND'], size=k, p=[0.5, 0.35, 0.15])
+    sites['size'] = rng.integers(50, 5000, size=k)
+    sites['tr'] = rng.integers(10, 60, size=k)
+    sites['vr'] = rng.binomial(sites['tr'], 0.3) + 1
+    sites['ntr'] = rng.integers(10, 60, size=k)
+    sites['nvr'] = rng.binomial(sites['ntr'], 0.02)
+    # Mates of the translocations, on the next chromosome
+    bnd = sites['type'] == 'BND'
+    sites['chrom_2'] = sites['chrom']
+    sites['pos_2'] = np.where(
+        sites['type'] == 'DEL', sites['pos'] + sites['size'], sites['pos'])
+    if bnd.any():
+        sites.loc[bnd, 'chrom_2'] = [
+            names[(chrom_index[c] + 1) % len(names)] for c in sites.loc[bnd, 'chrom']]
+        sites.loc[bnd, 'pos_2'] = [
+            int(rng.integers(5000, lengths[c] - 5000))
+            for c in sites.loc[bnd, 'chrom_2']]
+    sites['filter'] = rng.choice(
+        ['PASS', 'Too_low_VAF'], size=k, p=[0.85, 0.15])
+
+    def ref_base(chrom, pos):
+        return chr(sequences[chrom][pos - 1])
+
+    records = []
+    for site in sites.itertuples(index=False):
+        fmt = ('TR:VR', f'{site.tr}:{site.vr}', f'{site.ntr}:{site.nvr}')
+        base = ref_base(site.chrom, site.pos)
+        if site.type == 'DEL':
+            records.append((
+                site.chrom, site.pos, site.sv_id, base, '<DEL>', site.filter,
+                f'SVTYPE=DEL;SVLEN=-{site.size};END={site.pos_2}', *fmt))
+        elif site.type == 'INS':
+            records.append((
+                site.chrom, site.pos, site.sv_id, base, '<INS>', site.filter,
+                f'SVTYPE=INS;SVINSLEN={site.size};END={site.pos}', *fmt))
+        else:
+            mate = ref_base(site.chrom_2, site.pos_2)
+            records.append((
+                site.chrom, site.pos, f'{site.sv_id}_0', base,
+                f'{base}[{site.chrom_2}:{site.pos_2}[', site.filter,
+                f'SVTYPE=BND;MATEID={site.sv_id}_1', *fmt))
+            records.append((
+                site.chrom_2, site.pos_2, f'{site.sv_id}_1', mate,
+                f']{site.chrom}:{site.pos}]{mate}', site.filter,
+                f'SVTYPE=BND;MATEID={site.sv_id}_0', *fmt))
+    vcf = pd.DataFrame(
+        records,
+        columns=[
+            'chrom', 'pos', 'id', 'ref', 'alt', 'filter', 'info', 'format',
+            'tumor', 'control'])
+    vcf['rank'] = vcf['chrom'].map(chrom_index)
+    vcf = vcf.sort_values(['rank', 'pos'], kind='stable').drop(columns='rank')
+    vcf.insert(5, 'qual', '.')
+    paths = {
+        'vcf': f'{prefix}.nanomonsv.vcf',
+        'filtered': f'{prefix}.nanomonsv.result.filtered.txt',
+        'original': f'{prefix}.nanomonsv.insert.txt',
+        'annotated': f'{prefix}.nanomonsv.insert.classified.txt'}
+    with open(paths['vcf'], 'w') as fh:
+        fh.write(NANOMONSV_HEADER)
+        for chrom, length in lengths.items():
+            fh.write(f'##contig=<ID={chrom},length={length}>\n')
+        fh.write('#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tTUMOR\t'
+                 'CONTROL\n')
+        _write_table(fh, vcf)
+    # Result tables, one row per SV
+    table = pd.DataFrame({
+        'Chr_1': sites['chrom'], 'Pos_1': sites['pos'], 'Dir_1': '+',
+        'Chr_2': sites['chrom_2'], 'Pos_2': sites['pos_2'], 'Dir_2': '-',
+        'Inserted_Seq': '---',
+        'Checked_Read_Num_Tumor': sites['tr'],
+        'Supporting_Read_Num_Tumor': sites['vr'],
+        'Checked_Read_Num_Control': sites['ntr'],
+        'Supporting_Read_Num_Control': sites['nvr'],
+        'SV_ID': sites['sv_id']})
+    filtered = table.assign(Is_Filter=np.where(
+        rng.random(k) < 0.9, 'PASS', 'Simple_repeat'))
+    filtered.to_csv(paths['filtered'], sep='\t', index=False)
+    table.to_csv(paths['original'], sep='\t', index=False)
+    table.assign(
+        Insert_Type=rng.choice(['None', 'LINE1', 'Alu;SVA', 'PSD(ENST1)'], size=k),
+        Is_Inversion=rng.choice(['None', 'Inversion'], size=k),
+        Inserted_Pos=rng.choice(['---', 'chr1:100-200,+'], size=k)) \
+        .to_csv(paths['annotated'], sep='\t', index=False)
+    return paths
+
+
+BAMSTATS_COLUMNS = [
+    'name', 'ref', 'coverage', 'ref_coverage', 'qstart', 'qend', 'rstart',
+    'rend', 'aligned_ref_len', 'direction', 'length', 'read_length',
+    'mean_quality', 'start_time', 'match', 'ins', 'del', 'sub', 'iden', 'acc',
+    'duplex', 'sample_name']
+
+
+def bamstats(prefix, n, lengths, rng, sample='SAMPLE'):
+    """Write bamstats per-read and flagstat tables for `n` reads.
+
+    :param prefix: prefix of the outputs.
+    :param n: number of reads.
+    :param lengths: dictionary of chromosome lengths.
+    :param rng: NumPy random generator.
+    :param sample: name of the sample.
+    :returns: dictionary with the paths of the per-read (`read_stats`) and
+        flagstat (`flagstat`) tables.
+    """
+    paths = {
+        'read_stats': f'{prefix}.readstats.tsv',
+        'flagstat': f'{prefix}.flagstat.tsv'}
+    counts = {}
+    with open(paths['read_stats'], 'w') as fh:
+        fh.write('\t'.join(BAMSTATS_COLUMNS) + '\n')
+        done = 0
+        for chrom, starts in _positions(lengths, n, rng, margin=1):
+            counts[chrom] = starts.size
+            for start in range(0, starts.size, CHUNK_SIZE):
+                rstart = starts[start:start + CHUNK_SIZE]
+                k = rstart.size
+                length = np.maximum(
+                    rng.lognormal(8.5, 0.8, size=k).astype(int), 100)
+                sub = rng.binomial(length, 0.02)
+                ins = rng.binomial(length, 0.01)
+                dele = rng.binomial(length, 0.01)
+                match = length - sub - ins
+                aligned = match + sub + dele
+                acc = 100 * match / (length + dele)
+                _write_table(fh, pd.DataFrame({
+                    'name': [f'read{done + i}' for i in range(k)],
+                    'ref': chrom, 'coverage': 99.0, 'ref_coverage': 1.0,
+                    'qstart': 0, 'qend': length, 'rstart': rstart - 1,
+                    'rend': rstart - 1 + aligned, 'aligned_ref_len': aligned,
+                    'direction': rng.choice(['+', '-'], size=k),
+                    'length': length, 'read_length': length,
+                    'mean_quality': np.round(rng.normal(15, 3, size=k), 2),
+                    'start_time': '2023-01-01T00:00:00Z', 'match': match,
+                    'ins': ins, 'del': dele, 'sub': sub,
+                    'iden': np.round(100 * match / (match + sub), 2),
+                    'acc': np.round(acc, 2), 'duplex': 0,
+                    'sample_name': sample}))
+                done += k
+    flagstat = pd.DataFrame({'ref': list(counts) + ['*'], 'sample_name': sample})
+    flagstat['total'] = list(counts.values()) + [0]
+    flagstat['primary'] = flagstat['total']
+    for col in (
+            'secondary', 'supplementary', 'unmapped', 'qcfail', 'duplicate',
+            'duplex', 'duplex_forming'):
+        flagstat[col] = 0
+    flagstat.to_csv(paths['flagstat'], sep='\t', index=False)
+    return paths
+
+
+def mosdepth(prefix, lengths, window, rng, depth=30):
+    """Write mosdepth regions and summary files.
+
+    :param prefix: prefix of the outputs.
+    :param lengths: dictionary of chromosome lengths.
+    :param window: size of the regions.
+    :param rng: NumPy random generator.
+    :param depth: mean depth.
+    :returns: dictionary with the paths of the regions (`regions`) and
+        summary (`summary`) files.
+    """
+    paths = {
+        'regions': f'{prefix}.regions.bed', 'summary': f'{prefix}.summary.txt'}
+    rows = []
+    with open(paths['regions'], 'w') as fh:
+        for chrom, length in lengths.items():
+            starts = np.arange(0, length, window)
+            ends = np.minimum(starts + window, length)
+            values = np.round(rng.gamma(depth, 1, size=starts.size), 2)
+            _write_table(fh, pd.DataFrame({
+                'chrom': chrom, 'start': starts, 'end': ends, 'depth': values}))
+            bases = float((values * (ends - starts)).sum())
+            rows.append((chrom, length, bases, bases / length, 0, int(values.max())))
+    length = sum(lengths.values())
+    bases = sum(row[2] for row in rows)
+    rows.append(('total', length, bases, bases / length, 0, max(r[5] for r in rows)))
+    summary = pd.DataFrame(
+        rows, columns=['chrom', 'length', 'bases', 'mean', 'min', 'max'])
+    summary.to_csv(paths['summary'], sep='\t', index=False)
+    return paths
+
+
+def dss(directory, n_dml, n_dmr, lengths, rng, sample='SAMPLE', mods=('5mC', '5hmC')):
+    """Write DSS DML and DMR tables for each modification.
+
+    :param directory: output directory; tables are written in its `DML` and
+        `DMR` subdirectories, named `<sample>.<mod>.dml.tsv`.
+    :param n_dml: number of DMLs of each modification.
+    :param n_dmr: number of DMRs of each modification.
+    :param lengths: dictionary of chromosome lengths.
+    :param rng: NumPy random generator.
+    :param sample: name of the sample.
+    :param mods: modifications.
+    :returns: dictionary with the paths of the DML and DMR directories.
+    """
+    paths = {
+        'dml': os.path.join(directory, 'DML'), 'dmr': os.path.join(directory, 'DMR')}
+    for path in paths.values():
+        os.makedirs(path, exist_ok=True)
+    for mod in mods:
+        with open(os.path.join(paths['dml'], f'{sample}.{mod}.dml.tsv'), 'w') as fh:
+            fh.write(
+                'chr\tpos\tmu1\tmu2\tdiff\tdiff.se\tstat\tphi1\tphi2\tpval\tfdr\t'
+                'postprob.overThreshold\n')
+            for chrom, pos in _positions(lengths, n_dml, rng):
+                k = pos.size
+                mu1, mu2 = rng.random(k), rng.random(k)
+                pval = rng.random(k) ** 3
+                _write_table(fh, pd.DataFrame({
+                    'chr': chrom, 'pos': pos, 'mu1': mu1, 'mu2': mu2,
+                    'diff': mu1 - mu2, 'diff.se': rng.random(k) / 2,
+                    'stat': rng.normal(size=k), 'phi1': rng.random(k),
+                    'phi2': rng.random(k), 'pval': pval,
+                    'fdr': np.minimum(pval * 2, 1),
+                    'postprob.overThreshold': rng.random(k)}))
+        with open(os.path.join(paths['dmr'], f'{sample}.{mod}.dmr.tsv'), 'w') as fh:
+            fh.write(
+                'chr\tstart\tend\tlength\tnCG\tmeanMethy1\tmeanMethy2\t'
+                'diff.Methy\tareaStat\n')
+            for chrom, start in _positions(lengths, n_dmr, rng, margin=1000):
+                k = start.size
+                length = rng.integers(50, 500, size=k)
+                m1, m2 = rng.random(k), rng.random(k)
+                _write_table(fh, pd.DataFrame({
+                    'chr': chrom, 'start': start, 'end': start + length,
+                    'length': length, 'nCG': rng.integers(3, 30, size=k),
+                    'meanMethy1': m1, 'meanMethy2': m2, 'diff.Methy': m1 - m2,
+                    'areaStat': rng.normal(0, 20, size=k)}))
+    return paths
+
+
+def modkit_summary(fname, rng, threshold=0.8):
+    """Write a modkit summary table of C modifications."""
+    total = int(rng.integers(100000, 1000000))
+    fracs = rng.dirichlet([6, 1, 3])
+    counts = (fracs * total).astype(int)
+    with open(fname, 'w') as fh:
+        fh.write(
+            '# bases\tC\n'
+            f'# total_reads_used\t{total}\n'
+            f'# count_reads_C\t{total}\n'
+            f'# pass_threshold_C\t{threshold}\n'
+            'base\tcode\tpass_count\tpass_frac\tall_count\tall_frac\n')
+        for code, count, frac in zip(('-', 'm', 'h'), counts, fracs):
+            fh.write(f'C\t{code}\t{count}\t{frac}\t{count}\t{frac}\n')
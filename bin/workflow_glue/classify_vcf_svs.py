@@ -11,6 +11,7 @@ import sys
 
 import pysam
 
+from .util import get_named_logger, hts_position, Progress  # noqa: ABS101
 from .util import wf_parser  # noqa: ABS101
 
 # NOTE Both OK and DATAERR are permissible exits from this script so
@@ -99,7 +100,12 @@ def main(args):
             "[FAIL] Impossible to create the output files."
         )
         sys.exit()
+    progress = Progress(
+        get_named_logger("classify"), total_bytes=os.path.getsize(args.in_vcf),
+        position=hts_position(i_vcf))
     for rec in i_vcf:
+        progress.update()
         rec.info.__setitem__('REPCLASS', fetch_value(site_annots, rec.id, default='.'))
         o_vcf.write(rec)
+    progress.done()
     o_vcf.close()
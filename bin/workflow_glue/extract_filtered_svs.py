@@ -10,6 +10,7 @@ import os
 import sys
 
 import pysam
+from .util import get_named_logger, hts_position, Progress  # noqa: ABS101
 from .util import wf_parser  # noqa: ABS101
 
 # NOTE Both OK and DATAERR are permissible exits from this script so
@@ -73,9 +74,14 @@ def main(args):
             "[FAIL] Impossible to create the output files."
         )
         sys.exit()
+    progress = Progress(
+        get_named_logger("filter_svs"), total_bytes=os.path.getsize(args.in_vcf),
+        position=hts_position(i_vcf))
     for rec in i_vcf:
+        progress.update()
         filt = fetch_value(sites_id, rec.id, default='PASS')
         if filt not in rec.filter.keys() or filt == 'PASS':
             rec.filter.add(fetch_value(sites_id, rec.id, default='PASS'))
         o_vcf.write(rec)
+    progress.done()
     o_vcf.close()
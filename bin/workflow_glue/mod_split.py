@@ -4,9 +4,9 @@
 import gzip
 import os
 
-from ezcharts.components.common import MOD_CONVERT
-
-from .util import get_named_logger, wf_parser  # noqa: ABS101
+from .report_utils.constants import MOD_CONVERT  # noqa: ABS101
+from .util import file_position, get_named_logger, Progress  # noqa: ABS101
+from .util import wf_parser  # noqa: ABS101
 
 
 def main(args):
@@ -29,7 +29,12 @@ def main(args):
     # Dict of output files
     output_files = {}
     # Start processing the files
-    for line in file_read(args.bedmethyl):
+    fh = file_read(args.bedmethyl)
+    progress = Progress(
+        logger, 'lines', total_bytes=os.path.getsize(args.bedmethyl),
+        position=file_position(fh))
+    for line in fh:
+        progress.update()
         # Get change type
         line = line.decode()
         change = MOD_CONVERT.get(line.split()[3], line.split()[3])
@@ -46,7 +51,10 @@ def main(args):
         # Write the line
         output_files[prefix].write(line)
 
+    progress.done()
+
     # Close everything
+    fh.close()
     for change, filename in output_files.items():
         filename.close()
 
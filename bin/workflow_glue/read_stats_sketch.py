@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+"""Summarise bamstats per-read files into a mergeable sketch."""
+
+from .report_utils.read_stats import ReadStats  # noqa: ABS101
+from .util import get_named_logger, wf_parser  # noqa: ABS101
+
+
+def main(args):
+    """Run the entry point."""
+    logger = get_named_logger("read_stats")
+    logger.info(f'Summarising: {", ".join(args.read_stats)}')
+    stats = ReadStats.from_bamstats(args.read_stats, chunksize=args.chunksize)
+    stats.save(args.output)
+    logger.info(
+        f"Written sketch of {stats.n_reads:,} reads to '{args.output}'.")
+
+
+def argparser():
+    """Argument parser for entrypoint."""
+    parser = wf_parser("read_stats_sketch")
+    parser.add_argument(
+        "read_stats", nargs='+',
+        help="bamstats per-read stats files, or sketches to merge")
+    parser.add_argument(
+        "-o", "--output", required=True,
+        help="Output sketch file (NPZ)")
+    parser.add_argument(
+        "--chunksize", type=int, default=1000000,
+        help="Number of per-read stats rows loaded at once")
+    return parser
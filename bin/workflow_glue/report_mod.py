@@ -1,10 +1,11 @@
 #!/usr/bin/env python
 """Create mod base report."""
 
+from concurrent.futures import ProcessPoolExecutor
 import os
+import time
 
 from dominate.tags import a, p
-from ezcharts.components.common import add_missing_windows, CATEGORICAL
 from ezcharts.components.common import fasta_idx, HSA_CHROMOSOME_ORDER
 from ezcharts.components.common import MOD_ORDER
 from ezcharts.components.dss import load_dml, load_dmr
@@ -21,91 +22,147 @@ from pkg_resources import resource_filename
 import sigfig as sg
 
 # Ignoring F401 for CHROMOSOMES since used within eval expressions
-from .report_utils.utils import CHROM_RENAME, CHROMOSOMES  # noqa: ABS101, F401
+from .report_utils.constants import CHROM_RENAME, CHROMOSOMES  # noqa: ABS101, F401
+from .report_utils.coverage import fill_missing_windows  # noqa: ABS101
+from .report_utils.coverage import intervals_to_steps  # noqa: ABS101
+from .report_utils.intervals import window_medians  # noqa: ABS101
+from .report_utils.utils import top_k  # noqa: ABS101
 from .report_utils.visualizations import line_plot  # noqa: ABS101
-from .util import get_named_logger, wf_parser  # noqa: ABS101
+from .util import count_records, get_named_logger, phase, wf_parser  # noqa: ABS101
 
 dss_url = 'https://bioconductor.org/packages/release' +\
     '/bioc/vignettes/DSS/inst/doc/DSS.html'
 
 
-def central_value(df, x, col='values'):
-    """Return the average of a given column in a region."""
-    return df[(df['chrom'] == x.chr) &
-              (df['pos'] >= x.start) &
-              (df['pos'] < x.end)].median(numeric_only=True)[col]
+# Reference index shared with the DSS loading processes
+_FAIDX = None
+
+
+def _init_dss_worker(faidx):
+    """Store the reference index in a loading process."""
+    global _FAIDX
+    _FAIDX = faidx
+
+
+def _load_dss(kind, fname):
+    """Load a DSS output with the shared reference index."""
+    start = time.perf_counter()
+    loader = load_dml if kind == 'dml' else load_dmr
+    return loader(fname, faidx=_FAIDX), time.perf_counter() - start
+
+
+def load_dss_outputs(dml, dmr, faidx, threads=1, logger=None):
+    """Load the DSS DML and DMR outputs of each modification.
+
+    Files are loaded concurrently on a process pool; the reference index is
+    sent once to each process. Loading is timed as the "load" phase, and the
+    loaded DMLs and DMRs are counted as records.
+
+    :param dml: DML file, or directory of files named `<sample>.<mod>.*`.
+    :param dmr: DMR file, or directory of files named `<sample>.<mod>.*`.
+    :param faidx: dataframe from `fasta_idx`.
+    :param threads: number of processes.
+    :param logger: logger used to report the loading time of each file.
+    :returns: dictionaries of DMLs and DMRs by modification.
+    """
+    tasks = []
+    for kind, path in (('dml', dml), ('dmr', dmr)):
+        if os.path.isfile(path):
+            fnames = [path]
+        else:
+            fnames = [f"{path}/{fname}" for fname in os.listdir(path)]
+        for fname in fnames:
+            tasks.append((kind, os.path.basename(fname).split('.')[1], fname))
+    with phase('load'):
+        if threads > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(
+                    max_workers=min(threads, len(tasks)),
+                    initializer=_init_dss_worker, initargs=(faidx,)) as executor:
+                futures = [
+                    executor.submit(_load_dss, kind, fname)
+                    for kind, _, fname in tasks]
+                results = [future.result() for future in futures]
+        else:
+            _init_dss_worker(faidx)
+            results = [_load_dss(kind, fname) for kind, _, fname in tasks]
+    loaded = {'dml': {}, 'dmr': {}}
+    for (kind, mod, fname), (df, elapsed) in zip(tasks, results):
+        if logger is not None:
+            logger.info(f'Loaded {fname} in {elapsed:.2f}s.')
+        loaded[kind][mod] = df
+    count_records(sum(df.shape[0] for df in loaded['dml'].values()), 'DML')
+    count_records(sum(df.shape[0] for df in loaded['dmr'].values()), 'DMR')
+    return loaded['dml'], loaded['dmr']
+
+
+def bin_dml(dml, faidx, window_size):
+    """Summarise DMLs by their median -log10(P-value) in windows.
+
+    :param dml: dataframe of DMLs from `load_dml`.
+    :param faidx: dataframe with chrom and length columns.
+    :param window_size: size of the windows.
+    :returns: dataframe with chrom, pos (window start) and neg_log10_p columns,
+        for the windows with at least one DML.
+    """
+    lengths = faidx.groupby('chrom', observed=True, sort=False)['length'].max()
+    return window_medians(
+        dml['chrom'], dml['pos'], dml['neg_log10_p'], lengths, window_size) \
+        .rename(columns={'start': 'pos', 'value': 'neg_log10_p'}) \
+        .drop(columns=['end'])
 
 
 # Load diff. modified regions
 def intervals_to_points(dmr, faidx, total_ref_starts, colname, logger):
-    """Verticalize dmr intervals."""
-    # output columns
-    outcols = {'chrom': CATEGORICAL, 'pos': int, 'value': float}
-    # Create vertical version of the DMRs
-    outdmr = pd.DataFrame(columns=outcols).astype(outcols)
-    # Ensure it is sorted
-    dmr = dmr.sort_values(['chrom', 'mean_pos'])
+    """Verticalize dmr intervals.
+
+    Given a window:
+    chrom start end value
+    chr1 0 25000 124
+    chr1 25000 50000 12
+    It will generate a dataframe with the format:
+    chrom pos value
+    chr1 0 124
+    chr1 25000 124
+    chr1 25000 12
+    chr1 50000 12
+    This will allow to generate a line chart representing the increase and
+    decrease of modified scores, while keeping the window size.
+    Chromosomes are ordered by karyotype, as the cumulative positions.
+    """
     # Add missing windows to depth intervals
     logger.info('Add missing windows...')
-    dmr = add_missing_windows(dmr, faidx, value='areaStat')
-    # Remove DMRs that are in sequences not in total_ref_starts
-    dmr = dmr.loc[dmr['chrom'].isin(total_ref_starts.index)]
-    # Compute progressive position
-    dmr["start"] = dmr.apply(
-        lambda x: x.start + total_ref_starts[x.chrom], axis=1)
-    dmr["end"] = dmr.apply(
-        lambda x: x.end + total_ref_starts[x.chrom], axis=1)
-    # Re-arrange the data in vertical format. Given a window:
-    # chrom start end value
-    # chr1 0 25000 124
-    # chr1 25000 50000 12
-    # It will generate a dataframe with the format:
-    # chrom pos variable value
-    # chr1 0 "start" 124
-    # chr1 25000 "end" 124
-    # chr1 50000 "start" 12
-    # chr1 50000 "end" 12
-    # This will allow to generate a line chart
-    # representing the increase and decrease of
-    # modified scores, while keeping the window size.
+    dmr = fill_missing_windows(dmr, faidx, value=colname)
+    # Order chromosomes by karyotype, then by position along the reference
+    chroms = [i for i in total_ref_starts.index if i in set(dmr['chrom'])]
+    chr_ids = pd.Series(chroms).map(CHROM_RENAME).fillna(pd.Series(chroms)) \
+        .map(CHROMOSOMES).values
+    chroms = [
+        chroms[i] for i in np.lexsort((
+            total_ref_starts[chroms].values, chr_ids, np.isnan(chr_ids)))]
     logger.info('Verticalize...')
-    outdmr = pd.melt(
-        dmr[['chrom', 'start', 'end', colname]],
-        id_vars=['chrom', colname],
-        value_name='pos')
-    # Reordering by chromosome, position and variable, obtaining
-    # where variables can be start/end as mentioned above.
-    logger.info('Re-order the data...')
-    outdmr['chrom'] = outdmr['chrom'].cat.rename_categories(CHROM_RENAME)
-    outdmr = outdmr\
-        .eval("chr_id = chrom.map(@CHROMOSOMES)") \
-        .sort_values(["chr_id", "pos", "variable"]) \
-        .drop(columns=['chr_id'])
-    outdmr['chrom'] = \
-        outdmr.chrom.cat.remove_unused_categories()
-    outdmr['chrom'] = \
-        outdmr.chrom.cat.reorder_categories(
-        [i for i in outdmr.chrom.unique()])
-    # Drop unused cols and fix column IDs
-    outdmr = outdmr\
-        .drop(columns=['variable'])\
-        .rename(columns={colname: 'value'})
+    outdmr = intervals_to_steps(dmr, total_ref_starts, colname, order=chroms)
+    outdmr['chrom'] = outdmr['chrom'].cat.rename_categories(
+        lambda x: CHROM_RENAME.get(x, x))
     outdmr['value'] = outdmr['value'].fillna(0)
     return outdmr
 
 
 def summary_values(df, n=100, columns=None):
-    """Extract top and bottom."""
+    """Extract top and bottom.
+
+    Rows are listed by column, top values first, and rows selected for
+    more than one column are kept at their first occurrence.
+    """
     if isinstance(columns, str):
         columns = [columns]
-    dfs = []
-    for column in columns:
-        dfs.append(df.sort_values(
-            column, ascending=False)[0:n])
-        dfs.append(df.sort_values(
-            column, ascending=True)[0:n])
-    out_df = pd.concat(dfs).drop_duplicates()
-    return out_df
+    values = df[columns].to_numpy(dtype=float)
+    top = top_k(values, n, ascending=False)
+    bottom = top_k(values, n, ascending=True)
+    rows = np.concatenate([
+        i for pair in zip(top.T, bottom.T) for i in pair])
+    # Deduplicate by position, keeping the first occurrence
+    _, first = np.unique(rows, return_index=True)
+    return df.iloc[rows[np.sort(first)]]
 
 
 def main(args):
@@ -153,25 +210,9 @@ def main(args):
     n_df[['sample', 'type']] = n_df.filename.str.split('.', expand=True)[[0, 1]]
     n_df = n_df.replace('modC', '-')
 
-    logger.info(f'Load: {args.dml}')
-    if os.path.isfile(args.dml):
-        mod = args.dml.split('.')[1]
-        dmls = {mod: load_dml(args.dml, faidx=faidx)}
-    else:
-        dmls = {}
-        for fname in os.listdir(args.dml):
-            mod = fname.split('.')[1]
-            dmls.update({mod: load_dml(f"{args.dml}/{fname}", faidx=faidx)})
-
-    logger.info(f'Load: {args.dmr}')
-    if os.path.isfile(args.dmr):
-        mod = args.dmr.split('.')[1]
-        dmrs = {mod: load_dmr(args.dmr, faidx=faidx)}
-    else:
-        dmrs = {}
-        for fname in os.listdir(args.dmr):
-            mod = fname.split('.')[1]
-            dmrs.update({mod: load_dmr(f"{args.dmr}/{fname}", faidx=faidx)})
+    logger.info(f'Load: {args.dml}, {args.dmr}')
+    dmls, dmrs = load_dss_outputs(
+        args.dml, args.dmr, faidx, threads=args.threads, logger=logger)
 
     # Instantiate the report
     report = LabsReport(
@@ -262,10 +303,12 @@ def main(args):
                     if dml.empty:
                         p('No differentially modified loci to show.')
                         continue
-                    # Create intervals for the density plot
+                    # Summarise the DMLs in windows
                     plt = karyomap(
-                        dml, 'chrom', 'pos', 'neg_log10_p', stats='median',
-                        order=HSA_CHROMOSOME_ORDER, ref_lengths=faidx)
+                        bin_dml(dml, faidx, args.window_size),
+                        'chrom', 'pos', 'neg_log10_p',
+                        stats='median', order=HSA_CHROMOSOME_ORDER,
+                        ref_lengths=faidx, window_size=args.window_size)
                     # Prepare the plot.
                     EZChart(plt, theme='epi2melabs')
 
@@ -326,7 +369,8 @@ def main(args):
                     plt = line_plot(
                         area.round(4), 'pos', 'value',
                         'chrom', f'DMR (areaStat for modification: {mod})',
-                        xaxis='cumulative position', yaxis='Area Statistic')
+                        xaxis='cumulative position', yaxis='Area Statistic',
+                        max_points=args.max_line_points or None)
                     for s in plt.series:
                         s.symbolSize = 3
                     p('Differentially modified regions along the genome.')
@@ -350,7 +394,8 @@ def main(args):
                         use_index=False)
 
     # write report
-    report.write(args.report)
+    with phase('render'):
+        report.write(args.report)
     logger.info(f"Written report to '{args.report}'.")
 
 
@@ -392,6 +437,14 @@ def argparser():
     parser.add_argument(
         "--window_size", default=1000000, type=int,
         help="Window size for visualization DML heatmap.")
+    parser.add_argument(
+        "--max_line_points", default=20000, type=int,
+        help=(
+            "Maximum number of points in the DMR line plots, selected with "
+            "Largest-Triangle-Three-Buckets. Set to 0 to plot all points."))
+    parser.add_argument(
+        "--threads", default=1, type=int,
+        help="Number of processes used to load the DSS outputs.")
     parser.add_argument(
         "--sample_name", default="SAMPLE",
         help="Sample name.")
@@ -4,32 +4,50 @@
 from dominate.tags import a, p
 from ezcharts.components.common import fasta_idx
 from ezcharts.components.ezchart import EZChart
-from ezcharts.components.fastcat import load_bamstats_flagstat, load_stats
+from ezcharts.components.fastcat import load_bamstats_flagstat
 from ezcharts.components.mosdepth import load_mosdepth_regions, load_mosdepth_summary
 from ezcharts.components.reports.labs import LabsReport
 from ezcharts.components.theme import LAB_head_resources
 from ezcharts.layout.snippets import DataTable, Grid, Stats, Tabs
+import numpy as np
 import pandas as pd
 
-from .report_utils.utils import COLORS, compute_n50  # noqa: ABS101
+from .report_utils.constants import COLORS  # noqa: ABS101
+from .report_utils.coverage import coverage_track  # noqa: ABS101
+from .report_utils.loader import InputLoader  # noqa: ABS101
+from .report_utils.read_stats import ReadStats  # noqa: ABS101
 from .report_utils.utils import compare_max_axes  # noqa: ABS101
-from .report_utils.visualizations import hist_plot, line_plot  # noqa: ABS101
-from .util import get_named_logger, wf_parser  # noqa: ABS101
+from .report_utils.visualizations import binned_hist_plot, line_plot  # noqa: ABS101
+from .util import get_named_logger, phase, wf_parser  # noqa: ABS101
+
+
+def compare_max_counts(stats_t, stats_n, col, binwidth, buffer=1.1):
+    """Compute the max histogram height of a column in two samples."""
+    heights = [
+        stats.hists[col].rebin(binwidth)[1].max(initial=0)
+        for stats in (stats_t, stats_n)]
+    return np.ceil(max(heights) * buffer)
+
+
+def load_coverage(fname, faidx, winsize, max_points=None):
+    """Load a mosdepth regions file as a compact coverage track."""
+    df = load_mosdepth_regions(
+        fname, faidx=faidx, winsize=winsize, min_size=10000000)
+    return coverage_track(df, max_points=max_points)
 
 
 # Reporting function
-def populate_report(report, args, **kwargs):
-    """Populate the report with the different sections."""
+def populate_report(report, args, loader, logger):
+    """Populate the report with the different sections.
+
+    Inputs are retrieved from the `InputLoader` when first needed, so that
+    the first sections are built while the coverage tracks are loading.
+    """
     # Extract data used
-    stats_df_t = kwargs['stats_df_t']
-    stats_df_n = kwargs['stats_df_n']
-    flags_df_t = kwargs['flags_df_t']
-    flags_df_n = kwargs['flags_df_n']
-    depth_su_t = kwargs['depth_su_t']
-    depth_su_n = kwargs['depth_su_n']
-    depth_df_t = kwargs['depth_df_t']
-    depth_df_n = kwargs['depth_df_n']
-    logger = kwargs['logger']
+    read_stats_t = loader.get('read_stats_t')
+    read_stats_n = loader.get('read_stats_n')
+    depth_su_t = loader.get('depth_su_t')[0]
+    depth_su_n = loader.get('depth_su_n')[0]
 
     # Average total coverage
     logger.info('Compute average cvg...')
@@ -43,8 +61,8 @@ def populate_report(report, args, **kwargs):
 
     # Compute N50s for later use
     logger.info('Compute N50...')
-    t_n50 = compute_n50(stats_df_t['read_length'].values)
-    n_n50 = compute_n50(stats_df_n['read_length'].values)
+    t_n50 = int(read_stats_t.hists['read_length'].n50())
+    n_n50 = int(read_stats_n.hists['read_length'].n50())
 
     # Save coverages
     t_cov = depth_su_t.loc[depth_su_t['chrom'] == 'total', 'mean'].values[0]
@@ -70,8 +88,8 @@ def populate_report(report, args, **kwargs):
             Stats(
                 columns=2,
                 items=[
-                    (f'{"{:,}".format(len(stats_df_t.index))}', 'Tumor Total Reads'),
-                    (f'{"{:,}".format(len(stats_df_n.index))}', 'Normal Total Reads'),
+                    (f'{"{:,}".format(read_stats_t.n_reads)}', 'Tumor Total Reads'),
+                    (f'{"{:,}".format(read_stats_n.n_reads)}', 'Normal Total Reads'),
                     (
                         f'{"{:,}".format(t_n50)} bp',
                         'Tumor Read N50'),
@@ -100,9 +118,9 @@ def populate_report(report, args, **kwargs):
         df = pd.DataFrame({
             'Sample': [args.sample_id, args.sample_id],
             'Type': ['Tumor', 'Normal'],
-            'Total Reads': [len(stats_df_t.index), len(stats_df_n.index)],
-            'Median Read Length': [int(stats_df_t['read_length'].median()),
-                                   int(stats_df_n['read_length'].median())],
+            'Total Reads': [read_stats_t.n_reads, read_stats_n.n_reads],
+            'Median Read Length': [int(read_stats_t.hists['read_length'].median()),
+                                   int(read_stats_n.hists['read_length'].median())],
             'Read N50': [t_n50, n_n50],
             'Min chrom. coverage': [depth_su_t['mean'].min(), depth_su_n['mean'].min()],
             'Mean chrom. coverage': [t_cov, n_cov],
@@ -117,18 +135,18 @@ def populate_report(report, args, **kwargs):
         tabs = Tabs()
         with tabs.add_tab(args.sample_id):
             with Grid():
-                max_y = compare_max_axes(
-                    stats_df_t, stats_df_n, 'read_length',
-                    ptype='hist', binwidth=1000)
+                max_y = compare_max_counts(
+                    read_stats_t, read_stats_n, 'read_length', binwidth=1000)
                 inputs = (
-                    (stats_df_t, t_n50, "Tumor Read Length", COLORS.cerulean),
-                    (stats_df_n, n_n50, "Normal Read Length", COLORS.green)
+                    (read_stats_t, t_n50, "Tumor Read Length", COLORS.cerulean),
+                    (read_stats_n, n_n50, "Normal Read Length", COLORS.green)
                 )
-                for (df, n50, header, color) in inputs:
-                    plt = hist_plot(
-                        df, 'read_length', header, xaxis='Read length', color=color,
+                for (stats, n50, header, color) in inputs:
+                    plt = binned_hist_plot(
+                        stats.hists['read_length'], header, 1000,
+                        xaxis='Read length', color=color,
                         yaxis='Number of reads', extra_metric={'N50': n50},
-                        binwidth=1000, max_y=max_y, rounding=0)
+                        max_y=max_y, rounding=0)
                     EZChart(plt, 'epi2melabs')
             p("""Red: read N50; Yellow: mean length; Purple: median length.""")
 
@@ -138,18 +156,17 @@ def populate_report(report, args, **kwargs):
         tabs = Tabs()
         with tabs.add_tab(args.sample_id):
             with Grid():
-                max_y = compare_max_axes(
-                    stats_df_t, stats_df_n, 'mean_quality',
-                    ptype='hist', binwidth=0.5)
+                max_y = compare_max_counts(
+                    read_stats_t, read_stats_n, 'mean_quality', binwidth=0.5)
                 inputs = (
-                    (stats_df_t, "Tumor Mean Read Quality", COLORS.cerulean),
-                    (stats_df_n, "Normal Mean Read Quality", COLORS.green)
+                    (read_stats_t, "Tumor Mean Read Quality", COLORS.cerulean),
+                    (read_stats_n, "Normal Mean Read Quality", COLORS.green)
                 )
-                for (df, header, color) in inputs:
-                    plt = hist_plot(
-                        df, 'mean_quality', header, xaxis='Mean read quality',
-                        color=color, yaxis='Number of reads', binwidth=0.5, max_y=max_y,
-                        rounding=1)
+                for (stats, header, color) in inputs:
+                    plt = binned_hist_plot(
+                        stats.hists['mean_quality'], header, 0.5,
+                        xaxis='Mean read quality', color=color,
+                        yaxis='Number of reads', max_y=max_y, rounding=1)
                     EZChart(plt, 'epi2melabs')
             p("""Yellow: mean length; Purple: median length.""")
 
@@ -158,6 +175,8 @@ def populate_report(report, args, **kwargs):
     with report.add_section('Alignment statistics', 'Alignments'):
         tabs = Tabs()
         with tabs.add_tab(args.sample_id):
+            flags_df_t = loader.get('flags_df_t')
+            flags_df_n = loader.get('flags_df_n')
             flags_df_t.insert(0, 'Type', 'Tumor')
             flags_df_n.insert(0, 'Type', 'Normal')
             data_table = pd.concat((flags_df_t, flags_df_n)).drop(columns=['unmapped'])
@@ -165,18 +184,17 @@ def populate_report(report, args, **kwargs):
 
             # Add accuracy plot
             with Grid():
-                max_y = compare_max_axes(
-                    stats_df_t, stats_df_n, 'acc',
-                    ptype='hist', binwidth=0.1)
+                max_y = compare_max_counts(
+                    read_stats_t, read_stats_n, 'acc', binwidth=0.1)
                 inputs = (
-                    (stats_df_t, "Tumor Alignment Accuracy", COLORS.cerulean),
-                    (stats_df_n, "Normal Alignment Accuracy", COLORS.green)
+                    (read_stats_t, "Tumor Alignment Accuracy", COLORS.cerulean),
+                    (read_stats_n, "Normal Alignment Accuracy", COLORS.green)
                 )
-                for (df, header, color) in inputs:
-                    plt = hist_plot(
-                        df, 'acc', header, xaxis='Accuracy [%]',
+                for (stats, header, color) in inputs:
+                    plt = binned_hist_plot(
+                        stats.hists['acc'], header, 0.1, xaxis='Accuracy [%]',
                         rounding=1, color=color, yaxis='Number of reads',
-                        binwidth=0.1, max_y=max_y, min_x=80, max_x=100)
+                        max_y=max_y, min_x=80, max_x=100)
                     EZChart(plt, 'epi2melabs')
             p("""Yellow: mean length; Purple: median length.""")
             p("""The distribution is truncated to show the range between 80-100%.""")
@@ -189,6 +207,8 @@ def populate_report(report, args, **kwargs):
             # depth vs genomic coordinate plot on the left and cumulative depth
             # plot on the right
             with Grid():
+                depth_df_t = loader.get('depth_df_t')
+                depth_df_n = loader.get('depth_df_n')
                 max_y = compare_max_axes(
                     depth_df_t, depth_df_n, 'depth',
                     ptype='val')
@@ -222,49 +242,33 @@ def main(args):
         args.params, args.versions,
         head_resources=[*LAB_head_resources])
 
-    # Load data separately for debugging
-    logger.info(f'Loading {args.reference_fai}')
-    faidx = fasta_idx(args.reference_fai)
-
-    logger.info(f'Loading {args.read_stats_tumor}')
-    stats_df_t = load_stats(args.read_stats_tumor, format='bamstats')
-    logger.info(f'Loading {args.read_stats_normal}')
-    stats_df_n = load_stats(args.read_stats_normal, format='bamstats')
-
-    logger.info(f'Loading {args.flagstat_tumor}')
-    flags_df_t = load_bamstats_flagstat(args.flagstat_tumor)
-    logger.info(f'Loading {args.flagstat_normal}')
-    flags_df_n = load_bamstats_flagstat(args.flagstat_normal)
-
-    logger.info(f'Loading {args.mosdepth_summary_tumor}')
-    depth_su_t = load_mosdepth_summary(args.mosdepth_summary_tumor)
-    logger.info(f'Loading {args.mosdepth_summary_normal}')
-    depth_su_n = load_mosdepth_summary(args.mosdepth_summary_normal)
+    # Load the inputs concurrently; the regions need the reference index
+    with InputLoader(threads=args.threads, logger=logger) as loader:
+        loader.submit('faidx', fasta_idx, args.reference_fai)
+        for sfx, sample in (('t', 'tumor'), ('n', 'normal')):
+            loader.submit(
+                f'read_stats_{sfx}', ReadStats.from_bamstats,
+                getattr(args, f'read_stats_{sample}'), chunksize=args.chunksize)
+            loader.submit(
+                f'flags_df_{sfx}', load_bamstats_flagstat,
+                getattr(args, f'flagstat_{sample}'))
+            loader.submit(
+                f'depth_su_{sfx}', load_mosdepth_summary,
+                getattr(args, f'mosdepth_summary_{sample}'))
+            loader.submit(
+                f'depth_df_{sfx}', load_coverage,
+                getattr(args, f'depth_{sample}'), winsize=args.window_size,
+                max_points=args.max_coverage_points or None, requires=('faidx',))
 
-    logger.info(f'Loading {args.depth_tumor}')
-    depth_df_t = load_mosdepth_regions(
-        args.depth_tumor, faidx=faidx, winsize=args.window_size, min_size=10000000)
-    logger.info(f'Loading {args.depth_normal}')
-    depth_df_n = load_mosdepth_regions(
-        args.depth_normal, faidx=faidx, winsize=args.window_size, min_size=10000000)
-
-    # Populate report
-    populate_report(
-        report=report,
-        args=args,
-        stats_df_t=stats_df_t,
-        stats_df_n=stats_df_n,
-        flags_df_t=flags_df_t,
-        flags_df_n=flags_df_n,
-        depth_su_t=depth_su_t[0],
-        depth_su_n=depth_su_n[0],
-        depth_df_t=depth_df_t,
-        depth_df_n=depth_df_n,
-        logger=logger)
+        # Populate report, as the inputs are loaded
+        with phase('compute'):
+            populate_report(
+                report=report, args=args, loader=loader, logger=logger)
 
     # Save report
     report_fname = f"{args.name}-report.html"
-    report.write(report_fname)
+    with phase('render'):
+        report.write(report_fname)
     logger.info(f"Written report to '{report_fname}'.")
 
 
@@ -281,11 +285,11 @@ def argparser():
     )
     parser.add_argument(
         "--read_stats_tumor",
-        help="`bamstats` file of per-read stats for the tumor sample",
+        help="`bamstats` per-read stats or read stats sketch for the tumor sample",
     )
     parser.add_argument(
         "--read_stats_normal",
-        help="`bamstats` file of per-read stats for the normal sample",
+        help="`bamstats` per-read stats or read stats sketch for the normal sample",
     )
     parser.add_argument(
         "--flagstat_tumor",
@@ -338,6 +342,26 @@ def argparser():
         default=50000,
         help="Fai index for the reference genome",
     )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=1000000,
+        help="Number of per-read stats rows loaded at once",
+    )
+    parser.add_argument(
+        "--max_coverage_points",
+        type=int,
+        default=20000,
+        help=(
+            "Maximum number of windows plotted in each coverage track; windows "
+            "are merged keeping the local extremes. Set to 0 to plot all windows."),
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="Number of input files loaded at once",
+    )
     parser.add_argument(
         "--params",
         default=None,
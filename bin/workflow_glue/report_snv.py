@@ -1,7 +1,9 @@
 #!/usr/bin/env python
 """Create SNV report."""
 
+import gzip
 import os
+import tempfile
 
 from dominate.tags import a, h6, p
 from ezcharts.components.bcfstats import load_bcfstats
@@ -14,11 +16,13 @@ import numpy as np
 import pandas as pd
 import pysam
 
-from .report_utils.utils import COLORS, PRECISION  # noqa: ABS101
+from .report_utils.constants import COLORS, PRECISION  # noqa: ABS101
+from .report_utils.visualizations import DENSITY_SERIES  # noqa: ABS101
 from .report_utils.visualizations import plot_profile  # noqa: ABS101
 from .report_utils.visualizations import plot_spectra  # noqa: ABS101
 from .report_utils.visualizations import scatter_plot  # noqa: ABS101
-from .util import get_named_logger, wf_parser  # noqa: ABS101
+from .util import count_records, get_named_logger, hts_position  # noqa: ABS101
+from .util import phase, Progress, wf_parser  # noqa: ABS101
 
 
 # Mutation profile palette to match the COSMIC
@@ -43,7 +47,11 @@ def vcf_parse(args):
     vaf = []
     naf = []
     vtype = []
+    progress = Progress(
+        get_named_logger("report_snp"), 'variants',
+        total_bytes=os.path.getsize(args.vcf), position=hts_position(vcf_df))
     for rec in vcf_df:
+        progress.update()
         flt.append(rec.filter.keys()[0])
         vaf.append(rec.samples[samplename]['AF'])
         naf.append(rec.samples[samplename]['NAF'])
@@ -51,28 +59,128 @@ def vcf_parse(args):
             vtype.append('SNV')
         else:
             vtype.append('Indel')
+    progress.done()
     return samplename, flt, vaf, naf, vtype
 
 
+def load_variant_arrays(fname):
+    """Load the per-variant arrays saved by annotate_mutations."""
+    with np.load(fname, allow_pickle=False) as arrays:
+        samplename = str(arrays['sample'])
+        flt = arrays['filter_names'][arrays['filter']]
+        vaf = arrays['af']
+        naf = arrays['naf']
+        vtype = np.array(['SNV', 'Indel'])[arrays['vtype']]
+    return samplename, flt, vaf, naf, vtype
+
+
+class ThresholdCounter:
+    """Accumulate filter and VAF threshold counts.
+
+    Values can be added in one go or in chunks, so that the counts can be
+    computed while streaming through a VCF. Each chunk is sorted once and
+    all the thresholds are resolved with a single `searchsorted` call.
+    """
+
+    def __init__(self, thresholds):
+        """Initialize the counter.
+
+        :param thresholds: iterable of VAF thresholds.
+        """
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        self.n_sites = 0
+        self.n_pass = 0
+        self.tumor = np.zeros(self.thresholds.size, dtype=np.int64)
+        self.normal = np.zeros(self.thresholds.size, dtype=np.int64)
+
+    def _count_above(self, values):
+        """Count values greater or equal than each threshold."""
+        values = np.asarray(values, dtype=float)
+        values = np.sort(values[~np.isnan(values)])
+        return values.size - np.searchsorted(values, self.thresholds, side='left')
+
+    def update(self, filters, vaf, naf):
+        """Add a chunk of sites to the counts.
+
+        :param filters: first FILTER value of each site.
+        :param vaf: tumor variant allele frequencies.
+        :param naf: normal variant allele frequencies.
+        """
+        filters = np.asarray(filters, dtype=object)
+        self.n_sites += filters.size
+        self.n_pass += int(np.count_nonzero(filters == 'PASS'))
+        self.tumor += self._count_above(vaf)
+        self.normal += self._count_above(naf)
+        return self
+
+    def to_frame(self):
+        """Return the summary table."""
+        summary_table = {
+            'N sites': [self.n_sites, ""],
+            'PASS': [self.n_pass, ""],
+            'not PASS': [self.n_sites - self.n_pass, ""],
+            'Type': ['Tumor', 'Normal']}
+        for threshold, t_count, n_count in zip(
+                self.thresholds, self.tumor, self.normal):
+            summary_table.update({
+                'VAF > {:.2f}'.format(threshold): [t_count, n_count]})
+        return pd.DataFrame(summary_table)
+
+
 def filt_stats(filters, vaf, naf, thresholds=[0.2, 0.1, 0.05]):
     """Plot the filtering stats."""
-    df = pd.DataFrame({'Filter': filters, 'Tumor_AF': vaf, 'Normal_AF': naf})
-    # Filtering table
-    summary_table = {
-        'N sites': [df.count()['Filter'],
-                    ""],
-        'PASS': [df[df['Filter'] == 'PASS'].count()['Filter'],
-                 ""],
-        'not PASS': [df[df['Filter'] != 'PASS'].count()['Filter'],
-                     ""],
-        'Type': ['Tumor', 'Normal']}
-    for threshold in thresholds:
-        summary_table.update({'VAF > {:.2f}'.format(threshold): [
-            df.query(f'Tumor_AF >= {threshold}').shape[0],
-            df.query(f'Normal_AF >= {threshold}').shape[0]]})
-
-    # Plot the histogram of the allele frequencies in the tumor and normal
-    return pd.DataFrame(summary_table)
+    return ThresholdCounter(thresholds).update(filters, vaf, naf).to_frame()
+
+
+def is_reportable_clinvar(line):
+    """Check if a VCF record has a non-benign ClinVar significance.
+
+    Works on the raw bytes of the line, matching the sites that are
+    retained by `load_clinvar_vcf` with default arguments.
+    """
+    if b'CLNSIG=' not in line:
+        return False
+    info = b';' + line.split(b'\t', 8)[7]
+    start = info.find(b';CLNSIG=')
+    if start < 0:
+        return False
+    start += len(b';CLNSIG=')
+    end = info.find(b';', start)
+    significance = info[start:end if end >= 0 else None].rstrip()
+    return b'benign' not in significance.lower()
+
+
+def prefilter_clinvar_vcf(vcf_fn, out_dir):
+    """Write the reportable ClinVar sites of the input VCF(s) to `out_dir`.
+
+    The input is streamed line by line, so that only the header and the
+    reportable records are kept. BCF inputs are linked as they are.
+
+    :param vcf_fn: VCF file, or directory of VCF files.
+    :param out_dir: output directory.
+    :returns: path to the filtered VCF file or directory.
+    """
+    if os.path.isdir(vcf_fn):
+        fnames = [
+            os.path.join(vcf_fn, i) for i in os.listdir(vcf_fn)
+            if i.endswith(('.vcf', '.vcf.gz', 'bcf'))]
+    else:
+        fnames = [vcf_fn]
+    outputs = []
+    for fname in fnames:
+        basename = os.path.basename(fname)
+        if basename.endswith('bcf'):
+            outputs.append(os.path.join(out_dir, basename))
+            os.symlink(os.path.abspath(fname), outputs[-1])
+            continue
+        outputs.append(os.path.join(
+            out_dir, basename[:-3] if basename.endswith('.gz') else basename))
+        file_read = gzip.open if fname.endswith('.gz') else open
+        with file_read(fname, 'rb') as vcf, open(outputs[-1], 'wb') as out:
+            for line in vcf:
+                if line.startswith(b'#') or is_reportable_clinvar(line):
+                    out.write(line)
+    return out_dir if os.path.isdir(vcf_fn) else outputs[0]
 
 
 def process_spectra(inspectra):
@@ -115,15 +223,23 @@ def main(args):
         raise Exception("Invalid range of variant allele frequencies thresholds.")
 
     # Load the data
-    sample_id, filters, var_af, nvar_af, vtype = vcf_parse(args)
-    filtstats = filt_stats(filters, var_af, nvar_af, thresholds=vaf_thresholds)
-    spectra = process_spectra(args.mut_spectra)
-    try:
-        bcfstats = load_bcfstats(
-            args.vcf_stats,
-            sample_names=[sample_id])
-    except IndexError:
-        bcfstats = {'SN': pd.DataFrame(), 'TSTV': pd.DataFrame()}
+    with phase('load'):
+        if args.variant_arrays is not None and os.path.exists(args.variant_arrays):
+            logger.info(f"Loading per-variant arrays from {args.variant_arrays}.")
+            sample_id, filters, var_af, nvar_af, vtype = load_variant_arrays(
+                args.variant_arrays)
+            count_records(len(var_af), 'variants')
+        else:
+            sample_id, filters, var_af, nvar_af, vtype = vcf_parse(args)
+        spectra = process_spectra(args.mut_spectra)
+        try:
+            bcfstats = load_bcfstats(
+                args.vcf_stats,
+                sample_names=[sample_id])
+        except IndexError:
+            bcfstats = {'SN': pd.DataFrame(), 'TSTV': pd.DataFrame()}
+    with phase('compute'):
+        filtstats = filt_stats(filters, var_af, nvar_af, thresholds=vaf_thresholds)
     # Instantiate the report
     report = LabsReport(
         f"{sample_id} | Small variation statistics", "wf-somatic-variation",
@@ -193,9 +309,12 @@ def main(args):
                             sub_df, 'NVAF', 'VAF', None,
                             f'Filtered Tumor vs Normal VAF ({vt})',
                             xaxis='Normal VAF', yaxis='Tumor VAF',
-                            min_x=0, max_x=1, min_y=0, max_y=1)
+                            min_x=0, max_x=1, min_y=0, max_y=1,
+                            max_points=args.max_scatter_points)
                         plt.color = [COLORS.cerulean if vt == 'SNV' else COLORS.green]
                         for s in plt.series:
+                            if getattr(s, 'name', None) == DENSITY_SERIES:
+                                continue
                             s.symbolSize = 3
                             s.encode = {
                                 'x': 'NVAF', 'y': 'VAF',
@@ -240,7 +359,9 @@ def main(args):
                     '.')
 
                 # check if there are any ClinVar sites to report
-                clinvar_for_report = load_clinvar_vcf(args.clinvar_vcf)
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    clinvar_for_report = load_clinvar_vcf(
+                        prefilter_clinvar_vcf(args.clinvar_vcf, tmpdir))
                 if clinvar_for_report.empty:
                     h6('No ClinVar sites to report.')
                 else:
@@ -254,7 +375,8 @@ def main(args):
                 " them, re-run the workflow with --annotation true.")
 
     # write report
-    report.write(args.report)
+    with phase('render'):
+        report.write(args.report)
     logger.info(f"Written report to '{args.report}'.")
 
 
@@ -269,6 +391,10 @@ def argparser():
     parser.add_argument(
         "--vcf", default='unknown',
         help="input vcf file")
+    parser.add_argument(
+        "--variant_arrays", required=False,
+        help="per-variant NPZ arrays from annotate_mutations; "
+             "if missing, the vcf file is parsed instead")
     parser.add_argument(
         "--clinvar_vcf", required=False,
         help="VCF file of variants annotated in ClinVar")
@@ -284,6 +410,10 @@ def argparser():
     parser.add_argument(
         "--vaf_thresholds", default="0.2,0.1,0.05",
         help="read coverage output from mosdepth")
+    parser.add_argument(
+        "--max_scatter_points", default=10000, type=int,
+        help="Maximum number of points in the VAF scatterplots; "
+             "denser regions are shown as binned counts.")
     parser.add_argument(
         "--versions", required=True,
         help="directory containing CSVs containing name,version.")
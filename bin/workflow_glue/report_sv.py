@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 """Create workflow report."""
 
+import os
+
 from dominate.tags import p
 from ezcharts.components.common import CATEGORICAL
 from ezcharts.components.ezchart import EZChart
@@ -12,10 +14,12 @@ import numpy as np
 import pandas as pd
 import pysam
 
-from .report_utils.utils import compare_max_axes  # noqa: ABS101
-from .report_utils.utils import COLORS, PRECISION  # noqa: ABS101
+from .report_utils.constants import COLORS, PRECISION  # noqa: ABS101
+from .report_utils.utils import compare_max_axes, HistogramCache  # noqa: ABS101
+from .report_utils.visualizations import DENSITY_SERIES  # noqa: ABS101
 from .report_utils.visualizations import hist_plot  # noqa: ABS101
 from .report_utils.visualizations import scatter_plot  # noqa: ABS101
+from .util import get_named_logger, hts_position, phase, Progress  # noqa: ABS101
 from .util import wf_parser  # noqa: ABS101
 
 vcf_cols = [
@@ -45,7 +49,11 @@ def read_vcf(fname):
         dropped = 0
         idx = 0
         # Process one entry at time using pysam
+        progress = Progress(
+            get_named_logger("report_sv"), 'variants',
+            total_bytes=os.path.getsize(fname), position=hts_position(vcf))
         for n, rec in enumerate(vcf):
+            progress.update()
             # Ignore non-chromosomal SVs
             if rec.chrom.replace('chr', '') not in chroms_37:
                 dropped += 1
@@ -89,6 +97,7 @@ def read_vcf(fname):
                 )
                 idx += 1
             df = pd.concat([df, new_df])
+        progress.done()
         # Use appropriate typing
         df.reset_index(drop=True)
     except pd.errors.EmptyDataError:
@@ -130,8 +139,12 @@ def sv_stats(vcf_data):
                     ])
 
 
-def sv_size_plots(vcf_data):
-    """Plot size distributions of SV calls per type."""
+def sv_size_plots(vcf_data, histograms=None):
+    """Plot size distributions of SV calls per type.
+
+    :param vcf_data: list of (index, sample name, dataframe) tuples.
+    :param histograms: `HistogramCache` shared by the axis limits and plots.
+    """
     tabs = Tabs()
     for (index, sample_name, vcf_df) in vcf_data:
         with tabs.add_tab(sample_name):
@@ -157,13 +170,15 @@ def sv_size_plots(vcf_data):
                     else:
                         max_y = compare_max_axes(
                             inserts, delets, 'SVLEN', binwidth=binwidth,
-                            ptype='hist', buffer=1.2, precision=1)
+                            binrange=binrange, ptype='hist', buffer=1.2, precision=1,
+                            histograms=histograms)
                     if inserts.shape[0] > 0:
                         plt = hist_plot(
                             inserts, 'SVLEN', 'Insertion lengths', no_stats=True,
                             xaxis='abs. Length', yaxis='Count', rounding=0,
                             color=COLORS.cinnabar, binwidth=binwidth,
-                            binrange=binrange, max_y=max_y)
+                            binrange=binrange, max_y=max_y,
+                            histograms=histograms)
                         EZChart(plt, 'epi2melabs')
                     else:
                         p('No insertions to show.')
@@ -172,7 +187,8 @@ def sv_size_plots(vcf_data):
                             delets, 'SVLEN', 'Deletion lengths', no_stats=True,
                             xaxis='abs. Length', yaxis='Count', rounding=0,
                             color=COLORS.cerulean, binwidth=binwidth,
-                            binrange=binrange, max_y=max_y)
+                            binrange=binrange, max_y=max_y,
+                            histograms=histograms)
                         EZChart(plt, 'epi2melabs')
                     else:
                         p('No deletions to show.')
@@ -216,9 +232,13 @@ def main(args):
     """Run the entry point."""
     # Input all VCFs
     vcf_data = []
-    for index, sample_vcf in enumerate(args.vcf):
-        vcf_df, dropped_svs = read_vcf(sample_vcf)
-        vcf_data.append((index, sample_vcf.split('.')[0], vcf_df))
+    with phase('load'):
+        for index, sample_vcf in enumerate(args.vcf):
+            vcf_df, dropped_svs = read_vcf(sample_vcf)
+            vcf_data.append((index, sample_vcf.split('.')[0], vcf_df))
+
+    # Histograms shared by the axis limits and plots of this report
+    histograms = HistogramCache()
 
     # Create report file
     report = LabsReport(
@@ -253,7 +273,7 @@ def main(args):
         karyoplot(vcf_data, args)
 
     with report.add_section('Size distribution', 'Size'):
-        sv_size_plots(vcf_data)
+        sv_size_plots(vcf_data, histograms=histograms)
 
     with report.add_section('Variant allele frequencies', 'VAF'):
         tabs = Tabs()
@@ -266,15 +286,19 @@ def main(args):
                         vcf_df.round(PRECISION), 'NVAF', 'VAF', None,
                         'Tumor vs Normal variant allele frequency (VAF)',
                         xaxis='Normal VAF', yaxis='Tumor VAF',
-                        min_x=0, max_x=1, min_y=0, max_y=1)
+                        min_x=0, max_x=1, min_y=0, max_y=1,
+                        max_points=args.max_scatter_points)
                     for s in plt.series:
+                        if getattr(s, 'name', None) == DENSITY_SERIES:
+                            continue
                         s.symbolSize = 3
                     EZChart(plt, 'epi2melabs')
 
     #
     # write report
     #
-    report.write(args.report)
+    with phase('render'):
+        report.write(args.report)
 
 
 def argparser():
@@ -295,6 +319,10 @@ def argparser():
         "--eval_results",
         nargs='+',
         required=False)
+    parser.add_argument(
+        "--max_scatter_points", default=10000, type=int,
+        help="Maximum number of points in the VAF scatterplot; "
+             "denser regions are shown as binned counts.")
     parser.add_argument(
         "--revision", default='unknown',
         help="git branch/tag of the executed workflow")
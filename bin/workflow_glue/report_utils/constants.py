@@ -0,0 +1,41 @@
+"""Constants shared by the workflow scripts.
+
+This module only uses the standard library, so that it can be imported by
+lightweight scripts. `COLORS` is loaded from ezcharts when first used.
+"""
+
+# Create chromosome order for sorting
+CHROMOSOMES = {f"chr{i}": int(i) for i in range(0, 23)}
+CHROMOSOMES.update({'chrX': 23, 'chrY': 24})
+# Fix chromosome naming to ensure all match chrN
+CHROM_RENAME = {str(i): f"chr{i}" for i in range(1, 23)}
+CHROM_RENAME.update({'X': "chrX", 'Y': "chrY", 'M': "chrM", 'MT': "chrMT"})
+CHROM_RENAME.update({val: val for key, val in CHROM_RENAME.items()})
+# Digit precision
+PRECISION = 4
+# SAM modification codes to human-readable codes, as in ezcharts
+MOD_CONVERT = {
+    'm': '5mC',
+    'h': '5hmC',
+    'f': '5fC',
+    'c': '5caC',
+    'C': 'modC',
+    'g': '5hmU',
+    'e': '5fU',
+    'b': '5caU',
+    'T': 'modT',
+    'a': '6mA',
+    'A': 'modA',
+    'o': '8oxoG',
+    'G': 'modG',
+    'n': 'Xao',
+    'N': 'modN'
+}
+
+
+def __getattr__(name):
+    """Load the plotting constants on first use."""
+    if name == 'COLORS':
+        from ezcharts.plots import util
+        return util.Colors
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
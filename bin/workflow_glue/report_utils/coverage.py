@@ -0,0 +1,170 @@
+"""Preparation of coverage and other genomic tracks for plotting."""
+from ezcharts.components.common import CATEGORICAL
+import numpy as np
+import pandas as pd
+
+
+def compact_track(df, value='depth', by='chrom'):
+    """Keep the plotted columns of a mosdepth regions table in compact dtypes.
+
+    Windows are stored with int32 coordinates and float32 values. The
+    genome-wide position (`total_mean_pos`) can exceed the int32 range, and
+    is kept as float64.
+
+    :param df: dataframe from `load_mosdepth_regions`.
+    :param value: column with the values of each window.
+    :param by: column with the chromosome names.
+    """
+    return pd.DataFrame({
+        by: df[by].astype('category'),
+        'start': df['start'].astype(np.int32),
+        'end': df['end'].astype(np.int32),
+        'total_mean_pos': df['total_mean_pos'].astype(np.float64),
+        value: df[value].astype(np.float32),
+    })
+
+
+def downsample_track(df, max_points, value='depth', by='chrom'):
+    """Reduce a coverage track to about `max_points` points.
+
+    The budget is split between chromosomes proportionally to their number
+    of windows. Consecutive windows of each chromosome are then grouped to
+    fit the budget, and only the lowest and highest window of each group are
+    kept, so that amplifications and deletions remain visible.
+
+    :param df: coverage track, with windows sorted by position.
+    :param max_points: maximum number of points; None keeps all the windows.
+    :param value: column with the values of each window.
+    :param by: column with the chromosome names.
+    """
+    if max_points is None or df.shape[0] <= max_points:
+        return df
+    codes = df[by].astype('category').cat.codes.values
+    order = np.lexsort((df['total_mean_pos'].values, codes))
+    codes = codes[order]
+    values = df[value].values[order]
+    # Number of groups of windows in each chromosome; each keeps two points
+    sizes = np.bincount(codes)
+    n_groups = np.maximum(
+        1, np.floor(sizes / df.shape[0] * max_points / 2)).astype(np.int64)
+    group_size = np.ceil(sizes / n_groups).astype(np.int64)
+    # Assign each window to a group, numbered across chromosomes
+    chrom_starts = np.cumsum(sizes) - sizes
+    group_starts = np.cumsum(n_groups) - n_groups
+    rank = np.arange(codes.size) - chrom_starts[codes]
+    groups = group_starts[codes] + rank // np.maximum(group_size[codes], 1)
+    # Sort by value within each group to find the extremes
+    by_value = np.lexsort((values, groups))
+    bounds = np.flatnonzero(np.diff(groups[by_value])) + 1
+    first = np.r_[0, bounds]
+    last = np.r_[bounds - 1, by_value.size - 1]
+    keep = np.unique(np.r_[by_value[first], by_value[last]])
+    return df.iloc[np.sort(order[keep])]
+
+
+def coverage_track(df, max_points=None, value='depth', by='chrom'):
+    """Prepare a mosdepth regions table for plotting.
+
+    :param df: dataframe from `load_mosdepth_regions`.
+    :param max_points: maximum number of points; None keeps all the windows.
+    :param value: column with the values of each window.
+    :param by: column with the chromosome names.
+    """
+    track = compact_track(df, value=value, by=by)
+    return downsample_track(track, max_points, value=value, by=by) \
+        .reset_index(drop=True)
+
+
+def fill_missing_windows(intervals, faidx, value='value', winsize=25000):
+    """Add zero-valued windows where intervals do not cover the chromosomes.
+
+    This gives the same windows as ezcharts `add_missing_windows`, computed
+    for all the chromosomes at once: gaps before the first interval and
+    between intervals are split in windows of `winsize`, chromosomes without
+    intervals are covered from start to end, and chromosomes shorter than
+    `winsize` are dropped. Intervals must not overlap.
+
+    :param intervals: dataframe with chrom, start, end and `value` columns.
+    :param faidx: dataframe with chrom and length columns.
+    :param value: column with the values of each interval.
+    :param winsize: size of the added windows.
+    :returns: intervals and added windows, sorted by chromosome as in
+        `faidx` and by start.
+    """
+    lengths = faidx.loc[faidx['length'] >= winsize] \
+        .groupby('chrom', observed=True, sort=False)['length'].max()
+    chroms = pd.Index(lengths.index.astype(str))
+    rank = chroms.get_indexer(intervals['chrom'].astype(str))
+    intervals = intervals.loc[rank >= 0]
+    rank = rank[rank >= 0]
+    order = np.lexsort((intervals['start'].values, rank))
+    intervals = intervals.iloc[order]
+    rank = rank[order]
+    starts = intervals['start'].values.astype(np.int64)
+    ends = intervals['end'].values.astype(np.int64)
+    # End of the previous interval of each chromosome, 0 for the first
+    prev_end = np.r_[0, ends[:-1]]
+    prev_end[np.r_[True, rank[1:] != rank[:-1]]] = 0
+    gap = starts != prev_end
+    # Chromosomes without intervals are covered entirely
+    empty = np.setdiff1d(np.arange(chroms.size), rank)
+    gap_rank = np.r_[rank[gap], empty]
+    gap_start = np.r_[prev_end[gap], np.zeros(empty.size, dtype=np.int64)]
+    gap_end = np.r_[starts[gap], lengths.values[empty].astype(np.int64)]
+    # Split the gaps in windows, the last of each gap being shorter
+    n_windows = np.maximum(0, -(-(gap_end - gap_start) // winsize))
+    first = np.cumsum(n_windows) - n_windows
+    step = np.arange(n_windows.sum()) - np.repeat(first, n_windows)
+    fill_start = np.repeat(gap_start, n_windows) + step * winsize
+    fill_end = np.minimum(fill_start + winsize, np.repeat(gap_end, n_windows))
+    fill_rank = np.repeat(gap_rank, n_windows)
+    fill = pd.DataFrame({
+        'chrom': chroms.values[fill_rank],
+        'start': fill_start,
+        'end': fill_end,
+        value: 0.0})
+    # Merge with the intervals, keeping chromosomes and starts sorted
+    merged = pd.concat([intervals.astype({'chrom': str}), fill])
+    order = np.lexsort((
+        np.r_[starts, fill_start], np.r_[rank, fill_rank]))
+    return merged.iloc[order].astype({
+        'chrom': CATEGORICAL, 'start': int, 'end': int, value: float}) \
+        .reset_index(drop=True)
+
+
+def intervals_to_steps(df, offsets, value, order=None):
+    """Convert intervals to the points of a genome-wide step line.
+
+    Each interval gives two points, at its start and end, with its value.
+    Positions are shifted by the offset of their chromosome, and the points
+    are interleaved by construction, so that no sorting of the points is
+    required.
+
+    :param df: dataframe with chrom, start and end columns, with
+        non-overlapping intervals sorted by start within each chromosome.
+    :param offsets: series with the genome-wide start of each chromosome;
+        intervals on other chromosomes are dropped.
+    :param value: column with the values of each interval.
+    :param order: order of the chromosomes; defaults to that of `offsets`.
+    :returns: dataframe with chrom, pos and value columns.
+    """
+    order = pd.Index(
+        (offsets.index if order is None else pd.Index(order)).astype(str))
+    offsets = offsets.set_axis(offsets.index.astype(str)).reindex(order)
+    rank = order.get_indexer(df['chrom'].astype(str))
+    keep = rank >= 0
+    rank = rank[keep]
+    # Group the intervals by chromosome, if they are not already
+    idx = np.flatnonzero(keep)
+    if np.any(np.diff(rank) < 0):
+        grouped = np.argsort(rank, kind='stable')
+        idx, rank = idx[grouped], rank[grouped]
+    shift = offsets.values[rank]
+    pos = np.empty(2 * idx.size, dtype=np.int64)
+    pos[0::2] = df['start'].values[idx] + shift
+    pos[1::2] = df['end'].values[idx] + shift
+    return pd.DataFrame({
+        'chrom': pd.Categorical.from_codes(
+            np.repeat(rank, 2), categories=order, ordered=True),
+        'pos': pos,
+        'value': np.repeat(df[value].values[idx], 2)})
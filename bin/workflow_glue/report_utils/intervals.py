@@ -0,0 +1,69 @@
+"""Summaries of values at genomic positions, by window."""
+import numpy as np
+import pandas as pd
+
+
+def group_medians(groups, values, n_groups):
+    """Return the median of the values of each group, ignoring NaNs.
+
+    Values are sorted once by group and value, and the medians are read at
+    the middle of each group.
+
+    :param groups: group of each value, between 0 and `n_groups` - 1.
+    :param values: array of values.
+    :param n_groups: number of groups.
+    :returns: array with the median of each group, NaN for empty groups.
+    """
+    groups = np.asarray(groups)
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    groups, values = groups[valid], values[valid]
+    values = values[np.lexsort((values, groups))]
+    counts = np.bincount(groups, minlength=n_groups)
+    first = np.cumsum(counts) - counts
+    medians = np.full(n_groups, np.nan)
+    has = counts > 0
+    low = first[has] + (counts[has] - 1) // 2
+    high = first[has] + counts[has] // 2
+    medians[has] = (values[low] + values[high]) / 2
+    return medians
+
+
+def window_medians(chroms, positions, values, lengths, window_size):
+    """Return the median value in windows along each chromosome.
+
+    Windows span [i * window_size, (i + 1) * window_size), the last one of
+    each chromosome ending at its length. Positions on other chromosomes or
+    beyond the chromosome ends are ignored.
+
+    :param chroms: chromosome of each value.
+    :param positions: position of each value.
+    :param values: array of values.
+    :param lengths: series with the length of each chromosome.
+    :param window_size: size of the windows.
+    :returns: dataframe with chrom, start, end and value columns, for the
+        windows with at least one position.
+    """
+    names = pd.Index(lengths.index.astype(str))
+    lengths = np.asarray(lengths.values, dtype=np.int64)
+    rank = names.get_indexer(pd.Series(chroms).astype(str))
+    positions = np.asarray(positions, dtype=np.int64)
+    valid = rank >= 0
+    valid[valid] = (positions[valid] >= 0) & \
+        (positions[valid] < lengths[rank[valid]])
+    rank, positions = rank[valid], positions[valid]
+    values = np.asarray(values, dtype=float)[valid]
+    # Number each window across chromosomes
+    n_windows = -(-lengths // window_size)
+    first = np.cumsum(n_windows) - n_windows
+    window = first[rank] + positions // window_size
+    used = np.unique(window)
+    medians = group_medians(
+        np.searchsorted(used, window), values, used.size)
+    used_rank = np.searchsorted(first, used, side='right') - 1
+    starts = (used - first[used_rank]) * window_size
+    return pd.DataFrame({
+        'chrom': names.values[used_rank],
+        'start': starts,
+        'end': np.minimum(starts + window_size, lengths[used_rank]),
+        'value': medians})
@@ -0,0 +1,80 @@
+"""Concurrent loading of report inputs."""
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+import time
+
+
+class InputLoader:
+    """Load independent report inputs on a thread pool.
+
+    Each input is registered with a name and a loading function, optionally
+    requiring other inputs; it is scheduled as soon as these are loaded.
+    Results are retrieved by name, waiting only for the input requested, so
+    that a report can be built while the remaining inputs are loading.
+    """
+
+    def __init__(self, threads=1, logger=None):
+        """Initialize the loader.
+
+        :param threads: number of inputs loaded at once.
+        :param logger: logger used to report the loading time of each input.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max(1, threads))
+        self.logger = logger
+        self.futures = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        """Enter the context."""
+        return self
+
+    def __exit__(self, *exc):
+        """Wait for pending inputs and stop the pool."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, name, func, *args, requires=(), **kwargs):
+        """Schedule the loading of an input.
+
+        :param name: name of the input.
+        :param func: loading function, called as `func(*args, **kwargs)`.
+        :param requires: names of the inputs that must be loaded first; their
+            values are passed to `func` as keyword arguments named after them.
+        :returns: a future resolving to the loaded input.
+        """
+        future = Future()
+        self.futures[name] = future
+        pending = [self.futures[req] for req in requires]
+        remaining = [len(pending)]
+
+        def run():
+            try:
+                deps = {req: self.futures[req].result() for req in requires}
+                start = time.perf_counter()
+                result = func(*args, **kwargs, **deps)
+                if self.logger is not None:
+                    self.logger.info(
+                        f"Loaded {name} in {time.perf_counter() - start:.2f}s.")
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+        def schedule(_=None):
+            with self._lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                self.executor.submit(run)
+
+        if not pending:
+            self.executor.submit(run)
+        else:
+            remaining[0] += 1
+            for dep in pending:
+                dep.add_done_callback(schedule)
+            schedule()
+        return future
+
+    def get(self, name):
+        """Return an input, waiting for it to be loaded."""
+        return self.futures[name].result()
@@ -0,0 +1,253 @@
+"""Streaming summaries of per-read statistics."""
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class StreamingHistogram:
+    """Fixed-resolution histogram that can be filled in chunks.
+
+    Values are counted in bins of width `resolution`, together with their
+    exact number, sum and range. The fine bins can then be used to derive
+    quantiles and N50, or be merged into wider bins for plotting.
+    """
+
+    def __init__(self, resolution=1, start=0):
+        """Initialize the histogram.
+
+        :param resolution: width of the bins.
+        :param start: left edge of the first bin; smaller values are
+            counted in the first bin.
+        """
+        self.resolution = resolution
+        self.start = start
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.n = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self._rebinned = {}
+
+    def update(self, values):
+        """Add an array of values, ignoring NaNs."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self._rebinned.clear()
+        # Small offset avoids floating point errors for values on the edges
+        idx = np.floor((values - self.start) / self.resolution + 1e-9)
+        idx = np.clip(idx, 0, None).astype(np.int64)
+        counts = np.bincount(idx)
+        if counts.size > self.counts.size:
+            counts[:self.counts.size] += self.counts
+            self.counts = counts
+        else:
+            self.counts[:counts.size] += counts
+        self.n += values.size
+        self.total += values.sum()
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        return self
+
+    def merge(self, other):
+        """Add the counts of another histogram with the same bins."""
+        if (self.resolution, self.start) != (other.resolution, other.start):
+            raise ValueError('Histograms with different bins cannot be merged.')
+        self._rebinned.clear()
+        if other.counts.size > self.counts.size:
+            self.counts = np.pad(self.counts, (0, other.counts.size - self.counts.size))
+        self.counts[:other.counts.size] += other.counts
+        self.n += other.n
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def to_arrays(self, prefix):
+        """Return a dict of arrays storing the histogram."""
+        nonzero = np.flatnonzero(self.counts)
+        return {
+            f'{prefix}_bins': nonzero,
+            f'{prefix}_counts': self.counts[nonzero],
+            f'{prefix}_meta': np.array([
+                self.resolution, self.start, self.n,
+                self.total, self.min, self.max], dtype=float)}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        """Create a histogram from the arrays of `to_arrays`."""
+        resolution, start, n, total, vmin, vmax = arrays[f'{prefix}_meta']
+        hist = cls(resolution=resolution, start=start)
+        bins = arrays[f'{prefix}_bins']
+        hist.counts = np.zeros(bins[-1] + 1 if bins.size else 0, dtype=np.int64)
+        hist.counts[bins] = arrays[f'{prefix}_counts']
+        hist.n, hist.total = int(n), total
+        hist.min, hist.max = vmin, vmax
+        return hist
+
+    @property
+    def values(self):
+        """Left edge of each bin."""
+        return self.start + np.arange(self.counts.size) * self.resolution
+
+    def mean(self):
+        """Return the mean of the values."""
+        return self.total / self.n if self.n else np.nan
+
+    def value_at(self, rank):
+        """Return the value with the given 0-based rank."""
+        idx = np.searchsorted(np.cumsum(self.counts), rank, side='right')
+        return self.values[idx]
+
+    def median(self):
+        """Return the median of the values."""
+        if self.n == 0:
+            return np.nan
+        if self.n % 2:
+            return self.value_at(self.n // 2)
+        return (self.value_at(self.n // 2 - 1) + self.value_at(self.n // 2)) / 2
+
+    def n50(self):
+        """Return the N50 of the values, or 0 if there are none."""
+        if self.n == 0:
+            return 0
+        values = self.values[::-1]
+        cumsum = np.cumsum(self.counts[::-1] * values)
+        return values[cumsum >= cumsum[-1] / 2][0]
+
+    def rebin(self, binwidth, start=None):
+        """Merge the fine bins into bins of width `binwidth`.
+
+        :param binwidth: width of the output bins.
+        :param start: left edge of the first bin; defaults to the minimum value.
+        :returns: tuple of bin edges and counts, memoised until the
+            histogram is updated.
+        """
+        key = (binwidth, start)
+        if key not in self._rebinned:
+            self._rebinned[key] = self._rebin(binwidth, start)
+        return self._rebinned[key]
+
+    def _rebin(self, binwidth, start):
+        """Compute the histogram returned by `rebin`."""
+        if self.n == 0:
+            return np.array([]), np.array([], dtype=np.int64)
+        start = self.min if start is None else start
+        edges = np.arange(start, self.max + binwidth, binwidth)
+        if edges.size < 2:
+            edges = np.array([start, start + binwidth])
+        # Assign each fine bin using its centre
+        nonzero = np.flatnonzero(self.counts)
+        centres = self.values[nonzero] + self.resolution / 2
+        idx = np.floor((centres - start) / binwidth).astype(np.int64)
+        idx = np.clip(idx, 0, edges.size - 2)
+        counts = np.bincount(
+            idx, weights=self.counts[nonzero], minlength=edges.size - 1)
+        return edges, counts.astype(np.int64)
+
+
+class ReadStats:
+    """Summary of a bamstats per-read table, filled in chunks."""
+
+    # Resolution of the histogram of each column
+    columns = {'read_length': 1, 'mean_quality': 0.01, 'acc': 0.01}
+
+    def __init__(self):
+        """Initialize the summary."""
+        self.n_reads = 0
+        self.hists = {
+            col: StreamingHistogram(resolution)
+            for col, resolution in self.columns.items()}
+
+    def update(self, df):
+        """Add a chunk of the per-read table."""
+        self.n_reads += df.shape[0]
+        for col, hist in self.hists.items():
+            if col in df.columns:
+                hist.update(df[col].values)
+        return self
+
+    def merge(self, other):
+        """Add the counts of another summary."""
+        self.n_reads += other.n_reads
+        for col, hist in self.hists.items():
+            hist.merge(other.hists[col])
+        return self
+
+    def save(self, fname):
+        """Save the summary as a compressed NPZ sketch."""
+        arrays = {'n_reads': np.array(self.n_reads)}
+        for col, hist in self.hists.items():
+            arrays.update(hist.to_arrays(col))
+        with open(fname, 'wb') as out:
+            np.savez_compressed(out, **arrays)
+
+    @classmethod
+    def load(cls, fname):
+        """Load a summary saved with `save`."""
+        stats = cls()
+        with np.load(fname, allow_pickle=False) as arrays:
+            stats.n_reads = int(arrays['n_reads'])
+            stats.hists = {
+                col: StreamingHistogram.from_arrays(arrays, col)
+                for col in cls.columns}
+        return stats
+
+    @property
+    def n_bases(self):
+        """Total number of bases."""
+        return int(self.hists['read_length'].total)
+
+    @classmethod
+    def from_table(cls, fname, chunksize=1000000):
+        """Stream a single bamstats per-read file.
+
+        :param fname: bamstats per-read stats file.
+        :param chunksize: number of rows loaded at once.
+        """
+        stats = cls()
+        try:
+            header = pd.read_csv(fname, sep='\t', nrows=0).columns
+        except pd.errors.EmptyDataError:
+            return stats
+        usecols = [col for col in cls.columns if col in header]
+        for chunk in pd.read_csv(
+                fname, sep='\t', usecols=usecols, chunksize=chunksize,
+                dtype={col: float for col in usecols}):
+            stats.update(chunk)
+        return stats
+
+    @classmethod
+    def from_bamstats(cls, fname, chunksize=1000000):
+        """Summarise one or more bamstats per-read files.
+
+        Inputs can be bamstats tables or sketches saved with `save`
+        (ending in `.npz`), for example one per flowcell. Tables with an
+        up-to-date sketch next to them (`<table>.npz`) are not read.
+
+        :param fname: input file, directory of files, or list of files.
+        :param chunksize: number of rows loaded at once.
+        """
+        if isinstance(fname, (list, tuple)):
+            fnames = list(fname)
+        elif os.path.isdir(fname):
+            fnames = [os.path.join(fname, i) for i in sorted(os.listdir(fname))]
+        elif os.path.isfile(fname):
+            fnames = [fname]
+        else:
+            raise FileNotFoundError(f'No valid input: {fname}')
+        # Skip the tables whose sketch is also part of the inputs
+        fnames = [i for i in fnames if f'{i}.npz' not in fnames]
+        stats = cls()
+        for path in fnames:
+            sketch = f'{path}.npz'
+            if path.endswith('.npz'):
+                stats.merge(cls.load(path))
+            elif os.path.exists(sketch) and \
+                    os.path.getmtime(sketch) >= os.path.getmtime(path):
+                stats.merge(cls.load(sketch))
+            else:
+                stats.merge(cls.from_table(path, chunksize=chunksize))
+        return stats
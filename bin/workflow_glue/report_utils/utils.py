@@ -1,58 +1,210 @@
 """Global variables commonly used in other scripts."""
-from ezcharts.plots import util
 import numpy as np
-from seaborn._statistics import Histogram
+import pandas as pd
 
 
-# Global variables
-COLORS = util.Colors
-# Create chromosome order for sorting
-CHROMOSOMES = {f"chr{i}": int(i) for i in range(0, 23)}
-CHROMOSOMES.update({'chrX': 23, 'chrY': 24})
-# Fix chromosome naming to ensure all match chrN
-CHROM_RENAME = {str(i): f"chr{i}" for i in range(1, 23)}
-CHROM_RENAME.update({'X': "chrX", 'Y': "chrY", 'M': "chrM", 'MT': "chrMT"})
-CHROM_RENAME.update({val: val for key, val in CHROM_RENAME.items()})
-# Digit precision
-PRECISION = 4
+# Utility functions
+def histogram(values, bins='auto', binwidth=None, binrange=None):
+    """Bin values with NumPy, using the same bins as `histplot`.
+
+    :param values: array of values; NaNs are ignored.
+    :param bins: number of bins or NumPy binning rule, used without `binwidth`.
+    :param binwidth: width of the bins.
+    :param binrange: (min, max) range of the bins; defaults to the data range.
+    :returns: tuple of counts and bin edges.
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if binrange is None:
+        start, stop = values.min(), values.max()
+    else:
+        start, stop = binrange
+    if binwidth is not None:
+        edges = np.arange(start, stop + binwidth, binwidth)
+        # Handle roundoff error as seaborn does
+        if edges.max() < stop or len(edges) < 2:
+            edges = np.append(edges, edges.max() + binwidth)
+    else:
+        edges = np.histogram_bin_edges(values, bins, binrange)
+    counts, edges = np.histogram(values, edges)
+    return counts, edges
 
 
-# Utility functions
-def hist_max(variable_data, binwidth=None, bins='auto'):
-    """Compute max value to set in a plot."""
-    estimate_kws = dict(
-        stat='count',
-        bins=bins,
-        binwidth=binwidth,
-        binrange=None,
-        discrete=None,
-        cumulative=False,
-    )
-    estimator = Histogram(**estimate_kws)
-    heights, edges = estimator(variable_data, weights=None)
-    return max(heights)
+class HistogramCache:
+    """Memoise the histograms of dataframe columns.
+
+    Each (dataset, column, bins) histogram is computed once, and then shared
+    by the axis limits and the plot series. Datasets are identified by
+    object, so they must not be modified after being binned, and they are
+    kept alive by the cache; create a cache for each report.
+    """
+
+    def __init__(self):
+        """Initialize the cache."""
+        self._cache = {}
+
+    def get(self, df, col, bins='auto', binwidth=None, binrange=None):
+        """Return the counts and bin edges of a column.
+
+        :param df: dataframe.
+        :param col: column to bin.
+        :param bins: number of bins or NumPy binning rule.
+        :param binwidth: width of the bins.
+        :param binrange: (min, max) range of the bins.
+        """
+        key = (
+            id(df), col,
+            bins if isinstance(bins, (str, int)) else tuple(bins),
+            binwidth, None if binrange is None else tuple(binrange))
+        if key not in self._cache:
+            # Keep a reference to the dataframe so that its id is not reused
+            self._cache[key] = (
+                df, histogram(
+                    df[col].values, bins=bins,
+                    binwidth=binwidth, binrange=binrange))
+        return self._cache[key][1]
+
+    def clear(self):
+        """Empty the cache."""
+        self._cache.clear()
 
 
 def compare_max_axes(
         df1, df2, col, ptype='val',
-        bins='auto', binwidth=None,
-        buffer=1.1, precision=0):
-    """Compute max value to set in a plot."""
+        bins='auto', binwidth=None, binrange=None,
+        buffer=1.1, precision=0, histograms=None):
+    """Compute max value to set in a plot.
+
+    Histograms are taken from `histograms`, a `HistogramCache`, if given.
+    """
     if ptype == 'hist':
-        v1max = hist_max(df1[col].dropna(), bins=bins, binwidth=binwidth)
-        v2max = hist_max(df2[col].dropna(), bins=bins, binwidth=binwidth)
+        if histograms is None:
+            histograms = HistogramCache()
+        v1max = max(histograms.get(
+            df1, col, bins=bins, binwidth=binwidth, binrange=binrange)[0])
+        v2max = max(histograms.get(
+            df2, col, bins=bins, binwidth=binwidth, binrange=binrange)[0])
     else:
         v1max = df1[col].max()
         v2max = df2[col].max()
     return np.ceil(max(v1max, v2max) * buffer * (10**precision))/(10**precision)
 
 
-def compute_n50(lengths):
-    """Compute read N50."""
-    # Sort the read lengths
-    sorted_l = np.sort(lengths)[::-1]
-    # Generate cumsum
-    cumsum = np.cumsum(sorted_l)
-    # Get lowest cumulative value >= (total_length/2)
-    n50 = sorted_l[cumsum >= cumsum[-1]/2][0]
-    return n50
+def density_bins(x, y, max_points, bins=100, xrange=None, yrange=None):
+    """Split points in sparse points and dense 2D bins.
+
+    Bins are taken from the least to the most populated until `max_points`
+    points are collected; these points are kept as they are, whereas the
+    remaining bins are summarised by their centre and number of points.
+
+    :param x: x coordinates.
+    :param y: y coordinates.
+    :param max_points: maximum number of points to keep.
+    :param bins: number of bins on each axis.
+    :param xrange: (min, max) range of the x axis; defaults to the data range.
+    :param yrange: (min, max) range of the y axis; defaults to the data range.
+    :returns: boolean mask of the points to keep, and a dataframe with
+        columns x, y and count for the dense bins.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    keep = np.zeros(x.size, dtype=bool)
+    if not valid.any():
+        return keep, pd.DataFrame({'x': [], 'y': [], 'count': []})
+    # Define bin edges and assign each point to a bin
+    axes = []
+    for values, vrange in ((x, xrange), (y, yrange)):
+        if vrange is None:
+            vrange = (values[valid].min(), values[valid].max())
+        edges = np.linspace(vrange[0], vrange[1], bins + 1)
+        idx = np.clip(
+            np.searchsorted(edges, values[valid], side='right') - 1, 0, bins - 1)
+        axes.append((edges, idx))
+    (xedges, xidx), (yedges, yidx) = axes
+    flat = xidx * bins + yidx
+    counts = np.bincount(flat, minlength=bins * bins)
+    # Fill the point budget starting from the sparsest bins
+    order = np.argsort(counts, kind='stable')
+    sparse = np.zeros(counts.size, dtype=bool)
+    sparse[order[np.cumsum(counts[order]) <= max_points]] = True
+    keep[valid] = sparse[flat]
+    # Summarise the remaining bins by their centre
+    dense = np.flatnonzero(~sparse & (counts > 0))
+    xcentres = (xedges[:-1] + xedges[1:]) / 2
+    ycentres = (yedges[:-1] + yedges[1:]) / 2
+    binned = pd.DataFrame({
+        'x': xcentres[dense // bins],
+        'y': ycentres[dense % bins],
+        'count': counts[dense]})
+    return keep, binned
+
+
+def lttb(x, y, n_out):
+    """Select points of a line with Largest-Triangle-Three-Buckets.
+
+    The first and last points are kept, and the others are split in
+    `n_out - 2` buckets. From each bucket, the point forming the largest
+    triangle with the point selected in the previous bucket and the mean of
+    the next bucket is kept. Areas are computed at once for all the points
+    of a bucket.
+
+    :param x: x coordinates, sorted.
+    :param y: y coordinates.
+    :param n_out: number of points to select.
+    :returns: indices of the selected points, sorted.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = x.size
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # Bucket boundaries for the points between the first and the last,
+    # in integer arithmetic so that they are not shifted by roundoff
+    edges = 1 + np.arange(n_out - 1) * (n - 2) // (n_out - 2)
+    sizes = np.diff(edges)
+    # Mean of each bucket, followed by the last point
+    xmean = np.r_[np.add.reduceat(x[:n - 1], edges[:-1]) / sizes, x[-1]]
+    ymean = np.r_[np.add.reduceat(y[:n - 1], edges[:-1]) / sizes, y[-1]]
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[anchor], y[anchor]
+        area = np.abs(
+            (ax - xmean[i + 1]) * (y[lo:hi] - ay)
+            - (ax - x[lo:hi]) * (ymean[i + 1] - ay))
+        anchor = lo + np.argmax(np.nan_to_num(area, nan=-1))
+        selected[i + 1] = anchor
+    return selected
+
+
+def top_k(values, k, ascending=False):
+    """Return the positions of the k highest values of each column, in order.
+
+    The k values are selected with `argpartition`, and only these are sorted,
+    ties in row order. NaNs are ranked last, in row order, as by
+    `sort_values`.
+
+    :param values: array of values, with one column per variable.
+    :param k: number of positions to return.
+    :param ascending: return the lowest values instead.
+    :returns: array with k rows and one column per variable.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    keys = np.where(np.isnan(values), np.inf, values if ascending else -values)
+    k = min(k, keys.shape[0])
+    if k == 0:
+        return np.empty((0, keys.shape[1]), dtype=np.int64)
+    part = np.argpartition(keys, k - 1, axis=0)[:k]
+    order = np.lexsort((part, np.take_along_axis(keys, part, axis=0)), axis=0)
+    top = np.take_along_axis(part, order, axis=0)
+    # The NaNs selected by the partition are arbitrary; take the first ones
+    n_valid = (~np.isnan(values)).sum(axis=0)
+    for col in np.flatnonzero(n_valid < k):
+        top[n_valid[col]:, col] = \
+            np.flatnonzero(np.isnan(values[:, col]))[:k - n_valid[col]]
+    return top
@@ -1,15 +1,32 @@
 """Commonly used code in visualizations."""
-from ezcharts import barplot, histplot
-from ezcharts import lineplot, scatterplot
 import numpy as np
-from .utils import COLORS  # noqa: ABS101
+import pandas as pd
+from . import constants  # noqa: ABS101
+from .utils import density_bins, HistogramCache, lttb  # noqa: ABS101
+
+# Name of the series holding the binned points of a scatterplot
+DENSITY_SERIES = 'Density'
 
 
 # Scatter plot
 def scatter_plot(
         df, x, y, hue, title, add_mean=None, xaxis='', yaxis='',
-        min_x=None, max_x=None, min_y=None, max_y=None, tooltip_label=None):
-    """Make a scatterplot."""
+        min_x=None, max_x=None, min_y=None, max_y=None, tooltip_label=None,
+        max_points=None, bins=100):
+    """Make a scatterplot.
+
+    If `max_points` is given and the data have more points, only the points
+    in the sparsest regions are shown, and the rest are displayed as
+    `bins` x `bins` density cells.
+    """
+    from ezcharts import scatterplot
+    binned = None
+    if max_points is not None and df.shape[0] > max_points:
+        xrange = (min_x, max_x) if None not in (min_x, max_x) else None
+        yrange = (min_y, max_y) if None not in (min_y, max_y) else None
+        keep, binned = density_bins(
+            df[x], df[y], max_points, bins=bins, xrange=xrange, yrange=yrange)
+        df = df[keep]
     plt = scatterplot(
         data=df,
         x=x,
@@ -43,13 +60,40 @@ def scatter_plot(
                 type="line",
                 name="Mean coverage",
                 data=[dict(value=[0, add_mean]), dict(value=[max_x_val, add_mean])],
-                itemStyle=(dict(color=COLORS.black)),
+                itemStyle=(dict(color=constants.COLORS.black)),
                 lineStyle=(dict(type='dashed')),
                 symbolSize=0
             )
         )
     else:
         plt.title = {"text": title}
+    # Add the density cells, coloured by number of points
+    if binned is not None and not binned.empty:
+        plt.add_series(
+            dict(
+                type="scatter",
+                name=DENSITY_SERIES,
+                symbol="rect",
+                symbolSize=5,
+                data=[dict(value=row) for row in binned.values.tolist()],
+                tooltip=dict(formatter='{@[2]} sites'),
+            )
+        )
+        plt.visualMap = [
+            dict(
+                type="continuous",
+                dimension=2,
+                seriesIndex=len(plt.series) - 1,
+                min=int(binned['count'].min()),
+                max=int(binned['count'].max()),
+                calculable=True,
+                orient="horizontal",
+                left="center",
+                bottom=0,
+                inRange=dict(color=[
+                    constants.COLORS.grey70, constants.COLORS.cinnabar]),
+            )
+        ]
     return plt
 
 
@@ -57,15 +101,22 @@ def scatter_plot(
 def hist_plot(
         df, col, title, xaxis='', yaxis='', rounding=None,
         extra_metric=None, color=None, binwidth=None, binrange=None, bins='auto',
-        max_y=None, max_x=None, min_x=None, min_y=None, no_stats=False):
-    """Make a histogram of given parameter."""
-    histogram_data = df[col].values
+        max_y=None, max_x=None, min_x=None, min_y=None, no_stats=False,
+        histograms=None):
+    """Make a histogram of given parameter.
 
+    The column is binned through `histograms`, a `HistogramCache`, if given,
+    so that the counts can be shared with `compare_max_axes`.
+    """
+    from ezcharts import histplot
+    if histograms is None:
+        histograms = HistogramCache()
+    counts, edges = histograms.get(
+        df, col, bins=bins, binwidth=binwidth, binrange=binrange)
     plt = histplot(
-        data=histogram_data,
-        bins=bins,
-        binwidth=binwidth,
-        binrange=binrange,
+        data=(edges[:-1] + edges[1:]) / 2,
+        weights=counts,
+        bins=edges,
         color=color)
     if isinstance(rounding, int):
         meanv = df[col].mean().round(rounding)
@@ -73,7 +124,41 @@ def hist_plot(
     else:
         meanv = df[col].mean()
         medianv = df[col].median()
+    return _hist_decorations(
+        plt, title, meanv, medianv, xaxis=xaxis, yaxis=yaxis,
+        extra_metric=extra_metric, color=color, max_y=max_y, max_x=max_x,
+        min_x=min_x, min_y=min_y, no_stats=no_stats)
+
 
+def binned_hist_plot(
+        hist, title, binwidth, xaxis='', yaxis='', rounding=None,
+        extra_metric=None, color=None, max_y=None, max_x=None, min_x=None,
+        min_y=None, no_stats=False):
+    """Make a histogram from a `StreamingHistogram`."""
+    from ezcharts import histplot
+    edges, counts = hist.rebin(binwidth)
+    plt = histplot(
+        data=edges[:-1] + binwidth / 2,
+        weights=counts,
+        binwidth=binwidth,
+        binrange=(edges[0], edges[-1]) if edges.size else None,
+        color=color)
+    meanv = hist.mean()
+    medianv = hist.median()
+    if isinstance(rounding, int):
+        meanv = np.round(meanv, rounding)
+        medianv = np.round(medianv, rounding)
+    return _hist_decorations(
+        plt, title, meanv, medianv, xaxis=xaxis, yaxis=yaxis,
+        extra_metric=extra_metric, color=color, max_y=max_y, max_x=max_x,
+        min_x=min_x, min_y=min_y, no_stats=no_stats)
+
+
+def _hist_decorations(
+        plt, title, meanv, medianv, xaxis='', yaxis='', extra_metric=None,
+        color=None, max_y=None, max_x=None, min_x=None, min_y=None,
+        no_stats=False):
+    """Add title, statistics and axes settings to a histogram."""
     if isinstance(extra_metric, dict):
         if len(extra_metric) > 1:
             raise ValueError('Too many input extra metrics')
@@ -104,7 +189,7 @@ def hist_plot(
                 type="line",
                 name="Mean",
                 data=[dict(value=[meanv, 0]), dict(value=[meanv, max_y])],
-                itemStyle=(dict(color=COLORS.sandstorm)),
+                itemStyle=(dict(color=constants.COLORS.sandstorm)),
                 symbolSize=0
             )
         )
@@ -113,7 +198,7 @@ def hist_plot(
                 type="line",
                 name="Median",
                 data=[dict(value=[medianv, 0]), dict(value=[medianv, max_y])],
-                itemStyle=(dict(color=COLORS.fandango)),
+                itemStyle=(dict(color=constants.COLORS.fandango)),
                 symbolSize=0
             )
         )
@@ -125,7 +210,7 @@ def hist_plot(
                     type="line",
                     name=f"{key}",
                     data=[dict(value=[val, 0]), dict(value=[val, max_y])],
-                    itemStyle=(dict(color=COLORS.cinnabar)),
+                    itemStyle=(dict(color=constants.COLORS.cinnabar)),
                     symbolSize=0
                 )
             )
@@ -150,8 +235,16 @@ def hist_plot(
 # Line plot
 def line_plot(
         df, x, y, hue, title, add_mean=None,
-        xaxis='', yaxis='', max_y=None):
-    """Make a histogram of given parameter."""
+        xaxis='', yaxis='', max_y=None, max_points=None):
+    """Make a line plot of given parameter.
+
+    If `max_points` is given and the data have more points, each hue group
+    is reduced with `lttb` to a share of `max_points` proportional to its
+    size.
+    """
+    from ezcharts import lineplot
+    if max_points is not None and df.shape[0] > max_points:
+        df = downsample_lines(df, x, y, hue, max_points)
     plt = lineplot(
         data=df,
         x=x,
@@ -180,7 +273,7 @@ def line_plot(
                 type="line",
                 name="Mean coverage",
                 data=[dict(value=[0, add_mean]), dict(value=[max_x_val, add_mean])],
-                itemStyle=(dict(color=COLORS.black)),
+                itemStyle=(dict(color=constants.COLORS.black)),
                 lineStyle=(dict(type='dashed')),
                 symbolSize=0
             )
@@ -190,8 +283,19 @@ def line_plot(
     return plt
 
 
+def downsample_lines(df, x, y, hue, max_points):
+    """Reduce each hue group of a line plot with `lttb`."""
+    groups = []
+    for _, group in df.groupby(hue, observed=True, sort=False):
+        group = group.sort_values(x, kind='stable')
+        n_out = max(3, round(max_points * group.shape[0] / df.shape[0]))
+        groups.append(group.iloc[lttb(group[x].values, group[y].values, n_out)])
+    return pd.concat(groups) if groups else df
+
+
 def plot_spectra(spectra, sample, cmap=None):
     """Plot the mutation spectra."""
+    from ezcharts import barplot
     # Plot change spectrum
     df = spectra[['Change', sample]]
     # Count by change type
@@ -211,6 +315,7 @@ def plot_spectra(spectra, sample, cmap=None):
 
 def plot_profile(df, sample, cmap=None):
     """Plot the mutation profile."""
+    from ezcharts import barplot
     # Ensure sorting
     df = df.sort_values(["Change", "Flanks"])
 
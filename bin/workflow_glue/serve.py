@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+"""Run subcommands for clients connecting to a local socket.
+
+A server started with `workflow-glue serve --socket PATH` imports the
+subcommand modules once and then listens on a Unix socket. When the
+`WF_GLUE_SOCKET` environment variable is set, `workflow-glue` forwards its
+arguments, working directory and environment to the server instead of
+running the subcommand itself. The client also passes its standard input,
+output and error, so that the subcommand writes directly to them, and exits
+with the exit code of the subcommand.
+
+Each invocation is run in a process forked from the server, so invocations
+run concurrently and cannot change the state of the server.
+"""
+
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+import traceback
+
+from .util import get_named_logger, wf_parser  # noqa: ABS101
+
+# Environment variable giving the socket of the server to use
+SOCKET_ENV = "WF_GLUE_SOCKET"
+# Header of a request: length of the JSON body
+_HEADER = struct.Struct("!Q")
+# Reply: exit code of the subcommand
+_REPLY = struct.Struct("!i")
+# Seconds to wait for a server to accept a probe of its socket
+PROBE_TIMEOUT = 1.0
+
+
+def _recv_exactly(conn, size, data=b""):
+    """Read `size` bytes from a socket, after the `data` already read."""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed during request.")
+        data += chunk
+    return data
+
+
+def forward(path, argv):
+    """Run a subcommand on the server listening at `path`.
+
+    :param path: path of the server socket.
+    :param argv: command line arguments, without the program name.
+    :returns: exit code of the subcommand.
+    :raises OSError: if the server cannot be reached.
+    """
+    body = json.dumps({
+        "argv": list(argv), "cwd": os.getcwd(), "env": dict(os.environ)
+    }).encode()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(path)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        socket.send_fds(conn, [_HEADER.pack(len(body))], [0, 1, 2])
+        conn.sendall(body)
+        try:
+            reply = _recv_exactly(conn, _REPLY.size)
+        except ConnectionError:
+            # the subcommand ended without reporting, e.g. killed
+            return 1
+    return _REPLY.unpack(reply)[0]
+
+
+def _handle(conn):
+    """Run the subcommand requested on a connection, in a forked process."""
+    from . import run  # noqa: ABS101
+
+    data, fds, _, _ = socket.recv_fds(conn, _HEADER.size, 3)
+    if not data and not fds:
+        # closed without a request, e.g. by `check_socket`
+        return
+    header = _recv_exactly(conn, _HEADER.size, data)
+    request = json.loads(_recv_exactly(conn, _HEADER.unpack(header)[0]))
+    # adopt the standard streams, directory and environment of the client
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    code = run(request["argv"])
+    sys.stdout.flush()
+    sys.stderr.flush()
+    conn.sendall(_REPLY.pack(code))
+
+
+def check_socket(path):
+    """Remove the socket left at `path` by a stopped server.
+
+    :param path: path of the socket.
+    :raises FileExistsError: if `path` is not a socket, or another server
+        listens on it.
+    """
+    if not os.path.exists(path):
+        return
+    if not stat.S_ISSOCK(os.stat(path).st_mode):
+        raise FileExistsError(f"'{path}' exists and is not a socket.")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        probe.settimeout(PROBE_TIMEOUT)
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            # no server listens on the socket any more
+            os.unlink(path)
+            return
+        except socket.timeout:
+            # the server is busy, but still owns the socket
+            pass
+    raise FileExistsError(f"Another server is listening on '{path}'.")
+
+
+def serve(path, idle_timeout=None, logger=None):
+    """Accept subcommand invocations on a Unix socket.
+
+    :param path: path of the socket; a stale socket file is replaced.
+    :param idle_timeout: seconds without invocations after which the server
+        stops; None to run until terminated.
+    :param logger: logger reporting the invocations.
+    :raises FileExistsError: if `path` is not a socket, or another server
+        listens on it.
+    """
+    check_socket(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # the socket runs commands with the environment of its clients
+    umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(umask)
+    server.listen(128)
+    server.settimeout(idle_timeout)
+    # let the kernel reap the forked processes
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                if logger is not None:
+                    logger.info(f"No invocation for {idle_timeout}s, stopping.")
+                break
+            if os.fork() == 0:
+                code = 0
+                try:
+                    server.close()
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                    _handle(conn)
+                except BaseException:
+                    traceback.print_exc()
+                    code = 1
+                finally:
+                    os._exit(code)
+            conn.close()
+    finally:
+        server.close()
+        os.unlink(path)
+
+
+def main(args):
+    """Run the entry point."""
+    from . import get_manifest, preload  # noqa: ABS101
+
+    logger = get_named_logger("serve")
+    # refuse before the modules are preloaded, which can take a while
+    check_socket(args.socket)
+    modules = preload(args.preload if args.preload else sorted(
+        name for name in get_manifest() if name not in ("batch", "serve")))
+    logger.info(f"Serving {len(modules)} subcommands on '{args.socket}'.")
+    serve(args.socket, idle_timeout=args.idle_timeout, logger=logger)
+
+
+def argparser():
+    """Argument parser for entrypoint."""
+    parser = wf_parser("serve")
+    parser.add_argument(
+        "--socket", required=True,
+        help=f"Path of the Unix socket; clients find it in ${SOCKET_ENV}")
+    parser.add_argument(
+        "--preload", nargs='+',
+        help="Subcommands to import at startup; all by default")
+    parser.add_argument(
+        "--idle_timeout", type=float, default=None,
+        help="Stop after this many seconds without invocations")
+    return parser
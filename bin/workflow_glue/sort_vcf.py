@@ -0,0 +1,572 @@
+#!/usr/bin/env python
+"""Sort VCFs into a BGZF-compressed VCF, indexing it as it is written.
+
+The inputs are first scanned for runs of records that are already sorted.
+The longest runs are merged directly from the inputs, and only the records
+of the other runs are sorted in memory, being spilled to temporary files as
+sorted chunks when they exceed the memory ceiling. The runs and chunks are
+then merged into the output, and its tabix or CSI index is built from the
+offsets of the records as they are written.
+
+Records are sorted by contig, in the order of the `##contig` header lines,
+then by position; records at the same position keep the order of the
+inputs. Inputs are plain or BGZF-compressed VCFs with the same samples, and
+their headers are merged.
+"""
+
+import argparse
+import heapq
+import itertools
+import re
+import struct
+import tempfile
+
+import pysam
+
+from .util import get_named_logger, phase, Progress, wf_parser  # noqa: ABS101
+
+# Shortest run of sorted records merged directly from an input
+MIN_RUN = 1000
+# Most runs merged directly from the inputs, each holding an open file
+MAX_RUNS = 64
+# Records in a row out of a run of sorted records ending its segment
+MAX_REJECTED = 16
+# Memory used by a buffered record besides its text, in bytes
+RECORD_OVERHEAD = 120
+
+
+def min_run_length(text):
+    """Parse the length of the shortest run merged, at least 1."""
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {value}")
+    return value
+
+
+def parse_size(text):
+    """Parse a size in bytes with an optional K, M or G suffix, e.g. `2G`."""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([KMG]?)B?', text.strip().upper())
+    if match is None:
+        raise ValueError(f"Invalid size: '{text}'.")
+    value, unit = match.groups()
+    return int(float(value) * 1024 ** ' KMG'.index(unit or ' '))
+
+
+class VcfReader:
+    """Read the lines of a plain or BGZF-compressed VCF, with seekable offsets.
+
+    Offsets are byte offsets for plain files and virtual offsets for BGZF.
+    """
+
+    def __init__(self, fname):
+        """Open a VCF.
+
+        :param fname: path of the VCF.
+        """
+        with open(fname, 'rb') as fh:
+            magic = fh.read(4)
+        self.fname = fname
+        self.bgzf = magic[:2] == b'\x1f\x8b'
+        # BGZF blocks are gzip members with an extra field
+        if self.bgzf and not magic[3] & 4:
+            raise ValueError(f"'{fname}' is compressed with gzip rather than bgzip.")
+        self._fh = pysam.BGZFile(fname, 'rb') if self.bgzf else open(fname, 'rb')
+
+    def tell(self):
+        """Return the offset of the next line."""
+        return self._fh.tell()
+
+    def seek(self, offset):
+        """Move to an offset given by `tell`."""
+        self._fh.seek(offset)
+
+    def readline(self):
+        """Return the next line without its newline, or None at the end."""
+        line = self._fh.readline()
+        if not line:
+            return None
+        return line if self.bgzf else line.rstrip(b'\r\n')
+
+    def read_header(self):
+        """Return the header lines, leaving the reader at the first record."""
+        lines = []
+        while True:
+            offset = self.tell()
+            line = self.readline()
+            if line is None or not line.startswith(b'#'):
+                self.seek(offset)
+                return lines
+            lines.append(line)
+
+    def close(self):
+        """Close the file."""
+        self._fh.close()
+
+
+def merge_headers(headers):
+    """Merge the header lines of VCFs, like `bcftools concat`.
+
+    Lines with an ID are kept once per type and ID, other lines once, and
+    only the first `##fileformat` line is kept.
+
+    :param headers: lists of header lines.
+    :returns: list of header lines.
+    """
+    lines = []
+    seen = set()
+    columns = None
+    for header in headers:
+        for line in header:
+            if line.startswith(b'#CHROM'):
+                if columns is None:
+                    columns = line
+                elif line.split(b'\t')[9:] != columns.split(b'\t')[9:]:
+                    raise ValueError("The VCFs have different samples.")
+                continue
+            if line.startswith(b'##fileformat='):
+                key = b'##fileformat'
+            elif b'=<ID=' in line:
+                key = line.split(b',', 1)[0].rstrip(b'>')
+            else:
+                key = line
+            if key not in seen:
+                seen.add(key)
+                lines.append(line)
+    if columns is None:
+        raise ValueError("No #CHROM header line found.")
+    return lines + [columns]
+
+
+def header_contigs(header):
+    """Return the lengths of the contigs of header lines, None if unknown."""
+    contigs = {}
+    for line in header:
+        if line.startswith(b'##contig=<'):
+            fields = dict(
+                field.split(b'=', 1) for field in line[10:].rstrip(b'>').split(b',')
+                if b'=' in field)
+            length = fields.get(b'length')
+            contigs[fields[b'ID']] = int(length) if length else None
+    return contigs
+
+
+def reg2bin(beg, end, min_shift, depth):
+    """Return the bin of a 0-based, half-open interval (htslib `hts_reg2bin`)."""
+    end -= 1
+    shift = min_shift
+    offset = ((1 << (3 * depth + 3)) - 1) // 7
+    for level in range(depth, 0, -1):
+        offset -= 1 << (3 * level)
+        if beg >> shift == end >> shift:
+            return offset + (beg >> shift)
+        shift += 3
+    return 0
+
+
+class VcfIndex:
+    """Tabix (TBI) or CSI index of a BGZF-compressed VCF, built record by record.
+
+    Records must be added in the order of the file, with the virtual offsets
+    of their start and end.
+    """
+
+    def __init__(self, csi=False, max_length=None, min_shift=14):
+        """Initialize the index.
+
+        :param csi: build a CSI index instead of a tabix index.
+        :param max_length: length of the longest contig, setting the depth
+            of the CSI bins; by default, contigs up to 2^32.
+        :param min_shift: log2 of the size of the smallest CSI bins.
+        """
+        self.csi = csi
+        if csi:
+            self.min_shift = min_shift
+            # levels of bins needed to cover the longest contig, as htslib
+            max_length = (max_length or 1 << 32) + 256
+            self.depth = 0
+            while max_length > 1 << (min_shift + 3 * self.depth):
+                self.depth += 1
+        else:
+            self.min_shift, self.depth = 14, 5
+        self.max_length = 1 << (self.min_shift + 3 * self.depth)
+        # first bin of the smallest bins
+        self._bottom = ((1 << (3 * self.depth)) - 1) // 7
+        self.names = []
+        self._refs = []
+        self._chrom = None
+
+    def _new_ref(self, chrom, start_offset):
+        if chrom in self.names:
+            raise ValueError(f"Records of {chrom.decode()} are not contiguous.")
+        self.names.append(chrom)
+        self._chrom = chrom
+        # bins, with their chunks as flat lists of offsets, and linear index
+        self._bins, self._linear = {}, []
+        self._refs.append({
+            'bins': self._bins, 'linear': self._linear, 'n': 0,
+            'start': start_offset})
+
+    def add(self, chrom, beg, end, start_offset, end_offset):
+        """Add a record.
+
+        :param chrom: contig name, as bytes.
+        :param beg: 0-based start.
+        :param end: 0-based, exclusive end.
+        :param start_offset: virtual offset of the record.
+        :param end_offset: virtual offset after the record.
+        """
+        if chrom != self._chrom:
+            self._new_ref(chrom, start_offset)
+        if end <= beg:
+            end = beg + 1
+        if end > self.max_length:
+            raise ValueError(
+                f"Position {end} of {chrom.decode()} is beyond the "
+                f"{self.max_length} supported by the index; use a CSI index.")
+        first, last = beg >> self.min_shift, (end - 1) >> self.min_shift
+        if first == last:
+            bin_ = self._bottom + first
+        else:
+            bin_ = reg2bin(beg, end, self.min_shift, self.depth)
+        chunks = self._bins.get(bin_)
+        if chunks is None:
+            self._bins[bin_] = [start_offset, end_offset]
+        elif chunks[-1] == start_offset:
+            chunks[-1] = end_offset
+        else:
+            chunks += (start_offset, end_offset)
+        linear = self._linear
+        if last >= len(linear):
+            linear.extend([None] * (last + 1 - len(linear)))
+        for window in range(first, last + 1):
+            if linear[window] is None:
+                linear[window] = start_offset
+        ref = self._refs[-1]
+        ref['n'] += 1
+        ref['end'] = end_offset
+
+    def _bin_start(self, bin_):
+        """Return the first window of the linear index in a bin."""
+        level, first = 0, 0
+        while bin_ >= first + (1 << (3 * level)):
+            first += 1 << (3 * level)
+            level += 1
+        return (bin_ - first) << (3 * (self.depth - level))
+
+    def _ref_bytes(self, ref):
+        """Encode the bins, and for a tabix index the linear index, of a contig."""
+        # fill the windows without records, which are never the first
+        # window of a query hit, with the offsets of neighbouring windows
+        linear = ref['linear']
+        filled = next(offset for offset in linear if offset is not None)
+        for i, offset in enumerate(linear):
+            if offset is None:
+                linear[i] = filled
+            else:
+                filled = offset
+        meta_bin = ((1 << (3 * self.depth + 3)) - 1) // 7 + 1
+        bins = sorted(ref['bins'].items())
+        out = [struct.pack('<i', len(bins) + 1)]
+        for bin_, offsets in bins:
+            # merge chunks ending and starting in the same BGZF block
+            merged = offsets[:2]
+            for i in range(2, len(offsets), 2):
+                if merged[-1] >> 16 == offsets[i] >> 16:
+                    merged[-1] = offsets[i + 1]
+                else:
+                    merged += offsets[i:i + 2]
+            out.append(struct.pack('<I', bin_))
+            if self.csi:
+                window = self._bin_start(bin_)
+                out.append(struct.pack('<Q', linear[min(window, len(linear) - 1)]))
+            out.append(struct.pack(f'<i{len(merged)}Q', len(merged) // 2, *merged))
+        # pseudo-bin with the offsets and number of records of the contig
+        out.append(struct.pack('<I', meta_bin))
+        if self.csi:
+            out.append(struct.pack('<Q', 0))
+        out.append(struct.pack('<iQQQQ', 2, ref['start'], ref['end'], ref['n'], 0))
+        if not self.csi:
+            out.append(struct.pack(f'<i{len(linear)}Q', len(linear), *linear))
+        return b''.join(out)
+
+    def write(self, fname):
+        """Write the BGZF-compressed index."""
+        names = b''.join(name + b'\x00' for name in self.names)
+        # VCF preset of tabix: columns of the contig and position, `#` headers
+        conf = struct.pack('<7i', 2, 1, 2, 0, ord('#'), 0, len(names)) + names
+        if self.csi:
+            head = b'CSI\x01' + struct.pack(
+                '<3i', self.min_shift, self.depth, len(conf)) + conf
+            head += struct.pack('<i', len(self._refs))
+        else:
+            head = b'TBI\x01' + struct.pack('<i', len(self._refs)) + conf
+        with pysam.BGZFile(fname, 'wb') as fh:
+            fh.write(head)
+            for ref in self._refs:
+                fh.write(self._ref_bytes(ref))
+            fh.write(struct.pack('<Q', 0))
+
+
+def record_end(line, beg):
+    """Return the 0-based, exclusive end of a VCF line, as tabix does.
+
+    This is the end of the reference allele, or the INFO END if given.
+    """
+    fields = line.split(b'\t', 8)
+    end = beg + len(fields[3])
+    info = fields[7]
+    if b'END=' in info:
+        for item in info.split(b';'):
+            if item.startswith(b'END='):
+                value = int(item[4:])
+                return value if value > beg else end
+    return end
+
+
+def _in_run(key, last, next_key):
+    """Return if a record continues a sorted run, given the next record."""
+    return (last is None or key >= last) and (next_key is None or key <= next_key)
+
+
+class VcfSorter:
+    """External sort of VCFs, merging their sorted runs.
+
+    The inputs are split in segments, each with a run of sorted records:
+    those not lower than the last record of the run and not greater than the
+    next record of the input, so that a record out of place does not end the
+    run. A segment ends when `MAX_REJECTED` records in a row are not in its
+    run. The longest runs are read again from the inputs when merging, while
+    the records out of them, and all those of the other segments, are sorted
+    in memory and spilled to disk as sorted chunks.
+    """
+
+    def __init__(
+            self, fnames, max_memory=2 << 30, tmpdir=None, min_run=MIN_RUN,
+            max_runs=MAX_RUNS):
+        """Open the inputs and merge their headers.
+
+        :param fnames: paths of the input VCFs.
+        :param max_memory: memory of the records sorted in memory, in bytes.
+        :param tmpdir: directory of the spilled chunks.
+        :param min_run: shortest run merged directly from an input.
+        :param max_runs: most runs merged directly from the inputs.
+        :raises ValueError: if `min_run` is lower than 1.
+        """
+        if min_run < 1:
+            raise ValueError("The shortest run merged must have at least 1 record.")
+        self.fnames = fnames
+        self.max_memory = max_memory
+        self.tmpdir = tmpdir
+        self.min_run = min_run
+        self.max_runs = max_runs
+        self.readers = [VcfReader(fname) for fname in fnames]
+        self.header = merge_headers(reader.read_header() for reader in self.readers)
+        self.contigs = header_contigs(self.header)
+        # contigs missing from the header are sorted after the others
+        self.names = list(self.contigs)
+        self.ranks = {name: rank for rank, name in enumerate(self.names)}
+        self.records = 0
+        self.spilled = 0
+        self._buffer = []
+        self._size = 0
+        self._chunks = []
+
+    def key(self, line):
+        """Return the contig rank and position of a record."""
+        chrom, pos, _ = line.split(b'\t', 2)
+        rank = self.ranks.get(chrom)
+        if rank is None:
+            rank = self.ranks[chrom] = len(self.names)
+            self.names.append(chrom)
+        return rank, int(pos)
+
+    def _sort(self, record, directory):
+        """Add a record to those sorted in memory, spilling them when full."""
+        self._buffer.append(record)
+        self._size += len(record[-1]) + RECORD_OVERHEAD
+        if self._size > self.max_memory:
+            self._buffer.sort()
+            with tempfile.NamedTemporaryFile(
+                    'wb', dir=directory, suffix='.chunk', delete=False) as fh:
+                for _, _, i, index, line in self._buffer:
+                    fh.write(b'%d\t%d\t%s\n' % (i, index, line))
+            self._chunks.append(fh.name)
+            self.spilled += len(self._buffer)
+            self._buffer, self._size = [], 0
+
+    def find_runs(self, directory):
+        """Split the inputs in segments, sorting the records out of their runs.
+
+        :param directory: directory of the spilled chunks.
+        :returns: list of (input, offset, first record, records, records of
+            the run, first and last key of the run) tuples.
+        """
+        runs = []
+        for i, reader in enumerate(self.readers):
+            start, first = reader.tell(), 0
+            count = kept = rejected = index = 0
+            last = pending = head = None
+            while True:
+                offset = reader.tell()
+                line = reader.readline()
+                key = None if line is None else self.key(line)
+                if pending is not None:
+                    if _in_run(pending[:2], last, key):
+                        last = pending[:2]
+                        head = head or last
+                        kept += 1
+                        rejected = 0
+                    else:
+                        self._sort(pending, directory)
+                        rejected += 1
+                    count += 1
+                    if rejected >= MAX_REJECTED and key is not None:
+                        runs.append((i, start, first, count, kept, head, last))
+                        start, first = offset, index
+                        count = kept = rejected = 0
+                        last = head = None
+                if key is None:
+                    break
+                pending = (*key, i, index, line)
+                index += 1
+            if count:
+                runs.append((i, start, first, count, kept, head, last))
+            self.records += index
+        return runs
+
+    def _read_run(self, run, reader=None):
+        """Yield the records of the run of a segment, with their sort keys."""
+        i, offset, first, count = run[:4]
+        # runs merged concurrently each have their own reader, closed here
+        owned = reader is None
+        if owned:
+            reader = VcfReader(self.fnames[i])
+        try:
+            reader.seek(offset)
+            line = reader.readline()
+            key = self.key(line)
+            last = None
+            for index in range(first, first + count):
+                record = (*key, i, index, line)
+                # the next record decides if this one is in the run
+                line = reader.readline()
+                next_key = None if line is None else self.key(line)
+                if _in_run(key, last, next_key):
+                    last = key
+                    yield record
+                key = next_key
+        finally:
+            if owned:
+                reader.close()
+
+    def _read_chunk(self, fname):
+        """Yield the records of a spilled chunk with their sort keys."""
+        with open(fname, 'rb') as fh:
+            for line in fh:
+                i, index, line = line.rstrip(b'\n').split(b'\t', 2)
+                yield (*self.key(line), int(i), int(index), line)
+
+    def sorted_records(self, directory, logger=None):
+        """Return an iterator of the sorted records.
+
+        :param directory: directory of the spilled chunks.
+        :param logger: logger reporting the runs found.
+        """
+        with phase('scan'):
+            runs = self.find_runs(directory)
+        long_runs = sorted(
+            (run for run in runs if run[4] >= self.min_run),
+            key=lambda run: run[4], reverse=True)[:self.max_runs]
+        selected = set(long_runs)
+        with phase('spill'):
+            for run in runs:
+                if run not in selected:
+                    for record in self._read_run(run, self.readers[run[0]]):
+                        self._sort(record, directory)
+            self._buffer.sort()
+        if logger is not None:
+            in_runs = sum(run[4] for run in long_runs)
+            logger.info(
+                f"Found {len(runs)} sorted runs in {self.records:,} records; "
+                f"merging {len(long_runs)} runs of {in_runs:,} records with "
+                f"{self.records - in_runs:,} sorted records, of which "
+                f"{self.spilled:,} spilled to {len(self._chunks)} files.")
+        # runs following each other are read one after the other
+        chains = []
+        for run in sorted(long_runs, key=lambda run: run[5]):
+            chain = next((c for c in chains if c[-1][6] < run[5]), None)
+            if chain is None:
+                chains.append([run])
+            else:
+                chain.append(run)
+        return heapq.merge(
+            *(itertools.chain.from_iterable(map(self._read_run, chain))
+                for chain in chains),
+            *(self._read_chunk(fname) for fname in self._chunks),
+            self._buffer)
+
+    def write(self, fname, csi=False, logger=None):
+        """Write the sorted records to a BGZF file, with its index.
+
+        :param fname: output VCF.
+        :param csi: write a CSI index, rather than a tabix index.
+        :param logger: logger reporting the progress.
+        :returns: path of the index.
+        """
+        logger = logger or get_named_logger("sort_vcf")
+        lengths = [length for length in self.contigs.values() if length]
+        index = VcfIndex(
+            csi=csi, max_length=max(lengths) if csi and lengths else None)
+        names = self.names
+        with tempfile.TemporaryDirectory(dir=self.tmpdir) as directory:
+            records = self.sorted_records(directory, logger=logger)
+            with pysam.BGZFile(fname, 'wb') as fh, phase('merge'), Progress(
+                    logger, 'variants', total_records=self.records) as progress:
+                fh.write(b'\n'.join(self.header) + b'\n')
+                start = fh.tell()
+                for rank, pos, _, _, line in records:
+                    fh.write(line + b'\n')
+                    end = fh.tell()
+                    beg = pos - 1
+                    index.add(names[rank], beg, record_end(line, beg), start, end)
+                    start = end
+                    progress.update()
+        index_fname = f"{fname}.{'csi' if csi else 'tbi'}"
+        index.write(index_fname)
+        for reader in self.readers:
+            reader.close()
+        return index_fname
+
+
+def main(args):
+    """Run the entry point."""
+    logger = get_named_logger("sort_vcf")
+    sorter = VcfSorter(
+        args.vcfs, max_memory=parse_size(args.max_memory), tmpdir=args.tmpdir,
+        min_run=args.min_run)
+    index = sorter.write(args.output, csi=args.csi, logger=logger)
+    logger.info(f"Written {args.output} and {index}.")
+
+
+def argparser():
+    """Create argument parser."""
+    parser = wf_parser("sort_vcf")
+    parser.add_argument(
+        "vcfs", nargs="+",
+        help="Input VCFs, plain or compressed with bgzip")
+    parser.add_argument(
+        "-o", "--output", required=True,
+        help="Output VCF, compressed with bgzip")
+    parser.add_argument(
+        "--max_memory", default="2G",
+        help="Memory of the records sorted in memory before being spilled to disk")
+    parser.add_argument(
+        "--tmpdir", default=None,
+        help="Directory of the records spilled to disk")
+    parser.add_argument(
+        "--csi", action="store_true",
+        help="Write a CSI index rather than a tabix index, for contigs over 512 Mb")
+    parser.add_argument(
+        "--min_run", type=min_run_length, default=MIN_RUN,
+        help="Shortest run of sorted records merged without being sorted again")
+    return parser
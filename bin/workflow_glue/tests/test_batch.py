@@ -0,0 +1,77 @@
+"""Tests of running a manifest of subcommand invocations."""
+
+import json
+import os
+import signal
+import subprocess
+import sys
+
+import pytest
+from workflow_glue.batch import read_manifest, run_batch
+
+BIN = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+GLUE = os.path.join(BIN, "workflow-glue")
+
+
+def test_read_manifest(tmp_path):
+    """Check comments and blank lines are skipped."""
+    manifest = tmp_path / "manifest.tsv"
+    manifest.write_text(
+        "# header\ncheck_sample_sheet\ta.csv\n\n"
+        "check_sample_sheet\tb.csv\t--required_sample_types\ttest_sample\n")
+    assert read_manifest(manifest) == [
+        (2, ["check_sample_sheet", "a.csv"]),
+        (4, [
+            "check_sample_sheet", "b.csv",
+            "--required_sample_types", "test_sample"])]
+
+
+def test_read_manifest_nested(tmp_path):
+    """Check a manifest cannot start servers or other batches."""
+    manifest = tmp_path / "manifest.tsv"
+    manifest.write_text("batch\tother.tsv\n")
+    with pytest.raises(ValueError):
+        read_manifest(manifest)
+
+
+def test_batch(tmp_path):
+    """Check the exit codes and outputs are collected for each line."""
+    (tmp_path / "sheet.csv").write_text("barcode,alias\nbarcode01,sample\n")
+    (tmp_path / "manifest.tsv").write_text(
+        "check_sample_sheet\tsheet.csv\n"
+        "check_sample_sheet\tmissing.csv\n"
+        "check_sample_sheet\n")
+    proc = subprocess.run(
+        [sys.executable, GLUE, "batch", "manifest.tsv", "--threads", "2"],
+        cwd=tmp_path, capture_output=True, text=True)
+    assert proc.returncode == 1
+    with open(tmp_path / "batch_summary.json") as fh:
+        summary = json.load(fh)
+    assert summary["invocations"] == 3
+    assert summary["failed"] == 1
+    results = summary["results"]
+    assert [result["line"] for result in results] == [1, 2, 3]
+    assert [result["exit_code"] for result in results] == [0, 0, 2]
+    assert "Checked sample sheet sheet.csv." in results[0]["log"]
+    assert "Could not open sample sheet 'missing.csv'." in results[1]["log"]
+    assert "required: sample_sheet" in results[2]["log"]
+
+
+def test_batch_killed(monkeypatch):
+    """Check an invocation killed by a signal fails without blocking the others."""
+    import workflow_glue
+
+    def run(argv):
+        if argv == ["kill"]:
+            os.kill(os.getpid(), signal.SIGKILL)
+        if argv == ["exit"]:
+            os._exit(3)
+        os.write(1, f"ran {argv[0]}\n".encode())
+        return 0
+
+    monkeypatch.setattr(workflow_glue, "run", run)
+    results = run_batch(
+        [(1, ["kill"]), (2, ["ok"]), (3, ["exit"]), (4, ["ok"])], threads=2)
+    assert [result["exit_code"] for result in results] == [-signal.SIGKILL, 0, 3, 0]
+    assert results[0]["log"] == "Killed by signal SIGKILL.\n"
+    assert results[1]["log"] == "ran ok\n"
@@ -0,0 +1,112 @@
+"""Tests of the benchmarks on synthetic inputs."""
+
+import json
+import os
+import subprocess
+import sys
+
+import pysam
+import pytest
+from workflow_glue.benchmarks import synthetic
+from workflow_glue.benchmarks.compare import compare, format_table
+from workflow_glue.benchmarks.suite import Dataset, summarise
+
+BIN = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+GLUE = os.path.join(BIN, "workflow-glue")
+
+
+def test_synthetic_vcf(tmp_path):
+    """Check the synthetic variants match the reference."""
+    data = Dataset(str(tmp_path), 500)
+    ref = pysam.FastaFile(data.reference)
+    n = 0
+    with pysam.VariantFile(data.snv_vcf) as vcf:
+        for record in vcf:
+            assert ref.fetch(record.chrom, record.pos - 1, record.stop) == record.ref
+            n += 1
+    assert n == 500
+    sv = synthetic.nanomonsv(
+        str(tmp_path / "sv"), 50, data.sequences, data.rng("sv"))
+    with pysam.VariantFile(sv["vcf"]) as vcf:
+        assert len(list(vcf)) >= 50
+
+
+def test_summarise():
+    """Check the runs of a benchmark are summarised by their medians."""
+    runs = [
+        {"exit_code": 0, "wall_time": wall_time, "peak_rss": peak_rss}
+        for wall_time, peak_rss in ((2.0, 300), (1.0, 100), (4.0, 200))]
+    failed = {"exit_code": 1, "error": "Traceback"}
+    assert summarise([*runs, failed], 1000) == {
+        "wall_time": 2.0, "throughput": 500.0, "peak_rss": 200}
+    assert summarise([failed], 1000) == {"error": "Traceback"}
+    runs[0]["wall_time"] = 0
+    assert summarise(runs[:1], 1000)["throughput"] is None
+
+
+def _result(wall_times, peak_rss, records=1000):
+    runs = [
+        {"exit_code": 0, "wall_time": wall_time, "peak_rss": peak_rss}
+        for wall_time in wall_times]
+    return {"command": "test", "scale": records, "records": records, "runs": runs}
+
+
+def test_compare():
+    """Check regressions beyond the tolerance and the noise are flagged."""
+    baseline = {
+        "slower/1000": _result([1.0, 1.02, 0.98], 100),
+        "noisy/1000": _result([1.0, 1.02, 0.98], 100),
+        "larger/1000": _result([1.0, 1.02, 0.98], 100),
+        "faster/1000": _result([1.0, 1.02, 0.98], 100)}
+    results = {
+        "slower/1000": _result([1.3, 1.31, 1.29], 100),
+        # the median drops but the runs overlap with the baseline
+        "noisy/1000": _result([0.8, 1.2, 2.0], 100),
+        "larger/1000": _result([1.0, 1.02, 0.98], 150),
+        "faster/1000": _result([0.5, 0.51, 0.49], 100),
+        "new/1000": _result([1.0], 100),
+        "failed/1000": {"command": "test", "scale": 1000, "runs": [
+            {"exit_code": 1, "error": ""}]}}
+    verdicts = compare(baseline, results, tolerance=0.1, rss_tolerance=0.1)
+    assert {key: verdict["status"] for key, verdict in verdicts.items()} == {
+        "slower/1000": "regressed", "noisy/1000": "ok",
+        "larger/1000": "regressed", "faster/1000": "improved",
+        "new/1000": "new", "failed/1000": "failed"}
+    assert verdicts["slower/1000"]["throughput"]["change"] == pytest.approx(
+        1 / 1.3 - 1)
+    assert verdicts["larger/1000"]["peak_rss"]["status"] == "regressed"
+    assert verdicts["larger/1000"]["throughput"]["status"] == "ok"
+    table = format_table(verdicts).splitlines()
+    assert len(table) == 7
+    assert table[1].split()[-1] == "regressed"
+
+
+def test_cli(tmp_path):
+    """Check the benchmarks of a baseline are run again and compared with it."""
+    with open(tmp_path / "baseline.json", "w") as fh:
+        json.dump({
+            "seed": 1,
+            "benchmarks": {"vcf_stats/100": {
+                "command": "vcf_stats", "scale": 100, "records": 100,
+                "runs": [{"exit_code": 0, "wall_time": 1e-6, "peak_rss": 1}]}}},
+            fh)
+    proc = subprocess.run(
+        [sys.executable, GLUE, "benchmark", "--baseline", "baseline.json",
+            "--repeats", "2", "--workdir", "work"],
+        cwd=tmp_path, capture_output=True, text=True)
+    assert proc.returncode == 1, proc.stderr
+    assert "vcf_stats/100" in proc.stdout
+    with open(tmp_path / "benchmark_verdict.json") as fh:
+        verdict = json.load(fh)
+    assert not verdict["passed"]
+    assert verdict["regressed"] == ["vcf_stats/100"]
+    with open(tmp_path / "benchmark.json") as fh:
+        results = json.load(fh)
+    assert results["seed"] == 1
+    assert results["cpus"] == os.cpu_count()
+    result = results["benchmarks"]["vcf_stats/100"]
+    assert [run["exit_code"] for run in result["runs"]] == [0, 0]
+    assert result["runs"][0]["records"] == {"records": 100}
+    assert result["throughput"] == 100 / result["wall_time"]
+    # outputs are kept in a given work directory
+    assert (tmp_path / "work" / "runs" / "vcf_stats.100.1").is_dir()
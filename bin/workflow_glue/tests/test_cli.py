@@ -0,0 +1,39 @@
+"""Tests of the workflow-glue command line."""
+
+import os
+import subprocess
+import sys
+import time
+
+from workflow_glue import get_components, get_manifest
+
+BIN = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Wall time allowed for the help of a lightweight subcommand, in seconds
+HELP_BUDGET = 3.0
+
+
+def test_manifest():
+    """Check the manifest lists all the command scripts."""
+    assert sorted(get_manifest()) == sorted(get_components())
+
+
+def test_light_command_help():
+    """Check a lightweight subcommand starts without the report modules."""
+    code = (
+        "import sys\n"
+        "sys.argv = ['workflow-glue', 'check_sample_sheet', '--help']\n"
+        "from workflow_glue import cli\n"
+        "try:\n"
+        "    cli()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "heavy = ('ezcharts', 'pandas', 'pysam', 'workflow_glue.report_qc')\n"
+        "print('heavy:' + ','.join(m for m in heavy if m in sys.modules))\n")
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=BIN,
+        capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    assert proc.stdout.splitlines()[-1] == 'heavy:'
+    assert 'usage: wf-glue check_sample_sheet' in proc.stdout
+    assert elapsed < HELP_BUDGET, f"--help took {elapsed:.2f}s"
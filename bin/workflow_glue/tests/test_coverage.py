@@ -0,0 +1,151 @@
+"""Tests of the preparation of genomic tracks for plotting."""
+
+from ezcharts.components.common import add_missing_windows
+import numpy as np
+import pandas as pd
+import pytest
+from workflow_glue.report_utils.coverage import compact_track, coverage_track
+from workflow_glue.report_utils.coverage import downsample_track
+from workflow_glue.report_utils.coverage import fill_missing_windows
+from workflow_glue.report_utils.coverage import intervals_to_steps
+
+
+def regions(lengths, winsize, rng):
+    """Make a mosdepth regions table, as loaded by `load_mosdepth_regions`."""
+    dfs = []
+    offset = 0
+    for chrom, length in lengths.items():
+        start = np.arange(0, length, winsize)
+        end = np.minimum(start + winsize, length)
+        dfs.append(pd.DataFrame({
+            "chrom": chrom, "start": start, "end": end,
+            "depth": rng.gamma(30, 1, start.size),
+            "mean_pos": (start + end) / 2,
+            "total_mean_pos": offset + (start + end) / 2}))
+        offset += length
+    return pd.concat(dfs, ignore_index=True).astype({"chrom": "category"})
+
+
+def baseline_extremes(df, max_points):
+    """Select the extremes of each group of windows with a loop."""
+    n_chroms = df["chrom"].nunique()
+    keep = []
+    for _, chrom in df.groupby("chrom", observed=True, sort=False):
+        n_groups = max(1, int(chrom.shape[0] / df.shape[0] * max_points / 2))
+        size = int(np.ceil(chrom.shape[0] / n_groups))
+        for start in range(0, chrom.shape[0], size):
+            group = chrom["depth"].iloc[start:start + size]
+            keep.extend([group.idxmin(), group.idxmax()])
+    assert len(keep) <= max_points + 2 * n_chroms
+    return sorted(set(keep))
+
+
+def test_compact_track():
+    """Check the compact track keeps the plotted values."""
+    df = regions({"chr1": 3000000, "chr2": 1000000}, 25000, np.random.default_rng(1))
+    track = compact_track(df)
+    assert list(track.columns) == ["chrom", "start", "end", "total_mean_pos", "depth"]
+    assert track["start"].dtype == np.int32
+    assert track["depth"].dtype == np.float32
+    assert track["chrom"].tolist() == df["chrom"].tolist()
+    assert np.array_equal(track["end"], df["end"])
+    assert np.array_equal(track["total_mean_pos"], df["total_mean_pos"])
+    np.testing.assert_allclose(track["depth"], df["depth"], rtol=1e-6)
+
+
+@pytest.mark.parametrize("max_points", [50, 400, 1999])
+def test_downsample_track(max_points):
+    """Check the extremes of each group of windows are kept, within budget."""
+    lengths = {"chr1": 30000000, "chr2": 15000000, "chrM": 16569}
+    df = compact_track(regions(lengths, 25000, np.random.default_rng(2)))
+    down = downsample_track(df, max_points)
+    assert down.shape[0] <= max_points + 2 * len(lengths)
+    assert down.index.tolist() == baseline_extremes(df, max_points)
+    # the lowest and highest window of each chromosome are kept
+    for chrom, group in df.groupby("chrom", observed=True):
+        kept = down.loc[down["chrom"] == chrom, "depth"]
+        assert kept.min() == group["depth"].min()
+        assert kept.max() == group["depth"].max()
+
+
+def test_downsample_within_budget():
+    """Check tracks within budget are kept as they are."""
+    df = regions({"chr1": 1000000}, 25000, np.random.default_rng(3))
+    assert downsample_track(df, None) is df
+    assert downsample_track(df, df.shape[0]) is df
+    # windows are grouped by position, but kept in the input order
+    track = coverage_track(df.iloc[::-1], max_points=10)
+    assert track.shape[0] <= 10
+    assert track.index.tolist() == list(range(track.shape[0]))
+    assert np.all(np.diff(track["total_mean_pos"]) < 0)
+
+
+def dmrs(faidx, n, rng):
+    """Make sparse, non-overlapping intervals with an areaStat value."""
+    dfs = []
+    for chrom, length in faidx[["chrom", "length"]].values:
+        bounds = np.sort(rng.choice(length // 100, size=2 * n, replace=False)) * 100
+        dfs.append(pd.DataFrame({
+            "chrom": chrom, "start": bounds[0::2], "end": bounds[1::2],
+            "areaStat": rng.normal(0, 50, n), "nCG": rng.integers(1, 100, n)}))
+    df = pd.concat(dfs, ignore_index=True)
+    # intervals starting at 0 and touching each other, and an unknown contig
+    df.loc[0, "start"] = 0
+    df.loc[2, "start"] = df.loc[1, "end"]
+    unknown = pd.DataFrame({
+        "chrom": ["chrUn"], "start": [0], "end": [10], "areaStat": [1.0], "nCG": [1]})
+    return pd.concat([df, unknown], ignore_index=True).sample(frac=1, random_state=1)
+
+
+FAIDX = pd.DataFrame({
+    "chrom": ["chr2", "chr1", "chrX", "chrM", "chr3"],
+    "length": [3000000, 5000000, 2000000, 16569, 1000000]})
+
+
+def test_fill_missing_windows():
+    """Check the windows match the windows of ezcharts add_missing_windows."""
+    df = dmrs(FAIDX.iloc[:-1], 20, np.random.default_rng(1))
+    df = df.astype({"chrom": "category"})
+    filled = fill_missing_windows(df, FAIDX, value="areaStat")
+    expected = add_missing_windows(df, FAIDX, value="areaStat")
+    cols = ["chrom", "start", "end", "areaStat"]
+    pd.testing.assert_frame_equal(
+        filled[cols].astype({"chrom": str}), expected[cols].astype({"chrom": str}))
+    # chromosomes without intervals are covered, short ones are dropped
+    assert set(filled["chrom"]) == {"chr1", "chr2", "chr3", "chrX"}
+    assert filled.loc[filled["chrom"] == "chr3", "areaStat"].eq(0).all()
+
+
+def baseline_steps(df, offsets, value, order):
+    """Compute the step points with the melt of `intervals_to_points`."""
+    df = df.loc[df["chrom"].isin(offsets.index)].copy()
+    df["start"] = df.apply(lambda x: x.start + offsets[x.chrom], axis=1)
+    df["end"] = df.apply(lambda x: x.end + offsets[x.chrom], axis=1)
+    points = pd.melt(
+        df[["chrom", "start", "end", value]],
+        id_vars=["chrom", value], value_name="pos")
+    points["rank"] = points["chrom"].map({chrom: i for i, chrom in enumerate(order)})
+    points = points.sort_values(["rank", "pos", "variable"])
+    return points[["chrom", "pos", value]] \
+        .rename(columns={value: "value"}).reset_index(drop=True)
+
+
+def test_intervals_to_steps():
+    """Check the step points match the melted and sorted intervals."""
+    faidx = FAIDX.iloc[:3]
+    df = fill_missing_windows(
+        dmrs(faidx, 30, np.random.default_rng(2)), faidx, value="areaStat")
+    offsets = pd.Series(
+        np.r_[0, np.cumsum(faidx["length"])[:-1]], index=faidx["chrom"])
+    # chromosomes plotted in karyotype order rather than reference order
+    order = ["chr1", "chr2", "chrX"]
+    steps = intervals_to_steps(df, offsets, "areaStat", order=order)
+    expected = baseline_steps(df, offsets, "areaStat", order)
+    assert steps["chrom"].cat.categories.tolist() == order
+    assert steps["chrom"].astype(str).tolist() == expected["chrom"].tolist()
+    assert np.array_equal(steps["pos"], expected["pos"])
+    assert np.array_equal(steps["value"], expected["value"])
+    # chromosomes missing from the offsets are dropped
+    steps = intervals_to_steps(df, offsets.iloc[:2], "areaStat")
+    assert set(steps["chrom"]) == {"chr1", "chr2"}
+    assert steps.shape[0] == 2 * df["chrom"].isin(["chr1", "chr2"]).sum()
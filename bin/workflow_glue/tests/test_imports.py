@@ -0,0 +1,87 @@
+"""Tests of the import cost of lightweight modules."""
+
+import gzip
+import os
+import subprocess
+import sys
+
+import pytest
+from workflow_glue.report_utils.constants import MOD_CONVERT
+
+BIN = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Plotting and report libraries, loaded only when a report is built
+HEAVY = ('ezcharts', 'seaborn', 'bokeh', 'dominate', 'matplotlib')
+# Cumulative import time allowed for modules without numerical dependencies
+IMPORT_BUDGET = 0.5
+
+
+def import_times(module):
+    """Return the cumulative import time of each module loaded by `module`.
+
+    :param module: name of the module to import.
+    :returns: dictionary of import times, in seconds.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BIN, capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+@pytest.mark.parametrize("module", [
+    "workflow_glue.check_sample_sheet",
+    "workflow_glue.mod_split",
+    "workflow_glue.read_stats_sketch",
+    "workflow_glue.report_utils.constants",
+    "workflow_glue.report_utils.utils",
+    "workflow_glue.report_utils.visualizations",
+])
+def test_no_plotting_imports(module):
+    """Check a module does not load plotting libraries when imported."""
+    times = import_times(module)
+    assert module in times
+    loaded = sorted({
+        name.split('.')[0] for name in times if name.split('.')[0] in HEAVY})
+    assert not loaded, f"{module} imports {', '.join(loaded)}"
+
+
+@pytest.mark.parametrize("module", [
+    "workflow_glue.mod_split",
+    "workflow_glue.report_utils.constants",
+])
+def test_import_budget(module):
+    """Check a module without numerical dependencies imports quickly."""
+    elapsed = import_times(module)[module]
+    assert elapsed < IMPORT_BUDGET, f"import {module} took {elapsed:.2f}s"
+
+
+def test_mod_convert():
+    """Check the modification codes match those of ezcharts."""
+    from ezcharts.components import common
+    assert MOD_CONVERT == common.MOD_CONVERT
+
+
+def test_mod_split_run(tmp_path):
+    """Check mod_split splits a bedMethyl file without loading plotting libraries."""
+    with gzip.open(tmp_path / "in.bed.gz", "wt") as fh:
+        fh.write(
+            "chr1\t10\t11\tm\t5\t+\n"
+            "chr1\t10\t11\th\t5\t+\n"
+            "chr1\t20\t21\tm\t5\t.\n")
+    script = (
+        "import argparse, sys\n"
+        "from workflow_glue import mod_split\n"
+        "mod_split.main(argparse.Namespace(bedmethyl='in.bed.gz'))\n"
+        f"print(sorted(set(sys.modules) & set({HEAVY!r})))\n")
+    proc = subprocess.run(
+        [sys.executable, "-c", script], cwd=tmp_path, capture_output=True,
+        text=True, check=True, env={**os.environ, "PYTHONPATH": BIN})
+    assert proc.stdout.strip() == "[]"
+    assert (tmp_path / "5mC_+.in.bed").read_text().count("\n") == 1
+    assert (tmp_path / "5hmC_+.in.bed").exists()
+    assert (tmp_path / "5mC.in.bed").exists()
@@ -0,0 +1,98 @@
+"""Tests of the profiling and resource usage of subcommands."""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+from ezcharts.components.common import fasta_idx
+import pytest
+from workflow_glue._instrument import instrument
+from workflow_glue.report_mod import load_dss_outputs
+from workflow_glue.util import count_records, phase
+
+BIN = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+GLUE = os.path.join(BIN, "workflow-glue")
+
+
+def test_phases_and_records(tmp_path):
+    """Check phase timings and record counts are written to the metrics."""
+    fname = tmp_path / "metrics.json"
+    with instrument("test", [], metrics_json=str(fname)):
+        with phase("load"):
+            time.sleep(0.02)
+        with phase("load"):
+            time.sleep(0.02)
+        count_records(3)
+        count_records(2, "variants")
+    with open(fname) as fh:
+        metrics = json.load(fh)
+    assert metrics["exit_code"] == 0
+    assert metrics["phases"]["load"] >= 0.04
+    assert metrics["wall_time"] >= metrics["phases"]["load"]
+    assert metrics["records"] == {"records": 3, "variants": 2}
+    assert metrics["peak_rss"] > 0
+
+
+def test_exit_code(tmp_path):
+    """Check the exit code of a failing subcommand is recorded."""
+    fname = tmp_path / "metrics.json"
+    with pytest.raises(SystemExit):
+        with instrument("test", [], metrics_json=str(fname)):
+            sys.exit(3)
+    with open(fname) as fh:
+        assert json.load(fh)["exit_code"] == 3
+
+
+@pytest.mark.parametrize("profile,suffix", [
+    ("cprofile", ".prof"), ("sampling", ".folded")])
+def test_cli_profile(tmp_path, profile, suffix):
+    """Check the global options profile a subcommand."""
+    (tmp_path / "sheet.csv").write_text("barcode,alias\nbarcode01,sample\n")
+    subprocess.run(
+        [sys.executable, GLUE, "--profile", profile,
+            "--metrics-json", "metrics.json", "check_sample_sheet", "sheet.csv"],
+        cwd=tmp_path, check=True, capture_output=True)
+    with open(tmp_path / "metrics.json") as fh:
+        metrics = json.load(fh)
+    assert metrics["command"] == "check_sample_sheet"
+    assert metrics["profile"]["mode"] == profile
+    assert metrics["profile"]["output"] == "metrics" + suffix
+    assert (tmp_path / ("metrics" + suffix)).exists()
+
+
+def test_report_mod_records(tmp_path):
+    """Check report_mod counts its DSS records and times their loading."""
+    (tmp_path / "ref.fa.fai").write_text(
+        "chr1\t30000000\t6\t60\t61\nchr2\t20000000\t30500006\t60\t61\n")
+    for kind in ("DML", "DMR"):
+        (tmp_path / kind).mkdir()
+    for mod, n in (("5mC", 30), ("5hmC", 20)):
+        with open(tmp_path / "DML" / f"SAMPLE.{mod}.dml.tsv", "w") as fh:
+            fh.write(
+                "chr\tpos\tmu1\tmu2\tdiff\tdiff.se\tstat\tphi1\tphi2\tpval\tfdr\t"
+                "postprob.overThreshold\n")
+            for i in range(n):
+                fh.write(
+                    f"chr{i % 2 + 1}\t{(i + 1) * 500000}\t0.6\t0.2\t0.4\t0.1\t"
+                    f"2.5\t0.1\t0.1\t{0.5 ** i}\t0.01\t0.9\n")
+        with open(tmp_path / "DMR" / f"SAMPLE.{mod}.dmr.tsv", "w") as fh:
+            fh.write(
+                "chr\tstart\tend\tlength\tnCG\tmeanMethy1\tmeanMethy2\t"
+                "diff.Methy\tareaStat\n")
+            for i in range(n // 10):
+                start = (i + 1) * 1000000
+                fh.write(
+                    f"chr{i % 2 + 1}\t{start}\t{start + 200}\t200\t10\t0.7\t"
+                    f"0.2\t0.5\t{10 * (i + 1)}\n")
+    fname = tmp_path / "metrics.json"
+    with instrument("report_mod", [], metrics_json=str(fname)):
+        load_dss_outputs(
+            str(tmp_path / "DML"), str(tmp_path / "DMR"),
+            fasta_idx(str(tmp_path / "ref.fa.fai")))
+    with open(fname) as fh:
+        metrics = json.load(fh)
+    assert metrics["exit_code"] == 0
+    assert metrics["records"] == {"DML": 50, "DMR": 5}
+    assert set(metrics["phases"]) == {"load"}
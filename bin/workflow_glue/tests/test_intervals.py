@@ -0,0 +1,51 @@
+"""Tests of the window summaries of genomic positions."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from workflow_glue.report_utils.intervals import group_medians, window_medians
+
+
+def loci(n, rng):
+    """Make unsorted loci with values, some missing, on a few chromosomes."""
+    df = pd.DataFrame({
+        "chrom": rng.choice(["chr1", "chr2", "chrX"], size=n),
+        "pos": rng.integers(0, 100000, size=n),
+        "values": rng.normal(size=n)})
+    df.loc[rng.choice(n, size=n // 20, replace=False), "values"] = np.nan
+    return df
+
+
+def test_group_medians():
+    """Check the medians match a pandas groupby, with empty groups."""
+    rng = np.random.default_rng(3)
+    groups = rng.integers(0, 50, size=3000)
+    groups[groups == 7] = 8
+    values = rng.normal(size=3000)
+    values[groups == 9] = np.nan
+    values[:100] = np.nan
+    expected = pd.Series(values).groupby(groups).median() \
+        .reindex(range(52)).values
+    np.testing.assert_allclose(group_medians(groups, values, 52), expected)
+
+
+@pytest.mark.parametrize("window_size", [1000, 25000, 1000000])
+def test_window_medians(window_size):
+    """Check the medians match a pandas groupby of the windows."""
+    rng = np.random.default_rng(4)
+    df = loci(5000, rng)
+    # loci on unknown chromosomes and beyond the chromosome ends are ignored
+    df.loc[:10, "chrom"] = "chrUn"
+    lengths = pd.Series([100000, 60000, 90500], index=["chr1", "chr2", "chrX"])
+    result = window_medians(
+        df["chrom"], df["pos"], df["values"], lengths, window_size)
+    valid = df["chrom"].isin(lengths.index) & \
+        (df["pos"] < df["chrom"].map(lengths))
+    expected = df.loc[valid] \
+        .assign(start=df["pos"] // window_size * window_size) \
+        .groupby(["chrom", "start"])["values"].median().reset_index()
+    pd.testing.assert_frame_equal(
+        result[["chrom", "start", "value"]],
+        expected.rename(columns={"values": "value"}), check_dtype=False)
+    assert (result["end"] <= result["chrom"].map(lengths)).all()
+    assert (result["end"] - result["start"] <= window_size).all()
@@ -0,0 +1,98 @@
+"""Tests of the concurrent loading of report inputs."""
+
+import threading
+
+from ezcharts.components.common import fasta_idx
+from ezcharts.components.fastcat import load_bamstats_flagstat
+from ezcharts.components.mosdepth import load_mosdepth_summary
+import numpy as np
+import pandas as pd
+import pytest
+from workflow_glue.benchmarks import synthetic
+from workflow_glue.report_qc import load_coverage
+from workflow_glue.report_utils.loader import InputLoader
+from workflow_glue.report_utils.read_stats import ReadStats
+
+
+def test_requires():
+    """Check inputs get the inputs they require, loaded concurrently."""
+    barrier = threading.Barrier(2, timeout=10)
+
+    def load(value, **deps):
+        barrier.wait()
+        return value, deps
+
+    with InputLoader(threads=2) as loader:
+        loader.submit("a", load, 1)
+        loader.submit("b", load, 2)
+        loader.submit("c", lambda a, b: a[0] + b[0], requires=("a", "b"))
+        assert loader.get("c") == 3
+        assert loader.get("a") == (1, {})
+
+
+def test_errors():
+    """Check loading errors are raised by the input and the inputs needing it."""
+    def fail():
+        raise ValueError("bad input")
+
+    with InputLoader(threads=2) as loader:
+        loader.submit("bad", fail)
+        loader.submit("child", lambda bad: bad, requires=("bad",))
+        loader.submit("good", sum, [1, 2])
+        for name in ("bad", "child"):
+            with pytest.raises(ValueError, match="bad input"):
+                loader.get(name)
+        assert loader.get("good") == 3
+
+
+@pytest.mark.parametrize("threads", [1, 4])
+def test_report_qc_inputs(tmp_path, threads):
+    """Check the report_qc inputs match the inputs loaded one by one."""
+    rng = np.random.default_rng(1)
+    # contigs under 10 Mb are not plotted
+    lengths = {"chr1": 30000000, "chr2": 20000000}
+    fai = str(tmp_path / "ref.fa.fai")
+    with open(fai, "w") as fh:
+        for name, length in lengths.items():
+            fh.write(f"{name}\t{length}\t0\t60\t61\n")
+    inputs = {}
+    for sfx in ("t", "n"):
+        bamstats = synthetic.bamstats(str(tmp_path / sfx), 2000, lengths, rng)
+        depth = synthetic.mosdepth(str(tmp_path / sfx), lengths, 25000, rng)
+        inputs[sfx] = (bamstats, depth)
+
+    faidx = fasta_idx(fai)
+    expected = {}
+    for sfx, (bamstats, depth) in inputs.items():
+        expected[f"read_stats_{sfx}"] = ReadStats.from_bamstats(
+            bamstats["read_stats"])
+        expected[f"flags_df_{sfx}"] = load_bamstats_flagstat(bamstats["flagstat"])
+        expected[f"depth_su_{sfx}"] = load_mosdepth_summary(depth["summary"])
+        expected[f"depth_df_{sfx}"] = load_coverage(
+            depth["regions"], faidx=faidx, winsize=25000, max_points=500)
+
+    with InputLoader(threads=threads) as loader:
+        loader.submit("faidx", fasta_idx, fai)
+        for sfx, (bamstats, depth) in inputs.items():
+            loader.submit(
+                f"read_stats_{sfx}", ReadStats.from_bamstats,
+                bamstats["read_stats"])
+            loader.submit(
+                f"flags_df_{sfx}", load_bamstats_flagstat, bamstats["flagstat"])
+            loader.submit(
+                f"depth_su_{sfx}", load_mosdepth_summary, depth["summary"])
+            loader.submit(
+                f"depth_df_{sfx}", load_coverage, depth["regions"],
+                winsize=25000, max_points=500, requires=("faidx",))
+        loaded = {name: loader.get(name) for name in expected}
+
+    for name, value in expected.items():
+        if name.startswith("read_stats"):
+            assert loaded[name].n_reads == value.n_reads
+            for col, hist in value.hists.items():
+                assert np.array_equal(loaded[name].hists[col].counts, hist.counts)
+        elif name.startswith("depth_su"):
+            for loaded_df, df in zip(loaded[name], value):
+                pd.testing.assert_frame_equal(loaded_df, df)
+        else:
+            pd.testing.assert_frame_equal(loaded[name], value)
@@ -0,0 +1,146 @@
+"""Tests of the streaming summaries of per-read statistics."""
+
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from workflow_glue.report_utils.read_stats import ReadStats, StreamingHistogram
+from workflow_glue.report_utils.utils import histogram
+
+BIN = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+GLUE = os.path.join(BIN, "workflow-glue")
+
+
+def baseline_n50(lengths):
+    """Compute the N50 from the sorted lengths, as report_qc did."""
+    sorted_l = np.sort(lengths)[::-1]
+    cumsum = np.cumsum(sorted_l)
+    return sorted_l[cumsum >= cumsum[-1] / 2][0]
+
+
+def read_table(fname, n, rng):
+    """Write a bamstats per-read table, returning it as a dataframe."""
+    df = pd.DataFrame({
+        "name": [f"read{i}" for i in range(n)],
+        "read_length": rng.integers(100, 50000, size=n),
+        "mean_quality": np.round(rng.normal(18, 3, size=n), 2),
+        "acc": np.round(rng.uniform(85, 100, size=n), 2)})
+    df.to_csv(fname, sep="\t", index=False)
+    return df
+
+
+@pytest.mark.parametrize("n", [1, 2, 1001])
+def test_streaming_histogram(n):
+    """Check the summaries of read lengths match the exact values."""
+    lengths = np.random.default_rng(n).integers(100, 50000, size=n)
+    hist = StreamingHistogram()
+    for chunk in np.array_split(lengths, 3):
+        hist.update(chunk)
+    assert hist.n == n
+    assert hist.mean() == pytest.approx(lengths.mean())
+    assert hist.median() == np.median(lengths)
+    assert hist.n50() == baseline_n50(lengths)
+    assert (hist.min, hist.max) == (lengths.min(), lengths.max())
+
+
+def test_streaming_histogram_empty():
+    """Check an empty histogram has no N50 and no median."""
+    hist = StreamingHistogram().update([np.nan])
+    assert hist.n == 0
+    assert hist.n50() == 0
+    assert np.isnan(hist.median())
+    assert hist.rebin(1000)[0].size == 0
+
+
+def test_rebin():
+    """Check wider bins count values as the histograms of the full data."""
+    rng = np.random.default_rng(1)
+    lengths = rng.integers(100, 50000, size=5000)
+    quality = np.round(rng.normal(18, 3, size=5000), 2)
+    for values, resolution, binwidth in (
+            (lengths, 1, 1000), (quality, 0.01, 0.5)):
+        hist = StreamingHistogram(resolution).update(values)
+        edges, counts = hist.rebin(binwidth)
+        expected, expected_edges = histogram(values, binwidth=binwidth)
+        np.testing.assert_allclose(edges, expected_edges)
+        assert np.array_equal(counts, expected)
+
+
+def test_read_stats_table(tmp_path):
+    """Check a per-read table streamed in chunks gives the exact summaries."""
+    df = read_table(tmp_path / "reads.tsv", 2000, np.random.default_rng(2))
+    stats = ReadStats.from_table(tmp_path / "reads.tsv", chunksize=300)
+    assert stats.n_reads == len(df.index)
+    assert stats.n_bases == df["read_length"].sum()
+    assert stats.hists["read_length"].median() == df["read_length"].median()
+    assert stats.hists["read_length"].n50() == baseline_n50(df["read_length"])
+    assert stats.hists["mean_quality"].median() == pytest.approx(
+        df["mean_quality"].median(), abs=0.01)
+    assert stats.hists["acc"].mean() == pytest.approx(df["acc"].mean())
+
+
+def assert_same_stats(stats, expected):
+    """Check two summaries hold the same counts."""
+    assert stats.n_reads == expected.n_reads
+    for col, hist in expected.hists.items():
+        other = stats.hists[col]
+        assert np.array_equal(other.counts, hist.counts)
+        assert (other.n, other.min, other.max) == (hist.n, hist.min, hist.max)
+        assert other.total == pytest.approx(hist.total)
+
+
+def test_merge(tmp_path):
+    """Check summaries of parts of a table merge into the summary of it all."""
+    df = read_table(tmp_path / "reads.tsv", 3000, np.random.default_rng(3))
+    expected = ReadStats.from_table(tmp_path / "reads.tsv")
+    fnames = []
+    for i, start in enumerate(range(0, 3000, 1000)):
+        fnames.append(str(tmp_path / f"part{i}.tsv"))
+        df[start:start + 1000].to_csv(fnames[-1], sep="\t", index=False)
+    stats = ReadStats()
+    for fname in fnames:
+        stats.merge(ReadStats.from_table(fname))
+    assert_same_stats(stats, expected)
+    assert_same_stats(ReadStats.from_bamstats(fnames), expected)
+    with pytest.raises(ValueError):
+        StreamingHistogram(1).merge(StreamingHistogram(0.01))
+
+
+def test_sketch(tmp_path):
+    """Check sketches are saved, loaded and used in place of their tables."""
+    read_table(tmp_path / "reads.tsv", 1000, np.random.default_rng(4))
+    expected = ReadStats.from_table(tmp_path / "reads.tsv")
+    sketch = str(tmp_path / "reads.tsv.npz")
+    expected.save(sketch)
+    assert_same_stats(ReadStats.load(sketch), expected)
+    # an up-to-date sketch is read instead of the table
+    (tmp_path / "reads.tsv").write_text("read_length\n1\n")
+    os.utime(tmp_path / "reads.tsv", (0, 0))
+    assert_same_stats(ReadStats.from_bamstats(str(tmp_path)), expected)
+    assert_same_stats(
+        ReadStats.from_bamstats(str(tmp_path / "reads.tsv")), expected)
+    empty = ReadStats()
+    empty.save(tmp_path / "empty.npz")
+    assert ReadStats.load(tmp_path / "empty.npz").hists["read_length"].n50() == 0
+
+
+def test_cli_sketch(tmp_path):
+    """Check the sketches of the CLI merge into the summary of all tables."""
+    rng = np.random.default_rng(5)
+    fnames = [str(tmp_path / f"fc{i}.tsv") for i in range(2)]
+    for fname in fnames:
+        read_table(fname, 500, rng)
+    for fname in fnames:
+        subprocess.run(
+            [sys.executable, GLUE, "read_stats_sketch", fname,
+                "-o", f"{fname}.npz", "--chunksize", "100"],
+            check=True, capture_output=True)
+    subprocess.run(
+        [sys.executable, GLUE, "read_stats_sketch", *(f"{i}.npz" for i in fnames),
+            "-o", str(tmp_path / "all.npz")],
+        check=True, capture_output=True)
+    assert_same_stats(
+        ReadStats.load(tmp_path / "all.npz"), ReadStats.from_bamstats(fnames))
@@ -0,0 +1,65 @@
+"""Tests of the loading of the modification report inputs."""
+
+from ezcharts.components.common import fasta_idx
+from ezcharts.components.dss import load_dml, load_dmr
+import numpy as np
+import pandas as pd
+from workflow_glue.benchmarks import synthetic
+from workflow_glue.report_mod import load_dss_outputs, summary_values
+
+
+def test_load_dss_outputs(tmp_path):
+    """Check the DSS outputs loaded in processes match the ezcharts loaders."""
+    lengths = {"chr1": 3000000, "chr2": 2000000, "chrX": 1000000}
+    with open(tmp_path / "ref.fa.fai", "w") as fh:
+        for name, length in lengths.items():
+            fh.write(f"{name}\t{length}\t0\t60\t61\n")
+    faidx = fasta_idx(str(tmp_path / "ref.fa.fai"))
+    paths = synthetic.dss(
+        str(tmp_path), 2000, 100, lengths, np.random.default_rng(1),
+        mods=("5mC", "5hmC", "6mA"))
+    dml, dmr = load_dss_outputs(paths["dml"], paths["dmr"], faidx, threads=4)
+    assert set(dml) == set(dmr) == {"5mC", "5hmC", "6mA"}
+    serial = load_dss_outputs(paths["dml"], paths["dmr"], faidx, threads=1)
+    for loaded, expected in zip((dml, dmr), serial):
+        for mod, df in expected.items():
+            assert not df.empty
+            pd.testing.assert_frame_equal(loaded[mod], df)
+    fname = f"{paths['dml']}/SAMPLE.5mC.dml.tsv"
+    pd.testing.assert_frame_equal(dml["5mC"], load_dml(fname, faidx=faidx))
+    fname = f"{paths['dmr']}/SAMPLE.6mA.dmr.tsv"
+    pd.testing.assert_frame_equal(dmr["6mA"], load_dmr(fname, faidx=faidx))
+    # single files rather than directories
+    dml, dmr = load_dss_outputs(
+        f"{paths['dml']}/SAMPLE.5hmC.dml.tsv", fname, faidx, threads=2)
+    assert list(dml) == ["5hmC"]
+    assert list(dmr) == ["6mA"]
+
+
+def baseline_summary_values(df, n, columns):
+    """Extract the top and bottom rows with sorted dataframes, as before."""
+    dfs = []
+    for column in columns:
+        dfs.append(df.sort_values(column, ascending=False)[0:n])
+        dfs.append(df.sort_values(column, ascending=True)[0:n])
+    return pd.concat(dfs).drop_duplicates()
+
+
+def test_summary_values():
+    """Check the top and bottom DMRs match the sorted dataframes."""
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({
+        "chrom": rng.choice(["chr1", "chr2"], size=5000),
+        "start": rng.permutation(5000) * 100,
+        "areaStat": rng.normal(0, 50, 5000),
+        "diff.Methy": rng.uniform(-1, 1, 5000)})
+    df.loc[rng.choice(5000, size=100, replace=False), "diff.Methy"] = np.nan
+    columns = ["areaStat", "diff.Methy"]
+    # the largest n reaches the rows without a value
+    for n in (10, 100, 3000, 4950):
+        pd.testing.assert_frame_equal(
+            summary_values(df, n=n, columns=columns),
+            baseline_summary_values(df, n, columns))
+    pd.testing.assert_frame_equal(
+        summary_values(df, n=10, columns="areaStat"),
+        baseline_summary_values(df, 10, ["areaStat"]))
@@ -0,0 +1,121 @@
+"""Tests of the helpers of the SNV report."""
+
+import argparse
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pysam
+from workflow_glue.benchmarks import synthetic
+from workflow_glue.report_snv import filt_stats, is_reportable_clinvar
+from workflow_glue.report_snv import load_variant_arrays, prefilter_clinvar_vcf
+from workflow_glue.report_snv import ThresholdCounter, vcf_parse
+
+BIN = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+GLUE = os.path.join(BIN, "workflow-glue")
+
+
+def baseline_filt_stats(filters, vaf, naf, thresholds):
+    """Compute the filtering table with DataFrame queries, as before."""
+    df = pd.DataFrame({'Filter': filters, 'Tumor_AF': vaf, 'Normal_AF': naf})
+    summary_table = {
+        'N sites': [df.count()['Filter'], ""],
+        'PASS': [df[df['Filter'] == 'PASS'].count()['Filter'], ""],
+        'not PASS': [df[df['Filter'] != 'PASS'].count()['Filter'], ""],
+        'Type': ['Tumor', 'Normal']}
+    for threshold in thresholds:
+        summary_table.update({'VAF > {:.2f}'.format(threshold): [
+            df.query(f'Tumor_AF >= {threshold}').shape[0],
+            df.query(f'Normal_AF >= {threshold}').shape[0]]})
+    return pd.DataFrame(summary_table)
+
+
+def test_threshold_counter():
+    """Check the counts match the DataFrame queries, in one go or in chunks."""
+    rng = np.random.default_rng(1)
+    n = 5000
+    filters = rng.choice(['PASS', 'LowQual', 'RefCall'], size=n)
+    vaf = rng.random(n)
+    naf = rng.random(n) / 4
+    # values on the thresholds, and missing values
+    vaf[:30] = 0.1
+    naf[:30] = 0.05
+    vaf[30:60] = np.nan
+    thresholds = [0.2, 0.1, 0.05]
+    expected = baseline_filt_stats(filters, vaf, naf, thresholds)
+    pd.testing.assert_frame_equal(
+        filt_stats(filters, vaf, naf, thresholds), expected, check_dtype=False)
+    counter = ThresholdCounter(thresholds)
+    for chunk in np.array_split(np.arange(n), 7):
+        counter.update(filters[chunk], vaf[chunk], naf[chunk])
+    pd.testing.assert_frame_equal(counter.to_frame(), expected, check_dtype=False)
+
+
+def test_threshold_counter_empty():
+    """Check an empty input gives zero counts."""
+    table = ThresholdCounter([0.1]).update([], [], []).to_frame()
+    assert table['N sites'].tolist() == [0, ""]
+    assert table['VAF > 0.10'].tolist() == [0, 0]
+
+
+def test_variant_arrays(tmp_path):
+    """Check the arrays of annotate_mutations match the parsed VCF."""
+    rng = np.random.default_rng(2)
+    sequences = synthetic.reference(
+        str(tmp_path / "ref.fa"), {"chr1": 200000, "chr2": 100000}, rng)
+    synthetic.clairs_vcf(
+        str(tmp_path / "in.vcf"), 500, sequences, rng, indel_rate=0.2)
+    subprocess.run(
+        [sys.executable, GLUE, "annotate_mutations", "in.vcf", "out.vcf",
+            "--genome", "ref.fa", "--variant_arrays", "variants.npz"],
+        cwd=tmp_path, check=True, capture_output=True)
+    loaded = load_variant_arrays(str(tmp_path / "variants.npz"))
+    parsed = vcf_parse(argparse.Namespace(vcf=str(tmp_path / "out.vcf")))
+    assert loaded[0] == parsed[0] == "SAMPLE"
+    for name in (1, 4):
+        assert loaded[name].tolist() == parsed[name]
+    for name in (2, 3):
+        np.testing.assert_allclose(loaded[name], parsed[name], rtol=1e-6)
+    assert set(parsed[4]) == {"SNV", "Indel"}
+
+
+CLINVAR_HEADER = """##fileformat=VCFv4.2
+##contig=<ID=chr1,length=1000000>
+##INFO=<ID=CLNSIG,Number=.,Type=String,Description="Clinical significance">
+##INFO=<ID=CLNSIGCONF,Number=.,Type=String,Description="Conflicting significance">
+##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE
+"""
+
+
+def baseline_reportable(variant):
+    """Check a record is kept by `load_clinvar_vcf`, with default arguments."""
+    if not variant.alts or 'CLNSIG' not in variant.info:
+        return False
+    return 'benign' not in ", ".join(variant.info['CLNSIG']).lower()
+
+
+def test_clinvar_prefilter(tmp_path):
+    """Check the raw line filter keeps the sites kept by the ClinVar loader."""
+    infos = [
+        ".", "CLNSIG=Pathogenic", "CLNSIG=Benign", "CLNSIG=Likely_benign",
+        "CLNSIG=Uncertain_significance", "CLNSIG=Pathogenic/Likely_benign",
+        "CLNSIG=Pathogenic,Benign", "CLNSIG=Likely_pathogenic;CLNSIGCONF=Benign",
+        "CLNSIGCONF=Pathogenic", "CLNSIGCONF=Benign;CLNSIG=Pathogenic",
+        "CLNSIGCONF=Pathogenic;CLNSIG=Benign"]
+    records = [
+        f"chr1\t{100 * (i + 1)}\t.\tA\tG\t.\tPASS\t{info}\tGT\t0/1"
+        for i, info in enumerate(infos)]
+    fname = tmp_path / "clinvar.vcf"
+    fname.write_text(CLINVAR_HEADER + "\n".join(records) + "\n")
+    with pysam.VariantFile(str(fname)) as vcf:
+        expected = [baseline_reportable(variant) for variant in vcf]
+    assert [is_reportable_clinvar(r.encode()) for r in records] == expected
+    assert sum(expected) == 4
+    out = tmp_path / "out"
+    out.mkdir()
+    with pysam.VariantFile(prefilter_clinvar_vcf(str(fname), str(out))) as vcf:
+        assert [variant.pos for variant in vcf] == [
+            100 * (i + 1) for i, keep in enumerate(expected) if keep]
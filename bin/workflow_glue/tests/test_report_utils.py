@@ -0,0 +1,146 @@
+"""Tests of the numerical helpers of the reports."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from seaborn._statistics import Histogram
+from workflow_glue.report_utils.utils import compare_max_axes, density_bins
+from workflow_glue.report_utils.utils import histogram, HistogramCache, lttb
+from workflow_glue.report_utils.utils import top_k
+
+
+def seaborn_histogram(values, bins="auto", binwidth=None, binrange=None):
+    """Bin values with the seaborn estimator, as `hist_max` did."""
+    estimator = Histogram(
+        stat="count", bins=bins, binwidth=binwidth, binrange=binrange,
+        discrete=None, cumulative=False)
+    return estimator(pd.Series(values).dropna(), weights=None)
+
+
+@pytest.mark.parametrize("lengths,kwargs", [
+    (True, {}), (True, {"bins": 20}), (True, {"binwidth": 1000}),
+    (True, {"binwidth": 500, "binrange": (0, 20000)}),
+    (False, {"binwidth": 0.1}), (False, {"bins": 10, "binrange": (-1, 1)})])
+def test_histogram(lengths, kwargs):
+    """Check the bins and counts match the seaborn histograms."""
+    rng = np.random.default_rng(1)
+    if lengths:
+        values = np.r_[rng.lognormal(8.5, 0.8, 3000).astype(int), np.nan]
+    else:
+        values = np.round(rng.normal(0, 0.5, 3000), 2)
+    counts, edges = histogram(values, **kwargs)
+    expected, expected_edges = seaborn_histogram(values, **kwargs)
+    np.testing.assert_allclose(edges, expected_edges)
+    assert np.array_equal(counts, expected)
+
+
+def test_histogram_cache():
+    """Check histograms are shared per dataset, column and bins."""
+    rng = np.random.default_rng(2)
+    df1 = pd.DataFrame({"a": rng.normal(size=500), "b": rng.random(500)})
+    df2 = pd.DataFrame({"a": rng.normal(size=800), "b": rng.random(800)})
+    histograms = HistogramCache()
+    first = histograms.get(df1, "a", binwidth=0.2)
+    assert histograms.get(df1, "a", binwidth=0.2) is first
+    assert histograms.get(df1, "a", binwidth=0.5) is not first
+    assert histograms.get(df1.copy(), "a", binwidth=0.2) is not first
+    expected = max(
+        seaborn_histogram(df["a"], binwidth=0.2)[0].max() for df in (df1, df2))
+    assert compare_max_axes(
+        df1, df2, "a", ptype="hist", binwidth=0.2,
+        histograms=histograms) == np.ceil(expected * 1.1)
+    assert histograms.get(df1, "a", binwidth=0.2) is first
+    histograms.clear()
+    assert histograms.get(df1, "a", binwidth=0.2) is not first
+
+
+def test_density_bins():
+    """Check sparse points are kept and dense bins counted as histogram2d."""
+    rng = np.random.default_rng(1)
+    # a dense cluster on a sparse background
+    x = np.r_[rng.normal(0.5, 0.02, 5000), rng.random(500)]
+    y = np.r_[rng.normal(0.5, 0.02, 5000), rng.random(500)]
+    x[:10] = np.nan
+    keep, binned = density_bins(
+        x, y, 1000, bins=20, xrange=(0, 1), yrange=(0, 1))
+    counts, xedges, yedges = np.histogram2d(
+        x[~np.isnan(x)], y[~np.isnan(x)], bins=20, range=[(0, 1), (0, 1)])
+    assert not keep[:10].any()
+    assert keep.sum() <= 1000
+    # every point is either kept or counted in a dense bin
+    assert keep.sum() + binned['count'].sum() == counts.sum()
+    xidx = np.searchsorted(xedges, binned['x'].values) - 1
+    yidx = np.searchsorted(yedges, binned['y'].values) - 1
+    assert np.array_equal(binned['count'].values, counts[xidx, yidx])
+    # the kept points are in the sparsest bins
+    kept = np.histogram2d(x[keep], y[keep], bins=20, range=[(0, 1), (0, 1)])[0]
+    assert kept.max() <= binned['count'].min()
+
+
+def test_density_bins_budget():
+    """Check all the points are kept within the budget."""
+    x = np.linspace(0, 1, 50)
+    keep, binned = density_bins(x, x[::-1], 50)
+    assert keep.all()
+    assert binned.empty
+
+
+def baseline_lttb(x, y, n_out):
+    """Select points with the reference Largest-Triangle-Three-Buckets loop."""
+    n = len(x)
+
+    def edge(i):
+        # floor(i * (n - 2) / (n_out - 2)) + 1, without roundoff
+        return i * (n - 2) // (n_out - 2) + 1
+
+    selected = [0]
+    anchor = 0
+    for i in range(n_out - 2):
+        avg_start, avg_end = edge(i + 1), min(edge(i + 2), n)
+        avg_x = sum(x[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+        max_area = -1
+        for j in range(edge(i), edge(i + 1)):
+            area = abs(
+                (x[anchor] - avg_x) * (y[j] - y[anchor])
+                - (x[anchor] - x[j]) * (avg_y - y[anchor])) / 2
+            if area > max_area:
+                max_area, best = area, j
+        selected.append(best)
+        anchor = best
+    selected.append(n - 1)
+    return selected
+
+
+@pytest.mark.parametrize("n,n_out", [
+    (1000, 100), (1003, 7), (500, 499), (599, 596), (20, 3)])
+def test_lttb(n, n_out):
+    """Check the selected points match the reference implementation."""
+    rng = np.random.default_rng(n)
+    x = np.sort(rng.random(n)) * 1e6
+    y = np.cumsum(rng.normal(size=n))
+    assert lttb(x, y, n_out).tolist() == baseline_lttb(x, y, n_out)
+
+
+def test_lttb_small():
+    """Check all the points are kept when the budget allows."""
+    x = np.arange(10)
+    assert lttb(x, x, 10).tolist() == list(range(10))
+    assert lttb(x, x, 2).tolist() == list(range(10))
+
+
+@pytest.mark.parametrize("k", [0, 1, 10, 999, 2000])
+@pytest.mark.parametrize("ascending", [False, True])
+def test_top_k(k, ascending):
+    """Check the positions match the sorted columns, with NaNs last."""
+    rng = np.random.default_rng(k)
+    df = pd.DataFrame(rng.normal(size=(1000, 3)), columns=["a", "b", "c"])
+    df.loc[rng.choice(1000, size=50, replace=False), "b"] = np.nan
+    df["c"] = np.nan
+    result = top_k(df.values, k, ascending=ascending)
+    assert result.shape == (min(k, 1000), 3)
+    for i, col in enumerate(df.columns):
+        expected = df[col].sort_values(ascending=ascending).index[:k]
+        assert result[:, i].tolist() == expected.tolist()
+    assert top_k(df["a"].values, k).tolist() == \
+        top_k(df.values, k)[:, :1].tolist()
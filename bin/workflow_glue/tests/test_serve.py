@@ -0,0 +1,93 @@
+"""Tests of running subcommands through the workflow-glue server."""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+BIN = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+GLUE = os.path.join(BIN, "workflow-glue")
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Start a server for the sample sheet check, returning its socket."""
+    path = str(tmp_path / "glue.sock")
+    proc = subprocess.Popen(
+        [sys.executable, GLUE, "serve", "--socket", path,
+            "--preload", "check_sample_sheet", "--idle_timeout", "60"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while not os.path.exists(path):
+        assert proc.poll() is None, "server stopped"
+        assert time.monotonic() < deadline, "server did not start"
+        time.sleep(0.05)
+    yield path
+    proc.terminate()
+    proc.wait(timeout=10)
+    assert not os.path.exists(path)
+
+
+def run(args, cwd, socket=None):
+    """Run workflow-glue, through the server listening on `socket` if given."""
+    env = dict(os.environ)
+    env.pop("WF_GLUE_SOCKET", None)
+    if socket is not None:
+        env["WF_GLUE_SOCKET"] = socket
+    return subprocess.run(
+        [sys.executable, GLUE] + args, cwd=cwd, env=env,
+        capture_output=True, text=True)
+
+
+@pytest.mark.parametrize("args", [
+    ["check_sample_sheet", "sheet.csv"],
+    ["check_sample_sheet", "missing.csv"],
+    ["check_sample_sheet", "sheet.csv", "--required_sample_types", "unknown"],
+    ["check_sample_sheet", "--help"],
+])
+def test_forwarded(server, tmp_path, args):
+    """Check a forwarded subcommand behaves as when run locally."""
+    (tmp_path / "sheet.csv").write_text("barcode,alias\nbarcode01,sample\n")
+    local = run(args, tmp_path)
+    forwarded = run(args, tmp_path, socket=server)
+    assert forwarded.returncode == local.returncode
+    assert forwarded.stdout == local.stdout
+    # the server is used, rather than a local fallback
+    assert "Could not reach" not in forwarded.stderr
+
+
+def test_unreachable(tmp_path):
+    """Check the subcommand is run locally when there is no server."""
+    (tmp_path / "sheet.csv").write_text("barcode,alias\nbarcode01,sample\n")
+    proc = run(
+        ["check_sample_sheet", "sheet.csv"], tmp_path,
+        socket=str(tmp_path / "missing.sock"))
+    assert proc.returncode == 0
+    assert "Could not reach" in proc.stderr
+    assert "Checked sample sheet sheet.csv." in proc.stderr
+
+
+def test_socket_in_use(server, tmp_path):
+    """Check a second server does not take over the socket of a running one."""
+    proc = run(["serve", "--socket", server, "--idle_timeout", "5"], tmp_path)
+    assert proc.returncode != 0
+    assert "Another server is listening" in proc.stderr
+    (tmp_path / "sheet.csv").write_text("barcode,alias\nbarcode01,sample\n")
+    forwarded = run(["check_sample_sheet", "sheet.csv"], tmp_path, socket=server)
+    assert forwarded.returncode == 0
+    assert "Could not reach" not in forwarded.stderr
+
+
+def test_stale_socket(tmp_path):
+    """Check a socket left by a stopped server is replaced."""
+    path = str(tmp_path / "glue.sock")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(path)
+    proc = run(
+        ["serve", "--socket", path, "--preload", "check_sample_sheet",
+            "--idle_timeout", "0.5"], tmp_path)
+    assert proc.returncode == 0, proc.stderr
+    assert not os.path.exists(path)
@@ -0,0 +1,174 @@
+"""Tests of the external sort of VCFs."""
+
+import os
+import random
+import subprocess
+import sys
+
+import pysam
+import pytest
+from workflow_glue import sort_vcf
+from workflow_glue.sort_vcf import merge_headers, parse_size, reg2bin, VcfSorter
+
+BIN = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+GLUE = os.path.join(BIN, "workflow-glue")
+
+CONTIGS = [("chr1", 2000000), ("chr2", 1000000), ("chrM", 16569)]
+HEADER = [
+    "##fileformat=VCFv4.2",
+    *(f"##contig=<ID={name},length={length}>" for name, length in CONTIGS),
+    '##INFO=<ID=END,Number=1,Type=Integer,Description="End position">',
+    '##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">',
+    "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tSAMPLE"]
+
+
+def make_records(n, rng):
+    """Make sorted records, with some long deletions."""
+    records = []
+    for name, length in CONTIGS:
+        for pos in sorted(rng.randrange(1, length // 2) for _ in range(n)):
+            if rng.random() < 0.05:
+                end = pos + rng.randrange(10, length // 4)
+                ref, alt, info = "A", "<DEL>", f"END={end}"
+            else:
+                ref, alt, info = rng.choice(["A", "CT", "GAT"]), "T", "."
+            records.append(f"{name}\t{pos}\t.\t{ref}\t{alt}\t10\tPASS\t{info}\tGT\t0/1")
+    return records
+
+
+def write_vcf(fname, records, header=HEADER):
+    """Write a plain VCF."""
+    with open(fname, "w") as fh:
+        fh.write("\n".join([*header, *records]) + "\n")
+
+
+def sort_key(record):
+    """Sort key of a record, by contig in header order and position."""
+    chrom, pos = record.split("\t")[:2]
+    return [name for name, _ in CONTIGS].index(chrom), int(pos)
+
+
+def fetch_expected(records, chrom, start, end):
+    """Return the records overlapping a region, as tabix does."""
+    hits = []
+    for record in records:
+        fields = record.split("\t")
+        beg = int(fields[1]) - 1
+        stop = int(fields[7][4:]) if fields[7].startswith("END=") \
+            else beg + len(fields[3])
+        if fields[0] == chrom and beg < end and stop > start:
+            hits.append(record)
+    return hits
+
+
+class TrackedReader(sort_vcf.VcfReader):
+    """Reader recording whether each opened file is closed."""
+
+    opened = []
+
+    def __init__(self, fname):
+        """Open a VCF and record it."""
+        super().__init__(fname)
+        self.closed = False
+        self.opened.append(self)
+
+    def close(self):
+        """Close the file."""
+        super().close()
+        self.closed = True
+
+
+@pytest.mark.parametrize("csi", [False, True])
+def test_sort_vcf(tmp_path, monkeypatch, csi):
+    """Check mostly sorted records are sorted, spilled and indexed."""
+    rng = random.Random(1)
+    records = make_records(2000, rng)
+    shuffled = records[:]
+    for _ in range(60):
+        i, j = rng.randrange(len(shuffled)), rng.randrange(len(shuffled))
+        shuffled[i], shuffled[j] = shuffled[j], shuffled[i]
+    # a block of records at the start, and a reversed block
+    shuffled = shuffled[-500:] + shuffled[:-500]
+    shuffled[1000:1200] = shuffled[1000:1200][::-1]
+    write_vcf(tmp_path / "in.vcf", shuffled)
+
+    monkeypatch.setattr(sort_vcf, "VcfReader", TrackedReader)
+    monkeypatch.setattr(TrackedReader, "opened", [])
+    sorter = VcfSorter(
+        [str(tmp_path / "in.vcf")], max_memory=20000, tmpdir=str(tmp_path),
+        min_run=100)
+    out = str(tmp_path / "out.vcf.gz")
+    index = sorter.write(out, csi=csi)
+    assert index == out + (".csi" if csi else ".tbi")
+    # the runs merged are read with their own readers, all closed
+    assert len(TrackedReader.opened) > 1
+    assert all(reader.closed for reader in TrackedReader.opened)
+    # only the records out of the runs are sorted in memory and spilled
+    assert 0 < sorter.spilled < len(records) // 4
+    expected = sorted(shuffled, key=sort_key)
+    with pysam.BGZFile(out, "rb") as fh:
+        lines = fh.read().decode().splitlines()
+    assert lines == HEADER + expected
+
+    tabix = pysam.TabixFile(out, index=index)
+    for _ in range(200):
+        chrom, length = rng.choice(CONTIGS)
+        start = rng.randrange(length)
+        end = start + rng.randrange(1, 100000)
+        assert list(tabix.fetch(chrom, start, end)) == \
+            fetch_expected(expected, chrom, start, end)
+
+
+def test_merge_inputs(tmp_path):
+    """Check sorted BGZF inputs are merged, with their headers."""
+    rng = random.Random(2)
+    records = sorted(make_records(200, rng), key=sort_key)
+    extra = '##INFO=<ID=SOMATIC,Number=0,Type=Flag,Description="Somatic">'
+    write_vcf(tmp_path / "snv.vcf", records[::2])
+    write_vcf(tmp_path / "indel.vcf", records[1::2], [*HEADER[:-1], extra, HEADER[-1]])
+    fnames = []
+    for name in ("snv", "indel"):
+        pysam.tabix_compress(
+            str(tmp_path / f"{name}.vcf"), str(tmp_path / f"{name}.vcf.gz"))
+        fnames.append(str(tmp_path / f"{name}.vcf.gz"))
+    sorter = VcfSorter(fnames, min_run=10)
+    out = str(tmp_path / "out.vcf.gz")
+    sorter.write(out)
+    assert sorter.spilled == 0
+    with pysam.VariantFile(out) as vcf:
+        assert "SOMATIC" in vcf.header.info
+        assert [str(record).rstrip("\n") for record in vcf] == records
+
+
+def test_merge_headers():
+    """Check header lines are kept once, and samples must match."""
+    header = [line.encode() for line in HEADER]
+    other = [b"##fileformat=VCFv4.3", *header[1:-1], b"##source=test", header[-1]]
+    assert merge_headers([header, other]) == [
+        *header[:-1], b"##source=test", header[-1]]
+    with pytest.raises(ValueError):
+        merge_headers([header, [header[-1] + b"\tOTHER"]])
+
+
+def test_helpers():
+    """Check sizes are parsed and bins computed as htslib."""
+    assert parse_size("2G") == 2 << 30
+    assert parse_size("1.5k") == 1536
+    assert parse_size("100") == 100
+    assert reg2bin(0, 1, 14, 5) == 4681
+    assert reg2bin(16384, 16385, 14, 5) == 4682
+    assert reg2bin(0, 16385, 14, 5) == 585
+    assert reg2bin(0, 1 << 29, 14, 5) == 0
+
+
+def test_min_run(tmp_path):
+    """Check runs must have at least one record."""
+    write_vcf(tmp_path / "in.vcf", make_records(10, random.Random(3)))
+    with pytest.raises(ValueError):
+        VcfSorter([str(tmp_path / "in.vcf")], min_run=0)
+    proc = subprocess.run(
+        [sys.executable, GLUE, "sort_vcf", "in.vcf", "-o", "out.vcf.gz",
+            "--min_run", "0"],
+        cwd=tmp_path, capture_output=True, text=True)
+    assert proc.returncode == 2
+    assert "--min_run: must be at least 1" in proc.stderr
@@ -0,0 +1,49 @@
+"""Tests of the helper functions."""
+
+import logging
+import time
+
+from workflow_glue import util
+
+
+def test_progress(caplog):
+    """Check records are counted and the progress is rate limited."""
+    logger = logging.getLogger("test_progress")
+    util._records.clear()
+    with caplog.at_level(logging.INFO, logger="test_progress"):
+        with util.Progress(logger, "lines", interval=3600) as progress:
+            for _ in range(100000):
+                progress.update()
+            progress.update(5)
+    assert progress.records == 100005
+    assert util._records["lines"] == 100005
+    # only the final message is logged within the interval
+    assert [r.message for r in caplog.records] == [
+        caplog.records[0].message]
+    assert caplog.records[0].message.startswith("Processed 100,005 lines in ")
+
+
+def test_progress_eta():
+    """Check the remaining time is estimated from the bytes read."""
+    logger = logging.getLogger("test_progress")
+    position = [0]
+    progress = util.Progress(
+        logger, total_bytes=1000, position=lambda: position[0])
+    progress.start -= 10
+    position[0] = 250
+    progress.update(10)
+    message = progress.message()
+    assert "10 records in 10s (1/s, 0.0 MB/s)" in message
+    assert "25.0% done, ETA 30s" in message
+
+
+def test_progress_interval(caplog):
+    """Check the progress is logged once the interval has passed."""
+    logger = logging.getLogger("test_progress")
+    progress = util.Progress(logger, total_records=10**9, interval=0.05)
+    with caplog.at_level(logging.INFO, logger="test_progress"):
+        deadline = time.monotonic() + 5
+        while not caplog.records and time.monotonic() < deadline:
+            progress.update()
+    assert caplog.records
+    assert "% done, ETA" in caplog.records[0].message
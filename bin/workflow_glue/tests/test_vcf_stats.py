@@ -0,0 +1,55 @@
+"""Tests of the bcftools stats summary numbers."""
+
+from ezcharts.components.bcfstats import load_bcfstats
+import pytest
+from workflow_glue.vcf_stats import variant_type, VcfStats
+
+
+@pytest.mark.parametrize("ref,alt,expected", [
+    ("A", "G", ("snp", ("A", "G"))),
+    ("c", "t", ("snp", ("C", "T"))),
+    # shared prefix and suffix are trimmed, as htslib does
+    ("AC", "AT", ("snp", ("C", "T"))),
+    ("ACG", "ATG", ("snp", ("C", "T"))),
+    ("AC", "GT", ("mnp", None)),
+    ("A", "AT", ("indel", None)),
+    ("ATT", "A", ("indel", None)),
+    ("ACT", "AT", ("indel", None)),
+    ("AC", "T", ("other", None)),
+    ("ACT", "GT", ("other", None)),
+    ("ACT", "GAT", ("mnp", None)),
+    ("A", "<DEL>", ("other", None)),
+    ("A", "A[chr2:100[", ("other", None)),
+    ("A", "<*>", ("ref", None)),
+    ("A", ".", ("ref", None)),
+    ("A", "A", ("ref", None)),
+])
+def test_variant_type(ref, alt, expected):
+    """Check alleles are classified as by htslib."""
+    assert variant_type(ref, alt) == expected
+
+
+def test_vcf_stats(tmp_path):
+    """Check the counts are read back by the report as bcftools stats."""
+    stats = VcfStats(n_samples=1)
+    records = [
+        ("A", ("G",)), ("C", ("A",)), ("AC", ("AT",)), ("A", ("AT",)),
+        ("AC", ("GT",)), ("A", ("<DEL>",)), ("A", None),
+        ("A", ("G", "T")), ("A", ("C", "AT"))]
+    for ref, alts in records:
+        stats.update(ref, alts)
+    assert stats.sn == {
+        "samples": 1, "records": 9, "no-ALTs": 1, "SNPs": 5, "MNPs": 1,
+        "indels": 2, "others": 1, "multiallelic sites": 2,
+        "multiallelic SNP sites": 1}
+    # A>G, C>T, A>G and A>T, A>C
+    assert (stats.ts, stats.tv) == (3, 3)
+    assert (stats.ts_1st, stats.tv_1st) == (3, 2)
+    fname = tmp_path / "sample.stats"
+    stats.write(str(fname), "sample.vcf")
+    tables = load_bcfstats(str(fname), sample_names=["sample"])
+    sn = tables["SN"]
+    assert sn["records"].values[0] == 9
+    assert sn["SNPs"].values[0] == 5
+    assert sn["indels"].values[0] == 2
+    assert tables["TSTV"]["ts/tv"].values[0] == 1.0
@@ -1,9 +1,16 @@
 """The odd helper function."""
 
 import argparse
+import collections
+import contextlib
 import logging
+import os
+import time
 
 _log_name = None
+# Timings of named phases and counts of records of the running subcommand
+_phases = collections.defaultdict(float)
+_records = collections.Counter()
 
 
 def get_main_logger(name):
@@ -26,6 +33,149 @@ def get_named_logger(name):
     return logger
 
 
+@contextlib.contextmanager
+def phase(name):
+    """Time a named section of a subcommand, such as "load" or "render".
+
+    Times of sections with the same name add up; they are reported by
+    `--metrics-json`.
+
+    :param name: name of the section.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases[name] += time.perf_counter() - start
+
+
+def count_records(n, name='records'):
+    """Add to the number of records processed by a subcommand.
+
+    :param n: number of records.
+    :param name: kind of records, for subcommands processing several kinds.
+    """
+    _records[name] += n
+
+
+class Progress:
+    """Log the throughput of a record loop, at most every `interval` seconds.
+
+    `update` is meant to be called for every record: it only decrements a
+    counter, and the clock is read once every batch of records, sized from
+    the measured rate to take about a tenth of a second. When the size of
+    the input is known, with a `position` giving the bytes read so far, or
+    when its number of records is known, the progress and remaining time are
+    also logged. The records are added to the counts of `count_records` when
+    done.
+    """
+
+    def __init__(
+            self, logger, name='records', total_bytes=None, position=None,
+            total_records=None, interval=30):
+        """Initialize the reporter.
+
+        :param logger: logger used to report the progress.
+        :param name: kind of records.
+        :param total_bytes: size of the input, in bytes.
+        :param position: function returning the bytes of the input read so far.
+        :param total_records: number of records of the input.
+        :param interval: time between messages, in seconds.
+        """
+        self.logger = logger
+        self.name = name
+        self.total_bytes = total_bytes
+        self.position = position
+        self.total_records = total_records
+        self.interval = interval
+        self.start = self._last = time.monotonic()
+        self._next_log = self.start + interval
+        # records counted before the current batch, and size of the batch
+        self._counted = 0
+        self._batch = self._countdown = 1
+
+    def __enter__(self):
+        """Enter the context."""
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        """Log the final throughput, unless the loop failed."""
+        if exc_type is None:
+            self.done()
+
+    @property
+    def records(self):
+        """Return the number of records processed."""
+        return self._counted + self._batch - self._countdown
+
+    def update(self, n=1):
+        """Count processed records.
+
+        :param n: number of records.
+        """
+        self._countdown -= n
+        if self._countdown <= 0:
+            self._check()
+
+    def _check(self):
+        now = time.monotonic()
+        done = self._batch - self._countdown
+        self._counted += done
+        # aim for a check every 0.1 s at the current rate
+        elapsed = now - self._last
+        rate = done / elapsed if elapsed > 0 else 2 * done
+        self._batch = self._countdown = int(min(max(rate / 10, 1), 1 << 20))
+        self._last = now
+        if now >= self._next_log:
+            self._next_log = now + self.interval
+            self.logger.info(self.message(now))
+
+    def message(self, now=None):
+        """Describe the progress so far."""
+        elapsed = max((time.monotonic() if now is None else now) - self.start, 1e-9)
+        records = self.records
+        nbytes = self.position() if self.position is not None else 0
+        text = f"{records:,} {self.name} in {elapsed:.0f}s ({records / elapsed:,.0f}/s"
+        if nbytes:
+            text += f", {nbytes / elapsed / 1e6:,.1f} MB/s"
+        text += ")"
+        if self.total_records:
+            fraction = records / self.total_records
+        elif self.total_bytes and nbytes:
+            fraction = nbytes / self.total_bytes
+        else:
+            return text
+        if 0 < fraction < 1:
+            eta = elapsed * (1 - fraction) / fraction
+            text += f", {100 * fraction:.1f}% done, ETA {eta:.0f}s"
+        return text
+
+    def done(self):
+        """Log the final throughput and count the records."""
+        self.logger.info(f"Processed {self.message()}.")
+        count_records(self.records, self.name)
+
+
+def file_position(fh):
+    """Return a function giving the bytes read from the file under `fh`.
+
+    The position of the file descriptor is used, so that it works with
+    Python file objects being iterated, including `gzip` files, for which it
+    is the compressed position.
+    """
+    fd = fh.fileno()
+    return lambda: os.lseek(fd, 0, os.SEEK_CUR)
+
+
+def hts_position(hts):
+    """Return a function giving the bytes read from a pysam file.
+
+    For BGZF compressed files, this is the compressed position.
+    """
+    shift = 16 if hts.compression == 'BGZF' else 0
+    return lambda: hts.tell() >> shift
+
+
 def wf_parser(name):
     """Make an argument parser for a workflow command."""
     return argparse.ArgumentParser(
@@ -50,3 +200,19 @@ def _log_level():
         help='Minimal logging; warnings only.')
 
     return parser
+
+
+def _profiling():
+    """Parser to profile a subcommand and report its resource usage."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter, add_help=False)
+    parser.add_argument(
+        '--profile', choices=['cprofile', 'sampling'],
+        help='Profile the subcommand, with cProfile (written as .prof) or by '
+             'sampling the stacks of all threads (written as collapsed stacks '
+             'in .folded), named after the metrics JSON or the subcommand.')
+    parser.add_argument(
+        '--metrics-json', dest='metrics_json', metavar='PATH',
+        help='Write the time, CPU, memory and IO usage of the subcommand, '
+             'with its records and phase timings, to a JSON file.')
+    return parser
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""Compute bcftools stats summary numbers and Ts/Tv of a VCF."""
+
+import os
+
+import pysam
+
+from .util import get_named_logger, hts_position, Progress  # noqa: ABS101
+from .util import wf_parser  # noqa: ABS101
+
+# Transitions, as unordered pairs of bases
+TRANSITIONS = {frozenset('AG'), frozenset('CT')}
+
+
+def variant_type(ref, alt):
+    """Classify an allele following htslib `bcf_set_variant_type`.
+
+    :param ref: reference allele.
+    :param alt: alternative allele.
+    :returns: a tuple with the type (ref, snp, mnp, indel or other) and, for
+        SNPs, the pair of changed bases.
+    """
+    ref, alt = ref.upper(), alt.upper()
+    if alt in ('.', '*', 'X', '<X>', '<*>', '<NON_REF>') or alt == ref:
+        return 'ref', None
+    if alt.startswith('<') or '[' in alt or ']' in alt:
+        return 'other', None
+    # Trim the shared prefix
+    i = 0
+    while i < len(ref) and i < len(alt) and ref[i] == alt[i]:
+        i += 1
+    r, a = ref[i:], alt[i:]
+    if not r or not a:
+        return 'indel', None
+    # Trim the shared suffix, leaving at least one base in each allele
+    re, ae = len(r) - 1, len(a) - 1
+    while re > 0 and ae > 0 and r[re] == a[ae]:
+        re -= 1
+        ae -= 1
+    if ae == 0 and re == 0:
+        return 'snp', (r[0], a[0])
+    if ae == 0 or re == 0:
+        return ('indel' if r[re] == a[ae] else 'other'), None
+    return ('mnp' if re == ae else 'other'), None
+
+
+class VcfStats:
+    """Accumulate the SN and TSTV sections of `bcftools stats`."""
+
+    def __init__(self, n_samples=0):
+        """Initialize the counters."""
+        self.sn = dict.fromkeys((
+            'samples', 'records', 'no-ALTs', 'SNPs', 'MNPs', 'indels',
+            'others', 'multiallelic sites', 'multiallelic SNP sites'), 0)
+        self.sn['samples'] = n_samples
+        self.ts = self.tv = 0
+        self.ts_1st = self.tv_1st = 0
+
+    def update(self, ref, alts):
+        """Add a record.
+
+        :param ref: reference allele.
+        :param alts: tuple of alternative alleles (or None).
+        """
+        self.sn['records'] += 1
+        alts = alts or ()
+        types = set()
+        for n, alt in enumerate(alts):
+            vtype, change = variant_type(ref, alt)
+            types.add(vtype)
+            if change is None:
+                continue
+            is_ts = frozenset(change) in TRANSITIONS
+            self.ts += is_ts
+            self.tv += not is_ts
+            if n == 0:
+                self.ts_1st += is_ts
+                self.tv_1st += not is_ts
+        types.discard('ref')
+        if not types:
+            self.sn['no-ALTs'] += 1
+        for vtype, key in (
+                ('snp', 'SNPs'), ('mnp', 'MNPs'),
+                ('indel', 'indels'), ('other', 'others')):
+            if vtype in types:
+                self.sn[key] += 1
+        if len(alts) > 1:
+            self.sn['multiallelic sites'] += 1
+            if types == {'snp'}:
+                self.sn['multiallelic SNP sites'] += 1
+
+    def write(self, fname, vcf_name):
+        """Write the stats in the `bcftools stats` layout.
+
+        :param fname: output file name.
+        :param vcf_name: name of the VCF file, used in the ID section.
+        """
+        def ratio(ts, tv):
+            return f"{ts / tv if tv else 0:.2f}"
+
+        with open(fname, 'w') as out:
+            out.write(
+                "# This file was produced by workflow-glue vcf_stats and has the"
+                " same layout as bcftools stats.\n"
+                "# Definition of sets:\n"
+                "# ID\t[2]id\t[3]tab-separated file names\n"
+                f"ID\t0\t{vcf_name}\n"
+                "# SN, Summary numbers:\n"
+                "# SN\t[2]id\t[3]key\t[4]value\n")
+            for key, value in self.sn.items():
+                out.write(f"SN\t0\tnumber of {key}:\t{value}\n")
+            out.write(
+                "# TSTV, transitions/transversions:\n"
+                "# TSTV\t[2]id\t[3]ts\t[4]tv\t[5]ts/tv"
+                "\t[6]ts (1st ALT)\t[7]tv (1st ALT)\t[8]ts/tv (1st ALT)\n"
+                f"TSTV\t0\t{self.ts}\t{self.tv}\t{ratio(self.ts, self.tv)}"
+                f"\t{self.ts_1st}\t{self.tv_1st}"
+                f"\t{ratio(self.ts_1st, self.tv_1st)}\n")
+
+
+def main(args):
+    """Run the entry point."""
+    logger = get_named_logger("vcf_stats")
+    logger.info(f'Computing stats for: {args.vcf}')
+    vcf = pysam.VariantFile(args.vcf)
+    stats = VcfStats(n_samples=len(vcf.header.samples))
+    progress = Progress(
+        logger, total_bytes=os.path.getsize(args.vcf), position=hts_position(vcf))
+    for rec in vcf:
+        stats.update(rec.ref, rec.alts)
+        progress.update()
+    progress.done()
+    stats.write(args.output, args.vcf)
+    logger.info(f"Written stats to '{args.output}'.")
+
+
+def argparser():
+    """Argument parser for entrypoint."""
+    parser = wf_parser("vcf_stats")
+    parser.add_argument("vcf", help="Input VCF file")
+    parser.add_argument("output", help="Output stats file")
+    return parser
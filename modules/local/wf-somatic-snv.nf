@@ -67,6 +67,7 @@ process makeReport {
             path(tbi), 
             path("vcfstats.txt"), 
             path("spectra.csv"), 
+            path("variants.npz"), 
             path(clinvar_vcf), 
             path("version.txt"), 
             path("params.json")
@@ -87,6 +88,7 @@ process makeReport {
             --vcf_stats vcfstats.txt \\
             --vcf $vcf \\
             --mut_spectra spectra.csv \\
+            --variant_arrays variants.npz \\
             ${clinvar}
         """
 }
@@ -949,7 +951,6 @@ process clairs_merge_final_indels {
 // Merge full-alignment variants 
 process clairs_merge_snv_and_indels {
     // Filters a VCF by contig, selecting only het SNPs.
-    label "wf_somatic_snv"
     cpus 1
     input:
         tuple val(meta), path(vcfs, stageAs: 'VCFs/*'), path(tbis, stageAs: 'VCFs/*')
@@ -959,9 +960,10 @@ process clairs_merge_snv_and_indels {
             
     shell:
         '''
-        bcftools concat -a VCFs/*.vcf.gz | \\
-            bcftools sort -m 2G -T ./ -O z > !{meta.sample}_somatic.vcf.gz && \\
-            tabix -p vcf !{meta.sample}_somatic.vcf.gz
+        workflow-glue sort_vcf VCFs/*.vcf.gz \\
+            --output !{meta.sample}_somatic.vcf.gz \\
+            --max_memory 2G \\
+            --tmpdir ./
         '''
 }
 
@@ -981,10 +983,14 @@ process change_count {
         tuple val(meta), path("${meta.sample}_somatic.vcf.gz"), emit: mutype_tbi
         tuple val(meta), path("${meta.sample}_changes.csv"), emit: changes
         tuple val(meta), path("${meta.sample}_changes.json"), emit: changes_json
+        tuple val(meta), path("${meta.sample}_variants.npz"), emit: variant_arrays
+        tuple val(meta), path("${meta.sample}.stats"), emit: stats
             
     script:
         """
-        workflow-glue annotate_mutations input.vcf.gz ${meta.sample}_somatic.vcf.gz --json -k 3 --genome ${ref}
+        workflow-glue annotate_mutations input.vcf.gz ${meta.sample}_somatic.vcf.gz --json -k 3 --genome ${ref} \\
+            --variant_arrays ${meta.sample}_variants.npz \\
+            --vcf_stats ${meta.sample}.stats
         tabix -p vcf ${meta.sample}_somatic.vcf.gz
         """
 }
\ No newline at end of file
@@ -160,7 +160,6 @@ process annotate_classify {
 // NOTE This is the last touch the VCF has as part of the workflow,
 //  we'll rename it with its desired output name here
 process sortVCF {
-    label "wf_somatic_sv"
     cpus 1
     input:
         tuple val(meta), path(vcf)
@@ -169,8 +168,10 @@ process sortVCF {
         tuple val(meta), path("${meta.sample}.nanomonsv.result.wf_somatic_sv.vcf.gz.tbi"), emit: vcf_tbi
     script:
     """
-    bcftools sort -m 2G -O z -o ${meta.sample}.nanomonsv.result.wf_somatic_sv.vcf.gz -T ./ $vcf 
-    bcftools index -t ${meta.sample}.nanomonsv.result.wf_somatic_sv.vcf.gz
+    workflow-glue sort_vcf $vcf \\
+        --output ${meta.sample}.nanomonsv.result.wf_somatic_sv.vcf.gz \\
+        --max_memory 2G \\
+        --tmpdir ./
     """
 }
 
@@ -7,12 +7,15 @@ process bamstats {
     output:
         tuple val(xam_meta), path("*.readstats.tsv.gz"), emit: read_stats
         tuple val(xam_meta), path("*.flagstat.tsv"), emit: flagstat
+        tuple val(xam_meta), path("*.readstats.npz"), emit: read_stats_sketch
     script:
     def ref_path = "${ref_cache}/%2s/%2s/%s:" + System.getenv("REF_PATH")
     def cores = task.cpus > 1 ? task.cpus - 1 : 1
     """
     export REF_PATH="${ref_path}"
     bamstats ${xam} -s ${xam_meta.sample} --threads ${cores} -u -f ${xam_meta.sample}_${xam_meta.type}.flagstat.tsv | gzip > ${xam_meta.sample}_${xam_meta.type}.readstats.tsv.gz
+    workflow-glue read_stats_sketch ${xam_meta.sample}_${xam_meta.type}.readstats.tsv.gz \
+        -o ${xam_meta.sample}_${xam_meta.type}.readstats.npz
     """
 }
 
@@ -88,13 +91,14 @@ process discarded_sample {
 
 // Make report
 process makeQCreport {
+    cpus 2
     input: 
         tuple val(meta), 
-            path("readstats_normal.tsv.gz"),
+            path("readstats_normal.npz"),
             path("flagstat_normal.tsv"),
             path("summary_depth_normal.tsv"),
             path("depth_normal.tsv.gz"),
-            path("readstats_tumor.tsv.gz"),
+            path("readstats_tumor.npz"),
             path("flagstat_tumor.tsv"),
             path("summary_depth_tumor.tsv"),
             path("depth_tumor.tsv.gz"),
@@ -116,8 +120,8 @@ process makeQCreport {
             --normal_cov_threshold ${normal_cvg} \\
             --sample_id ${meta.sample} \\
             --name ${meta.sample}.wf-somatic-variation-readQC \\
-            --read_stats_normal readstats_normal.tsv.gz \\
-            --read_stats_tumor readstats_tumor.tsv.gz \\
+            --read_stats_normal readstats_normal.npz \\
+            --read_stats_tumor readstats_tumor.npz \\
             --flagstat_tumor flagstat_tumor.tsv \\
             --flagstat_normal flagstat_normal.tsv \\
             --mosdepth_summary_tumor summary_depth_tumor.tsv \\
@@ -125,6 +129,7 @@ process makeQCreport {
             --depth_tumor depth_tumor.tsv.gz \\
             --depth_normal depth_normal.tsv.gz \\
             --reference_fai ref.fa.fai \\
+            --threads ${task.cpus} \\
             --versions versions.txt \\
             --params params.json
         """
@@ -166,7 +171,7 @@ workflow alignment_stats {
         // 2. flagstats
         // 3. Per-base depth
         // 4. Depth summary
-        stats.read_stats.map{meta, rstats->[meta, rstats]}
+        stats.read_stats_sketch.map{meta, rstats->[meta, rstats]}
             .combine(stats.flagstat.map{meta, fstats->[meta, fstats]}, by:0)
             .combine(depths.summary.map{meta, depth_sum->[meta, depth_sum]}, by:0)
             .combine(depths.mosdepth_tuple.map{meta, reg, dist, thresh ->[meta, reg]}, by:0)
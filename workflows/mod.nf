@@ -240,6 +240,7 @@ process dss {
 
 
 process makeModReport {
+    cpus 4
     input: 
         tuple val(meta), 
             path("normal_summary/*"),
@@ -263,6 +264,7 @@ process makeModReport {
             --dml DML/ \\
             --dmr DMR/ \\
             --reference_fai ref.fa.fai \\
+            --threads ${task.cpus} \\
             --sample_name ${meta.sample} \\
             --versions versions.txt \\
             --params params.json ${genome}
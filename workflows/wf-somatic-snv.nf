@@ -2,7 +2,6 @@
 include {
     getParams;
     getVersions;
-    vcfStats;
     makeReport;
     output_snv;
     clairs_select_het_snps;
@@ -528,16 +527,14 @@ workflow snv {
             clinvar_vcf = ch_vcf.map{meta, vcf -> [meta, file("$projectDir/data/OPTIONAL_FILE")]}
         }
 
-        // Generate basic statistics for the VCF file
-        vcfStats(ch_vcf.combine(ch_tbi, by: 0))
-
         // Create the report for the variants called
         software_versions = getVersions()
         workflow_params = getParams()
         ch_vcf
             .combine(ch_tbi, by: 0)
-            .combine(vcfStats.out[0], by: 0)
+            .combine(change_count.out.stats, by: 0)
             .combine(change_count.out.changes, by: 0)
+            .combine(change_count.out.variant_arrays, by: 0)
             .combine(clinvar_vcf, by: 0)
             .combine(software_versions)
             .combine(workflow_params)
@@ -556,7 +553,7 @@ workflow snv {
                     meta, tbi -> [tbi, null]
                     })
             .concat(
-                vcfStats.out.map{
+                change_count.out.stats.map{
                     meta, stats -> [stats, "${meta.sample}/snv/varstats"]
                     })
             .concat(